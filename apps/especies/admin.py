@@ -48,8 +48,8 @@ class TaxonomiaAdmin(admin.ModelAdmin):
             
 @admin.register(Galeria)
 class GaleriaAdmin(admin.ModelAdmin):
-    list_display = ('especie', 'imagen', 'categoria', 'fecha_creacion', 'autor')
-    list_filter = ('especie', 'autor', 'categoria')
+    list_display = ('especie', 'imagen', 'categoria', 'estado', 'fecha_creacion', 'autor')
+    list_filter = ('especie', 'autor', 'categoria', 'estado')
     autocomplete_fields = ('especie', )
     ordering = ('fecha_creacion', )
     
@@ -0,0 +1,15 @@
+from django.core.files.storage import FileSystemStorage
+
+# Los nombres de la Galeria y el Historial salen del hash del contenido (ver utils.hash_archivo)
+# Si el archivo ya existe es idéntico -> No se vuelve a escribir y varias filas lo comparten
+class AlmacenamientoPorContenido(FileSystemStorage):
+    def __init__(self, **kwargs):
+        kwargs.setdefault('allow_overwrite', True) # Sin sufijos aleatorios (_aB3xYz) en los nombres
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+almacenamiento_por_contenido = AlmacenamientoPorContenido()
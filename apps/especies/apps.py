@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class EspeciesConfig(AppConfig):
     name = 'apps.especies'
+
+    def ready(self):
+        from . import signals # Conecta los receivers
@@ -0,0 +1,96 @@
+from collections import defaultdict
+
+from django.urls import reverse
+
+from .busqueda import normalizar, terminos
+from .cache import MemoriaPorVersion, firma_tabla
+from .models import Especie
+
+# Autocompletado del buscador: índice en memoria de trigramas sobre las palabras de los nombres
+# común y científico, la familia y el género de las especies activas.
+# Tolera errores de dedo comparando trigramas ("seiba" encuentra "ceiba").
+
+SIMILITUD_MINIMA = 0.3
+LIMITE = 8
+
+# " ceiba " -> {'  c', ' ce', 'cei', 'eib', 'iba', 'ba '}
+def trigramas(palabra):
+    palabra = f'  {palabra} '
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+class IndiceAutocompletar:
+    def __init__(self, especies):
+        self.resultados = [] # Lo que regresa el endpoint, por posición
+        self.palabras = {} # palabra -> trigramas
+        self.especies_por_palabra = defaultdict(set) # palabra -> posiciones de las especies
+        self.palabras_por_trigrama = defaultdict(set) # trigrama -> palabras
+
+        for especie in especies:
+            posicion = len(self.resultados)
+            self.resultados.append({
+                'nombre_comun': especie.nombre_comun,
+                'nombre_cientifico': especie.nombre_cientifico,
+                'url': reverse('public:detalle_especie', kwargs={'slug': especie.slug}),
+            })
+
+            for palabra in set(especie.documento_busqueda.split()):
+                self.especies_por_palabra[palabra].add(posicion)
+                if palabra not in self.palabras:
+                    self.palabras[palabra] = trigramas(palabra)
+                    for trigrama in self.palabras[palabra]:
+                        self.palabras_por_trigrama[trigrama].add(palabra)
+
+    # Similitud (0 a 1) de la palabra del índice que mejor le queda a `termino`, por especie
+    def puntajes(self, termino):
+        buscados = trigramas(termino)
+
+        candidatas = set()
+        for trigrama in buscados:
+            candidatas |= self.palabras_por_trigrama.get(trigrama, set())
+
+        puntajes = {}
+        for palabra in candidatas:
+            if palabra.startswith(termino):
+                similitud = 1.0 # Lo que el usuario lleva escrito
+            else:
+                # Contra el inicio de la palabra del mismo largo -> "seib" se parece a "ceib(a)"
+                prefijo = trigramas(palabra[:len(termino)]) if len(palabra) > len(termino) else self.palabras[palabra]
+                similitud = max(
+                    len(buscados & self.palabras[palabra]) / len(buscados | self.palabras[palabra]),
+                    len(buscados & prefijo) / len(buscados | prefijo),
+                )
+            if similitud < SIMILITUD_MINIMA:
+                continue
+
+            for posicion in self.especies_por_palabra[palabra]:
+                puntajes[posicion] = max(puntajes.get(posicion, 0), similitud)
+        return puntajes
+
+    # Las `limite` especies con mejor puntaje, todas las palabras tienen que aparecer (aunque sea parecidas)
+    def buscar(self, query, limite=LIMITE):
+        palabras = terminos(query)
+        if not palabras:
+            return []
+
+        total = None
+        for termino in palabras:
+            puntajes = self.puntajes(termino)
+            if total is None:
+                total = puntajes
+            else:
+                total = {posicion: total[posicion] + puntaje for posicion, puntaje in puntajes.items() if posicion in total}
+            if not total:
+                return []
+
+        mejores = sorted(total.items(), key=lambda item: (-item[1], self.resultados[item[0]]['nombre_comun']))
+        return [self.resultados[posicion] for posicion, _ in mejores[:limite]]
+
+# Se construye con la primera búsqueda y se reconstruye cuando cambia una Especie o su Taxonomia
+# (los cambios de la Taxonomia mueven la fecha_actualizacion de su especie, ver cache.invalidar_especie)
+# La firma sale de la base de datos -> Los demás procesos también se enteran
+indice = MemoriaPorVersion('especies:autocompletar', lambda: IndiceAutocompletar(
+    Especie.objects.only('nombre_comun', 'nombre_cientifico', 'slug', 'documento_busqueda')
+), firma=lambda: firma_tabla(Especie.objects))
+
+def autocompletar(query, limite=LIMITE):
+    return indice.obtener().buscar(normalizar(query), limite)
@@ -0,0 +1,79 @@
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, When, Value, FloatField
+from django.db.models.expressions import RawSQL
+
+# Buscador del catálogo: cada Especie guarda un documento de búsqueda (nombres, familia y género)
+# en minúsculas y sin acentos. En MySQL se consulta con un índice FULLTEXT (ver migración 0013),
+# en otras bases de datos con LIKE sobre ese mismo documento.
+
+LONGITUD_MINIMA_FULLTEXT = 3 # innodb_ft_min_token_size -> Palabras más cortas no están en el índice
+
+# "Árbol  de Fuego" -> "arbol de fuego"
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return ' '.join(texto.lower().split())
+
+def terminos(query):
+    return re.findall(r'\w+', normalizar(query))
+
+def documento_busqueda(nombre_comun, nombre_cientifico, familia='', genero=''):
+    return normalizar(' '.join([nombre_comun, nombre_cientifico, familia or '', genero or '']))
+
+# Regresa {id de especie: relevancia} de las especies que tienen todas las palabras de la búsqueda
+# (como prefijo: "cei" encuentra "ceiba")
+def buscar_especies(query):
+    from .models import Especie
+
+    palabras = terminos(query)
+    if not palabras:
+        return {}
+
+    if connection.vendor == 'mysql' and all(len(palabra) >= LONGITUD_MINIMA_FULLTEXT for palabra in palabras):
+        booleano = ' '.join(f'+{palabra}*' for palabra in palabras)
+        return dict(
+            Especie.all_objects.annotate(
+                relevancia=RawSQL("MATCH (documento_busqueda) AGAINST (%s IN BOOLEAN MODE)", [booleano])
+            ).filter(relevancia__gt=0).values_list('id', 'relevancia')
+        )
+
+    queryset = Especie.all_objects.all()
+    for palabra in palabras:
+        queryset = queryset.filter(documento_busqueda__contains=palabra)
+
+    return {
+        id_especie: relevancia(documento, palabras)
+        for id_especie, documento in queryset.values_list('id', 'documento_busqueda')
+    }
+
+# Palabra completa > inicio de palabra > dentro de una palabra
+def relevancia(documento, palabras):
+    palabras_documento = documento.split()
+    total = 0.0
+    for palabra in palabras:
+        if palabra in palabras_documento:
+            total += 3
+        elif any(otra.startswith(palabra) for otra in palabras_documento):
+            total += 2
+        else:
+            total += 1
+    return total
+
+# Filtra el queryset a las especies encontradas y lo ordena por relevancia
+# `campo` es la ruta a la especie desde el modelo del queryset: 'id' para Especie, 'especie' para Galeria
+def filtrar(queryset, query, campo='id'):
+    resultados = buscar_especies(query)
+    if not resultados:
+        return queryset.none()
+
+    orden_original = queryset.query.order_by or queryset.model._meta.ordering
+    return queryset.filter(**{f'{campo}__in': resultados}).annotate(
+        relevancia=Case(
+            *[When(**{campo: id_especie}, then=Value(valor)) for id_especie, valor in resultados.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    ).order_by('-relevancia', *orden_original, 'pk')
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils import timezone
+
+# Versiones en la caché de Django: cada conjunto de datos (zonas, especies, ...) tiene un número que
+# se incrementa cuando cambia. Con una caché compartida (Redis, Memcached) todos los procesos se enteran.
+
+def version(clave):
+    return cache.get_or_set(f'version:{clave}', time.time_ns, timeout=None)
+
+def incrementar_version(clave):
+    try:
+        cache.incr(f'version:{clave}')
+    except ValueError: # La clave no existía (caché reiniciada) -> Una versión que nadie tiene
+        cache.set(f'version:{clave}', time.time_ns(), timeout=None)
+
+# Valor guardado en la caché de Django bajo la versión actual de `clave` -> Se vuelve a construir cuando cambia
+def por_version(clave, construir, timeout=None):
+    return cache.get_or_set(f'{clave}:{version(clave)}', construir, timeout)
+
+# (última fecha_actualizacion, número de filas) de una tabla -> Cambia con cada save() y con cada borrado
+# Sale de la base de datos: todos los procesos ven el mismo valor aunque la caché sea local de cada uno
+def firma_tabla(queryset):
+    return tuple(queryset.aggregate(ultima=Max('fecha_actualizacion'), total=Count('pk')).values())
+
+# Objeto en la memoria del proceso (índices, etc.) que se reconstruye con `construir()`
+# la primera vez que se pide después de que cambia la versión de `clave`
+# `firma`: función que lee la versión de la base de datos (ver firma_tabla) en lugar de la caché
+class MemoriaPorVersion:
+    def __init__(self, clave, construir, firma=None):
+        self.clave = clave
+        self.construir = construir
+        self.firma = firma
+        self._valor = None
+        self._version = None
+        self._candado = threading.Lock()
+
+    def obtener(self):
+        actual = self.firma() if self.firma else version(self.clave)
+        if self._valor is None or self._version != actual:
+            with self._candado:
+                if self._valor is None or self._version != actual:
+                    self._valor = self.construir()
+                    self._version = actual
+        return self._valor
+
+    def invalidar(self):
+        incrementar_version(self.clave)
+        self._valor = None
+
+# Ficha de cada especie ya renderizada, por slug
+# La versión es Especie.fecha_actualizacion, que vive en la base de datos -> La ve cualquier proceso
+# (workers y el worker de la Galería), aunque la caché sea local de cada uno (LocMemCache)
+# Cualquier cambio en sus datos (ver signals.py) mueve esa fecha y la ficha guardada deja de servir
+TIMEOUT_PAGINA = 60 * 60 * 24
+
+def invalidar_especie(especie_id):
+    from .models import Especie # cache.py se importa desde los modelos
+    
+    # También es el Last-Modified del catálogo, la galería y las zonas (ver condicional.py)
+    Especie.all_objects.filter(pk=especie_id).update(fecha_actualizacion=timezone.now())
+
+class CachePaginaEspecieMixin:
+    def get(self, request, *args, **kwargs):
+        # Solo visitantes: la barra lateral cambia con el usuario (y lleva el token CSRF del logout)
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        
+        # Una consulta por el índice del slug -> Sin especie (inactiva o borrada) la vista responde el 404
+        # La versión se lee antes de consultar los datos -> Si algo cambia mientras se renderiza,
+        # la página se guarda con la versión vieja y la siguiente visita la vuelve a generar
+        actual = self.get_queryset().filter(slug=kwargs['slug']).values_list('fecha_actualizacion', flat=True).first()
+        
+        clave = f'pagina:especie:{kwargs["slug"]}'
+        guardada = cache.get(clave)
+        if actual and guardada and guardada['version'] == actual:
+            return HttpResponse(guardada['contenido'], content_type=guardada['tipo'])
+        
+        respuesta = super().get(request, *args, **kwargs)
+        respuesta.render()
+        if actual and respuesta.status_code == 200:
+            cache.set(clave, {
+                'version': actual,
+                'contenido': respuesta.content,
+                'tipo': respuesta['Content-Type'],
+            }, TIMEOUT_PAGINA)
+        
+        return respuesta
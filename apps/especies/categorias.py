@@ -0,0 +1,55 @@
+from django.db.models import Window, F
+from django.db.models.functions import RowNumber
+
+from .models import Galeria
+
+# Primera imagen (la de menor id, como .first()) de cada categoría para una o varias especies
+# Regresa {especie_id: {categoria: Galeria}}
+# - Si las especies traen `imagenes` con prefetch_related, se resuelve en memoria sin consultas
+# - Si no, con una sola consulta para todas: ROW_NUMBER() por (especie, categoría) y nos quedamos con la primera
+# `queryset` permite incluir imagenes de especies inactivas (Galeria.all_objects.filter(estado='LISTA'))
+# -> Las pendientes o con error no deben usarse como portada: todavía no tienen variantes
+def imagenes_por_categoria(especies, categorias=None, queryset=None):
+    especies = list(especies)
+    resultado = {}
+
+    if especies and all('imagenes' in getattr(especie, '_prefetched_objects_cache', {}) for especie in especies):
+        for especie in especies:
+            resultado[especie.id] = primeras(especie.imagenes.all(), categorias)
+        return resultado
+
+    ids = [getattr(especie, 'id', especie) for especie in especies] # Especies o ids
+    if not ids:
+        return resultado
+
+    queryset = (Galeria.objects if queryset is None else queryset).filter(especie_id__in=ids)
+    if categorias:
+        queryset = queryset.filter(categoria__in=categorias)
+
+    for imagen in primera_por_grupo(queryset, 'especie_id', 'categoria'):
+        resultado.setdefault(imagen.especie_id, {})[imagen.categoria] = imagen
+    return resultado
+
+# Portada de cada especie: su primera imagen sin importar la categoría (la de especie.imagenes.first)
+# Regresa {especie_id: Galeria} con una sola consulta para toda la página
+def portadas(especies, queryset=None):
+    ids = [getattr(especie, 'id', especie) for especie in especies]
+    if not ids:
+        return {}
+
+    queryset = (Galeria.objects if queryset is None else queryset).filter(especie_id__in=ids)
+    return {imagen.especie_id: imagen for imagen in primera_por_grupo(queryset, 'especie_id')}
+
+# ROW_NUMBER() por grupo ordenado por id -> Solo la primera fila de cada grupo
+def primera_por_grupo(queryset, *campos):
+    return queryset.annotate(
+        orden=Window(RowNumber(), partition_by=[F(campo) for campo in campos], order_by=F('id').asc())
+    ).filter(orden=1)
+
+# {categoria: primera imagen} a partir de imagenes ya cargadas
+def primeras(imagenes, categorias=None):
+    mapa = {}
+    for imagen in sorted(imagenes, key=lambda imagen: imagen.id):
+        if (categorias is None or imagen.categoria in categorias) and imagen.categoria not in mapa:
+            mapa[imagen.categoria] = imagen
+    return mapa
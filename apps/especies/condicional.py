@@ -0,0 +1,72 @@
+import hashlib
+import os
+from datetime import datetime, timezone as dt_timezone
+from functools import cache, wraps
+
+from django.conf import settings
+from django.template.utils import get_app_template_dirs
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .cache import firma_tabla
+from .models import Especie
+
+# GET condicional para las páginas públicas: ETag y Last-Modified salen de la firma (última fecha_actualizacion
+# y número de filas) de los datos que muestra la vista, leída de la base de datos con una sola agregación
+# -> Cualquier proceso (otro worker web, el de la Galería, un comando) que cambie los datos la mueve.
+# Si el navegador ya tiene esa versión se contesta 304 Not Modified sin consultar ni renderizar la página.
+
+class UltimoCambio:
+    def __init__(self, clave, consulta):
+        self.clave = clave
+        self.consulta = consulta
+
+    # (fecha, total) -> El total cambia cuando se borra una fila (la fecha máxima podría no cambiar)
+    def obtener(self):
+        return firma_tabla(self.consulta())
+
+# Los cambios del detalle, la taxonomía, las imágenes y las URLs mueven la fecha de su especie (ver cache.invalidar_especie)
+cambios_especies = UltimoCambio('especies', lambda: Especie.all_objects)
+
+# Un despliegue puede traer plantillas nuevas con los mismos datos -> Entran en los validadores
+# Se calcula una vez por proceso: todos los procesos del mismo despliegue ven los mismos archivos
+@cache
+def fecha_plantillas():
+    carpetas = [*settings.TEMPLATES[0]['DIRS'], *get_app_template_dirs('templates')]
+    fechas = [
+        os.path.getmtime(os.path.join(raiz, archivo))
+        for carpeta in carpetas
+        for raiz, _, archivos in os.walk(carpeta)
+        for archivo in archivos
+    ]
+    return datetime.fromtimestamp(max(fechas, default=0), tz=dt_timezone.utc)
+
+def con_validadores(*cambios):
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            # Solo visitantes: la barra lateral cambia con el usuario (igual que CachePaginaEspecieMixin)
+            if request.user.is_authenticated:
+                return vista(request, *args, **kwargs)
+
+            firmas = [(cambio.clave, *cambio.obtener()) for cambio in cambios]
+            fechas = [fecha for _, fecha, _ in firmas if fecha] + [fecha_plantillas()]
+            etag = hashlib.md5(repr((firmas, fecha_plantillas())).encode()).hexdigest()
+
+            respuesta = condition(
+                etag_func=lambda *_, **__: etag,
+                last_modified_func=lambda *_, **__: max(fechas),
+            )(vista)(request, *args, **kwargs)
+
+            # Sin esto el navegador puede reutilizar la página sin preguntar -> Siempre se revalida
+            patch_cache_control(respuesta, no_cache=True)
+            return respuesta
+        return envoltura
+    return decorador
+
+# Para las vistas basadas en clases: `cambios` son los UltimoCambio de los datos que muestra
+class GetCondicionalMixin:
+    cambios = (cambios_especies,)
+
+    def dispatch(self, request, *args, **kwargs):
+        return con_validadores(*self.cambios)(super().dispatch)(request, *args, **kwargs)
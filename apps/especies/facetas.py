@@ -0,0 +1,32 @@
+from collections import Counter
+
+from .busqueda import terminos
+from .opciones import facetas_catalogo
+
+# Conteos de los filtros del catálogo (tipo, estado IUCN y familia) para la búsqueda actual.
+# Sale de una sola consulta agrupada por (tipo, estado, familia) sobre las especies que coinciden con la búsqueda,
+# guardada en caché por búsqueda normalizada (ver opciones.py). Los filtros seleccionados se aplican sobre esas filas en Python.
+
+FACETAS = ('tipo', 'estado', 'familia') # Mismo orden que las columnas de las filas
+
+# {'tipo': Counter, 'estado': Counter, 'familia': Counter}
+# Cada faceta se cuenta con los demás filtros aplicados pero no el suyo -> Se puede cambiar de opción sin
+# tener que quitar el filtro primero
+def contar_facetas(query, seleccion):
+    filas = facetas_catalogo.obtener(' '.join(terminos(query)))
+    conteos = {faceta: Counter() for faceta in FACETAS}
+    
+    for *valores, total in filas:
+        for indice, faceta in enumerate(FACETAS):
+            if all(
+                not seleccion.get(otra) or valores[otro] == seleccion[otra]
+                for otro, otra in enumerate(FACETAS) if otro != indice
+            ):
+                conteos[faceta][valores[indice]] += total
+    
+    conteos['familia'].pop('', None) # Especies sin taxonomía
+    return conteos
+
+# CHOICES con el conteo en la etiqueta: ('ARBOL', 'Árbol') -> ('ARBOL', 'Árbol (12)')
+def con_conteo(choices, conteo):
+    return [(clave, f'{etiqueta} ({conteo[clave]})') for clave, etiqueta in choices]
@@ -2,6 +2,7 @@ from django import forms
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
 
 from .models import Especie, Taxonomia, EspecieDetalle, Galeria, Url
+from .utils import CATEGORIAS_CHOICES
 
 class EspecieForm(forms.ModelForm):
     descripcion = forms.CharField(widget=CKEditorUploadingWidget())
@@ -36,4 +37,39 @@ class GaleriaForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         if 'especie' in self.fields:
-            self.fields['especie'].queryset = Especie.all_objects.all()
\ No newline at end of file
+            self.fields['especie'].queryset = Especie.all_objects.all()
+
+# Para poder seleccionar varios archivos en un solo <input type="file">
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+class MultipleImageField(forms.ImageField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput(attrs={'accept': 'image/*'}))
+        super().__init__(*args, **kwargs)
+
+    # Valida cada imagen por separado
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            if not data and self.required: # Sin archivos -> El mismo error que un campo vacío
+                raise forms.ValidationError(self.error_messages['required'], code='required')
+            return [super(MultipleImageField, self).clean(archivo, initial) for archivo in data]
+        return [super().clean(data, initial)]
+
+class GaleriaMasivaForm(forms.Form):
+    especie = forms.ModelChoiceField(
+        queryset=Especie.all_objects.all(),
+        label="Especie Asociada"
+    )
+    
+    imagenes = MultipleImageField(
+        label="Fotografías",
+        help_text="Selecciona todas las fotos de la especie, después elige la categoría de cada una."
+    )
+    
+    # Para los archivos a los que no se les eligió categoría
+    categoria = forms.ChoiceField(
+        choices=CATEGORIAS_CHOICES,
+        initial='GENERAL',
+        label="Categoría por defecto"
+    )
\ No newline at end of file
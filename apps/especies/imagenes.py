@@ -0,0 +1,61 @@
+import os
+from io import BytesIO
+
+from PIL import Image
+
+# Variantes de cada imagen de la Galeria -> (nombre, ancho máximo en px)
+# Ordenadas de la más chica a la más grande
+VARIANTES = [
+    ('thumb', 160), # Miniaturas de tablas del panel e inventario
+    ('card', 480), # Tarjetas del catálogo y la galería (220px de alto)
+    ('carousel', 1200), # Carrusel de la ficha de la especie
+    ('full', 1920), # Vista completa en el lightbox
+]
+
+CALIDAD_WEBP = 80
+
+def ruta_variante(nombre, variante):
+    # galeria/ceiba-pentandra/corteza_1.webp -> galeria/ceiba-pentandra/corteza_1_card.webp
+    base, _ = os.path.splitext(nombre)
+    return f'{base}_{variante}.webp'
+
+def a_webp(img):
+    output = BytesIO()
+
+    # Convertimos a RGB si es necesario
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    img.save(output, format='WEBP', quality=CALIDAD_WEBP)
+    return output.getvalue()
+
+# Regresa una lista de (variante, ancho, bytes WebP) a partir de una imagen de PIL
+# Nunca se agranda la imagen: si es más chica que una variante, esa variante es la última
+def codificar_variantes(img):
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    ancho_original, alto_original = img.size
+    variantes = []
+
+    for variante, ancho in VARIANTES:
+        ancho = min(ancho, ancho_original)
+        alto = max(1, round(alto_original * ancho / ancho_original))
+
+        copia = img.resize((ancho, alto), Image.LANCZOS) if ancho < ancho_original else img
+        variantes.append((variante, ancho, a_webp(copia)))
+
+        # Ya llegamos al tamaño original, las siguientes serían iguales
+        if ancho == ancho_original:
+            break
+
+    return variantes
+
+# Se ejecuta en los procesos del pool -> Solo recibe y regresa bytes para poder serializarse
+# Regresa (bytes WebP o None si ya era WebP, variantes)
+def procesar_imagen(datos):
+    img = Image.open(BytesIO(datos))
+    img.load()
+
+    webp = None if img.format == 'WEBP' else a_webp(img)
+    return webp, codificar_variantes(img)
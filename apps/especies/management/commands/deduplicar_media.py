@@ -0,0 +1,120 @@
+import re
+import hashlib
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from apps.especies.models import Galeria
+from apps.especies.utils import mover_archivo
+from apps.especies.imagenes import VARIANTES, ruta_variante
+from apps.especies.almacenamiento import almacenamiento_por_contenido
+from apps.especies.cache import invalidar_especie
+from apps.mapa.models import Historial
+
+# Las variantes se derivan de su imagen, no se comparan por separado
+ES_VARIANTE = re.compile(r'_(%s)\.webp$' % '|'.join(variante for variante, _ in VARIANTES))
+
+class Command(BaseCommand):
+    help = "Busca archivos idénticos en galeria/ e historial/, deja uno solo y apunta todas las filas a él"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Solo muestra los duplicados y el espacio que se liberaría, no cambia nada."
+        )
+
+    def handle(self, *args, **options):
+        self.storage = almacenamiento_por_contenido
+        self.dry_run = options['dry_run']
+        self.liberado = 0
+        duplicados = 0
+
+        for raiz, modelo in (('galeria', Galeria.all_objects), ('historial', Historial.objects)):
+            for _, nombres in self.listar(raiz):
+                # Solo comparamos dentro del mismo directorio para no romper el esquema galeria/<especie>/
+                grupos = defaultdict(list)
+                for nombre in nombres:
+                    try:
+                        grupos[self.huella(nombre)].append(nombre)
+                    except OSError as error:
+                        self.stderr.write(f"{nombre}: {error}")
+
+                for grupo in grupos.values():
+                    if len(grupo) > 1:
+                        duplicados += len(grupo) - 1
+                        self.unificar(modelo, grupo)
+
+        accion = "se liberarían" if self.dry_run else "liberados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{duplicados} archivos duplicados, {self.liberado / 1024 / 1024:.2f} MB {accion}."
+        ))
+
+    # Regresa (directorio, [archivos]) de cada directorio bajo `raiz`, sin las variantes
+    def listar(self, raiz):
+        if not self.storage.exists(raiz):
+            return
+
+        directorios, archivos = self.storage.listdir(raiz)
+        yield raiz, [f'{raiz}/{archivo}' for archivo in sorted(archivos) if not ES_VARIANTE.search(archivo)]
+
+        for directorio in sorted(directorios):
+            yield from self.listar(f'{raiz}/{directorio}')
+
+    def huella(self, nombre):
+        sha = hashlib.sha256()
+        with self.storage.open(nombre, 'rb') as archivo:
+            for chunk in archivo.chunks():
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def unificar(self, modelo, grupo):
+        filas = defaultdict(list)
+        for fila in modelo.filter(imagen__in=grupo):
+            filas[fila.imagen.name].append(fila)
+
+        # Preferimos conservar un archivo que ya esté en uso (y con variantes, si es Galeria)
+        canonico = min(grupo, key=lambda nombre: (
+            not filas[nombre],
+            not any(getattr(fila, 'variantes', None) for fila in filas[nombre]),
+            nombre,
+        ))
+        variantes = next((fila.variantes for fila in filas[canonico] if getattr(fila, 'variantes', None)), None)
+
+        for nombre in grupo:
+            if nombre == canonico:
+                continue
+
+            self.stdout.write(f"{nombre} -> {canonico} ({len(filas[nombre])} filas)")
+            self.liberado += self.storage.size(nombre)
+
+            for fila in filas[nombre]:
+                if not isinstance(fila, Galeria):
+                    continue
+
+                # El canónico no tiene variantes -> Le pasamos las de esta fila en lugar de regenerarlas
+                if variantes is None and fila.variantes and not self.dry_run:
+                    variantes = {
+                        variante: {**datos, 'nombre': mover_archivo(self.storage, datos['nombre'], ruta_variante(canonico, variante))}
+                        for variante, datos in fila.variantes.items()
+                    }
+                    fila.variantes = {}
+
+                self.liberado += sum(self.tamano(datos['nombre']) for datos in fila.variantes.values())
+
+            if self.dry_run:
+                continue
+
+            if modelo.model is Galeria:
+                modelo.filter(imagen=nombre).update(imagen=canonico, variantes=variantes or {})
+                for fila in filas[nombre]:
+                    invalidar_especie(fila.especie_id)
+            else: # Historial -> Sus teselas y su análisis se vuelven a encolar con el archivo canónico
+                Historial.reemplazar_imagen(nombre, canonico)
+
+            self.storage.delete(nombre)
+            for variante, _ in VARIANTES:
+                self.storage.delete(ruta_variante(nombre, variante))
+
+    def tamano(self, nombre):
+        return self.storage.size(nombre) if self.storage.exists(nombre) else 0
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.especies.models import Galeria
+
+class Command(BaseCommand):
+    help = "Encola las imágenes de la Galería que aún no tienen variantes (thumb, card, carousel, full)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help="Regenera las variantes de todas las imágenes, incluso las que ya tienen."
+        )
+
+    def handle(self, *args, **options):
+        imagenes = Galeria.all_objects.filter(estado='LISTA') # Incluye las imagenes de especies inactivas
+        
+        if not options['todas']:
+            imagenes = imagenes.filter(variantes={})
+        
+        total = imagenes.update(estado='PENDIENTE')
+        
+        self.stdout.write(self.style.SUCCESS(f"{total} imágenes encoladas, ejecuta: manage.py procesar_galeria --una-vez"))
@@ -0,0 +1,70 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+
+from apps.especies.tareas import procesar_pendientes, reintentar_fallidas
+
+class Command(BaseCommand):
+    help = "Worker de la cola de la Galería: convierte a WebP y genera las variantes de las imágenes pendientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Número de procesos para codificar imágenes (por defecto uno por CPU)."
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=20,
+            help="Imágenes que se reclaman de la cola en cada vuelta."
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2,
+            help="Segundos de espera cuando la cola está vacía."
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help="Vacía la cola y termina en lugar de quedarse esperando."
+        )
+        parser.add_argument(
+            '--reintentar',
+            action='store_true',
+            help="Regresa a la cola las imágenes con error o que llevan más de 30 minutos procesando."
+        )
+
+    def handle(self, *args, **options):
+        if options['reintentar']:
+            total = reintentar_fallidas()
+            self.stdout.write(f"{total} imágenes regresaron a la cola.")
+        
+        # Un proceso del pool que muere (por ejemplo, sin memoria) rompe todo el pool -> Se crea uno nuevo
+        while True:
+            try:
+                with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                    self.trabajar(pool, options)
+                break
+            except BrokenProcessPool:
+                self.stderr.write("El pool de procesos se cayó, se crea uno nuevo.")
+        
+        self.stdout.write(self.style.SUCCESS("Cola de la Galería vacía."))
+    
+    def trabajar(self, pool, options):
+        while True:
+            procesadas = procesar_pendientes(pool, options['lote'], log=self.stderr.write)
+            
+            if procesadas:
+                self.stdout.write(f"{procesadas} imágenes procesadas.")
+                continue
+            
+            if options['una_vez']:
+                return
+            
+            time.sleep(options['intervalo'])
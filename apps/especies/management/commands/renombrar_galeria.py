@@ -0,0 +1,53 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from apps.especies.models import Galeria
+from apps.especies.utils import nombre_galeria, hash_archivo, mover_archivo
+from apps.especies.imagenes import ruta_variante
+from apps.especies.cache import invalidar_especie
+
+class Command(BaseCommand):
+    help = "Renombra las imágenes de la Galería (y sus variantes) al esquema por contenido: galeria/<especie>/<hash>.webp"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Solo muestra los cambios, no mueve archivos."
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        
+        for galeria in Galeria.all_objects.select_related('especie').iterator():
+            # Otra fila con el mismo archivo ya pudo moverlo (y actualizar esta) -> Se lee el nombre actual
+            galeria.refresh_from_db(fields=['imagen', 'variantes'])
+            storage = galeria.imagen.storage
+            anterior = galeria.imagen.name
+            
+            try:
+                with storage.open(anterior, 'rb') as archivo:
+                    huella = hash_archivo(archivo)
+            except OSError as error:
+                self.stderr.write(f"{anterior}: {error}")
+                continue
+            
+            nuevo = nombre_galeria(galeria.especie, huella, os.path.splitext(anterior)[1])
+            if nuevo == anterior:
+                continue
+            
+            self.stdout.write(f"{anterior} -> {nuevo}")
+            total += 1
+            if options['dry_run']:
+                continue
+            
+            galeria.imagen.name = mover_archivo(storage, anterior, nuevo)
+            for variante, datos in galeria.variantes.items():
+                datos['nombre'] = mover_archivo(storage, datos['nombre'], ruta_variante(galeria.imagen.name, variante))
+            
+            # Las filas que compartían el archivo se mueven con él
+            Galeria.all_objects.filter(imagen=anterior).update(imagen=galeria.imagen.name, variantes=galeria.variantes)
+            invalidar_especie(galeria.especie_id)
+        
+        self.stdout.write(self.style.SUCCESS(f"{total} imágenes renombradas."))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('especies', '0009_alter_especie_tipo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galeria',
+            name='variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('especies', '0010_galeria_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galeria',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('LISTA', 'Lista'), ('ERROR', 'Error')], default='LISTA', editable=False, max_length=10, verbose_name='Estado del procesamiento'), # Las imagenes existentes ya están convertidas
+        ),
+        migrations.AlterField(
+            model_name='galeria',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('LISTA', 'Lista'), ('ERROR', 'Error')], default='PENDIENTE', editable=False, max_length=10, verbose_name='Estado del procesamiento'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 18:20
+
+import apps.especies.almacenamiento
+import apps.especies.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('especies', '0011_galeria_estado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='galeria',
+            name='imagen',
+            field=models.ImageField(help_text='Sube una imagen de alta calidad.', storage=apps.especies.almacenamiento.AlmacenamientoPorContenido(), upload_to=apps.especies.utils.ruta_galeria, verbose_name='Fotografía'),
+        ),
+    ]
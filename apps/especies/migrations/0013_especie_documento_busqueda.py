@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+from apps.especies.busqueda import documento_busqueda
+
+
+# Llena el documento de búsqueda de las especies que ya existen
+def llenar_documentos(apps, schema_editor):
+    Especie = apps.get_model('especies', 'Especie')
+    Taxonomia = apps.get_model('especies', 'Taxonomia')
+
+    taxonomias = {taxonomia.especie_id: taxonomia for taxonomia in Taxonomia.objects.all()}
+    for especie in Especie.objects.all():
+        taxonomia = taxonomias.get(especie.id)
+        Especie.objects.filter(pk=especie.pk).update(documento_busqueda=documento_busqueda(
+            especie.nombre_comun,
+            especie.nombre_cientifico,
+            taxonomia.familia if taxonomia else '',
+            taxonomia.genero if taxonomia else '',
+        ))
+
+
+# Django no maneja índices FULLTEXT -> Solo en MySQL, las demás bases de datos usan LIKE
+def crear_indice_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX especies_especie_busqueda ON especies_especie (documento_busqueda)"
+        )
+
+
+def borrar_indice_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute("DROP INDEX especies_especie_busqueda ON especies_especie")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('especies', '0012_alter_galeria_imagen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='especie',
+            name='documento_busqueda',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(llenar_documentos, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_fulltext, borrar_indice_fulltext),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 15:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('especies', '0013_especie_documento_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='galeria',
+            index=models.Index(fields=['fecha_creacion', 'id'], name='galeria_fecha_id_idx'),
+        ),
+    ]
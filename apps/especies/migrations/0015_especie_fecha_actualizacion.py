@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('especies', '0014_galeria_fecha_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='especie',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última actualización'),
+        ),
+        migrations.AddField(
+            model_name='especiedetalle',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última actualización'),
+        ),
+        migrations.AddField(
+            model_name='taxonomia',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última actualización'),
+        ),
+    ]
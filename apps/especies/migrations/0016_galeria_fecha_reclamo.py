@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('especies', '0015_especie_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galeria',
+            name='fecha_reclamo',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
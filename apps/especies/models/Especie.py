@@ -1,8 +1,10 @@
 from django.db import models
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.utils.text import slugify
+from django.core.exceptions import ObjectDoesNotExist
 
 from apps.perfiles.models import Usuario
+from ..busqueda import documento_busqueda
 
 TIPO_CHOICES = [
     ('ARBOL', 'Árbol'),
@@ -99,6 +101,19 @@ class Especie(models.Model):
         verbose_name="Activa",
     )
     
+    # Nombres, familia y género en minúsculas y sin acentos para el buscador (ver busqueda.py)
+    # Se actualiza al guardar la Especie o su Taxonomia
+    documento_busqueda = models.TextField(
+        blank=True,
+        editable=False
+    )
+    
+    # Con las de su detalle y taxonomía -> Last-Modified de las páginas públicas (ver condicional.py)
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última actualización"
+    )
+    
     objects = EspecieManager() # Solo entrega Especies activas -> Respeta el EspecieManager
     all_objects = models.Manager() # Entrega Especies activas e inactivas
     
@@ -127,8 +142,22 @@ class Especie(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.nombre_cientifico)
+        self.actualizar_documento()
         super().save(*args, **kwargs)
     
+    def actualizar_documento(self):
+        try:
+            taxonomia = self.taxonomia
+        except ObjectDoesNotExist: # Todavía no tiene Taxonomia (se crea después de la Especie)
+            taxonomia = None
+        
+        self.documento_busqueda = documento_busqueda(
+            self.nombre_comun,
+            self.nombre_cientifico,
+            taxonomia.familia if taxonomia else '',
+            taxonomia.genero if taxonomia else '',
+        )
+    
     # No se elimina solo se desactiva la especie
     def soft_delete(self):
         self.is_active = False
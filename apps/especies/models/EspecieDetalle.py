@@ -61,6 +61,11 @@ class EspecieDetalle(models.Model):
         null=True
     )
     
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última actualización"
+    )
+    
     class Meta:
         verbose_name = "Detalle Botánico"
         verbose_name_plural = "Detalles Botánicos"
@@ -1,16 +1,17 @@
-from django.db import models
+from django.db import models, transaction
 
-import sys
-from io import BytesIO
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from PIL import Image
+from django.db.models import Q
+from django.core.files.base import ContentFile
 from ..models import Especie
-from ..utils import ruta_galeria, CATEGORIAS_CHOICES
+from ..utils import ruta_galeria, nombre_galeria, hash_archivo, CATEGORIAS_CHOICES, ESTADO_PROCESAMIENTO_CHOICES
+from ..almacenamiento import almacenamiento_por_contenido
+from ..cache import invalidar_especie
+from ..imagenes import VARIANTES, ruta_variante
 from apps.perfiles.models import Usuario
 
 class GaleriaManager(models.Manager):
     def get_queryset(self):
-        return super().get_queryset().filter(especie__is_active=True)
+        return super().get_queryset().filter(especie__is_active=True, estado='LISTA')
 
 class Galeria(models.Model):
     especie = models.ForeignKey(
@@ -29,6 +30,7 @@ class Galeria(models.Model):
     
     imagen = models.ImageField(
         upload_to=ruta_galeria,
+        storage=almacenamiento_por_contenido, # Misma foto -> mismo archivo
         verbose_name="Fotografía",
         help_text="Sube una imagen de alta calidad."
     )
@@ -44,43 +46,154 @@ class Galeria(models.Model):
         auto_now=True
     )
     
-    objects = GaleriaManager() # Solo entrega imagenes de Especies activas -> Respeta el GaleriaManager
+    estado = models.CharField(
+        max_length=10,
+        choices=ESTADO_PROCESAMIENTO_CHOICES,
+        default='PENDIENTE',
+        editable=False,
+        verbose_name="Estado del procesamiento"
+    )
+    
+    # Cuándo un worker la tomó de la cola -> Las que llevan demasiado en PROCESANDO se pueden reintentar
+    fecha_reclamo = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False
+    )
+    
+    # {variante: {'nombre': ruta, 'ancho': px}} -> Se llena al guardar una imagen nueva
+    variantes = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    
+    objects = GaleriaManager() # Solo entrega imagenes ya procesadas de Especies activas -> Respeta el GaleriaManager
     all_objects = models.Manager() # Entrega imagenes de Especies activas e inactivas
     
     class Meta:
         verbose_name = "Galería"
         verbose_name_plural = "Galería"
+        indexes = [
+            models.Index(fields=['fecha_creacion', 'id'], name='galeria_fecha_id_idx'), # Paginación por cursor
+        ]
         
     def __str__(self):
         return f'{self.categoria} de {self.especie}'
     
+    # URL de una variante, si no existe (imagen más chica o sin procesar) se usa la siguiente más grande
+    def variante_url(self, variante):
+        nombres = [nombre for nombre, _ in VARIANTES]
+        
+        for nombre in nombres[nombres.index(variante):]:
+            if nombre in self.variantes:
+                return self.imagen.storage.url(self.variantes[nombre]['nombre'])
+        return self.imagen.url
+    
+    @property
+    def url_thumb(self):
+        return self.variante_url('thumb')
+    
+    @property
+    def url_card(self):
+        return self.variante_url('card')
+    
+    @property
+    def url_carousel(self):
+        return self.variante_url('carousel')
+    
+    @property
+    def url_full(self):
+        return self.variante_url('full')
+    
+    # Para el atributo srcset de <img> -> "url 160w, url 480w, ..."
+    @property
+    def srcset(self):
+        variantes = sorted(self.variantes.values(), key=lambda datos: datos['ancho'])
+        return ', '.join(f"{self.imagen.storage.url(datos['nombre'])} {datos['ancho']}w" for datos in variantes)
+    
+    # Los archivos se comparten entre filas con el mismo contenido -> Solo se borran si nadie más los usa
+    def imagen_en_uso(self, nombre):
+        return Galeria.all_objects.filter(imagen=nombre).exclude(pk=self.pk).exists()
+    
+    def variantes_en_uso(self, variantes):
+        filtro = Q()
+        for variante, datos in variantes.items():
+            filtro |= Q(**{f'variantes__{variante}__nombre': datos['nombre']})
+        return Galeria.all_objects.filter(filtro).exclude(pk=self.pk).exists()
+    
+    # Las imágenes de una especie viven en galeria/<especie>/ -> Escribir un archivo, revisar si sigue en uso
+    # y borrarlo se hace con la Especie bloqueada, dentro de una transacción. Si no, una subida con el mismo
+    # contenido encuentra el archivo (y no lo escribe) justo antes de que se borre y su fila queda sin archivo.
+    @staticmethod
+    def bloquear_archivos(especie_id):
+        list(Especie.all_objects.select_for_update().filter(pk=especie_id).values_list('pk', flat=True))
+    
+    # Borra la imagen y las variantes que ya no usa ninguna otra fila (llamar con bloquear_archivos)
+    def liberar_archivos(self, nombre, variantes):
+        storage = self.imagen.storage
+        
+        if nombre and not self.imagen_en_uso(nombre):
+            storage.delete(nombre)
+        if variantes and not self.variantes_en_uso(variantes):
+            for datos in variantes.values():
+                storage.delete(datos['nombre'])
+    
+    # Escribe las variantes junto a la imagen, sin tocar la DB
+    def guardar_variantes(self, variantes):
+        storage = self.imagen.storage
+        
+        # Borramos las variantes de la imagen anterior (antes de escribir: pueden tener los mismos nombres)
+        if self.variantes and not self.variantes_en_uso(self.variantes):
+            for datos in self.variantes.values():
+                storage.delete(datos['nombre'])
+        
+        self.variantes = {}
+        for variante, ancho, contenido in variantes:
+            nombre = storage.save(ruta_variante(self.imagen.name, variante), ContentFile(contenido))
+            self.variantes[variante] = {'nombre': nombre, 'ancho': ancho}
+    
+    # Guarda el resultado del procesamiento en segundo plano (ver tareas.py)
+    # webp -> bytes de la imagen convertida (None si ya era WebP), variantes -> [(variante, ancho, bytes)]
+    def aplicar_procesamiento(self, webp, variantes):
+        storage = self.imagen.storage
+        nombre_original = self.imagen.name
+        
+        with transaction.atomic():
+            self.bloquear_archivos(self.especie_id)
+            
+            if webp is not None:
+                # Reemplazamos el archivo original por el .webp, nombrado por el hash del WebP
+                # Si alguien ya subió la misma foto, el archivo ya existe y no se vuelve a escribir
+                self.imagen.name = storage.save(nombre_galeria(self.especie, hash_archivo(webp)), ContentFile(webp))
+            
+            self.guardar_variantes(variantes)
+            self.estado = 'LISTA'
+            
+            # update() para no volver a disparar save()
+            Galeria.all_objects.filter(pk=self.pk).update(
+                imagen=self.imagen.name,
+                variantes=self.variantes,
+                estado=self.estado
+            )
+            
+            if self.imagen.name != nombre_original:
+                self.liberar_archivos(nombre_original, None)
+        
+        invalidar_especie(self.especie_id) # La imagen ya se muestra en la ficha
+    
     def save(self, *args, **kwargs):
-        if self.imagen:
-            img = Image.open(self.imagen)
+        # Archivo nuevo -> Se escribe (en pre_save) con los archivos de la especie bloqueados
+        # La conversión a WebP y las variantes se hacen en segundo plano -> manage.py procesar_galeria
+        if not (self.imagen and not self.imagen._committed):
+            return super().save(*args, **kwargs)
+        
+        self.estado = 'PENDIENTE'
+        with transaction.atomic():
+            self.bloquear_archivos(self.especie_id)
+            anterior = Galeria.all_objects.filter(pk=self.pk).values_list('imagen', flat=True).first() if self.pk else None
+            super().save(*args, **kwargs)
             
-            # Si no es WebP o es muy grande, procesamos
-            if img.format != 'WEBP':
-                output = BytesIO()
-                
-                # Convertimos a RGB si es necesario
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Guardamos como WebP
-                img.save(output, format='WEBP', quality=80)
-                output.seek(0)
-
-                # Cambiamos el nombre del archivo a .webp
-                nombre_nuevo = self.imagen.name.split('.')[0] + '.webp'
-                
-                # Reemplazamos el archivo en memoria
-                self.imagen = InMemoryUploadedFile(
-                    output, 
-                    'ImageField', 
-                    nombre_nuevo, 
-                    'image/webp', 
-                    sys.getsizeof(output), 
-                    None
-                )
-
-        super().save(*args, **kwargs)
\ No newline at end of file
+            # Se cambió la foto -> La anterior se borra si nadie más la usa (las variantes se reemplazan al procesar)
+            if anterior and anterior != self.imagen.name:
+                self.liberar_archivos(anterior, None)
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 
 from . import Especie
+from ..busqueda import documento_busqueda
 
 class Taxonomia(models.Model):
     especie = models.OneToOneField(
@@ -58,10 +59,36 @@ class Taxonomia(models.Model):
         db_index=True,
         help_text="Ej. Bursera"
     )
+    
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última actualización"
+    )
 
     class Meta:
         verbose_name = "Clasificación Taxonómica"
         verbose_name_plural = "Clasificaciones Taxonómicas"
 
     def __str__(self):
-        return f"Taxonomía de {self.especie}"
\ No newline at end of file
+        return f"Taxonomía de {self.especie}"
+    
+    # La familia y el género forman parte del documento de búsqueda de la especie
+    # El documento se guarda antes que la Taxonomia: su post_save mueve la firma del autocompletado
+    # (ver signals.py) y el índice que se reconstruya con esa firma ya tiene que ver los nombres nuevos
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            especie = self.especie
+            especie.taxonomia = self
+            especie.actualizar_documento()
+            Especie.all_objects.filter(pk=especie.pk).update(documento_busqueda=especie.documento_busqueda)
+            
+            super().save(*args, **kwargs)
+    
+    # Sin Taxonomia el documento se queda solo con los nombres
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            especie = self.especie
+            especie.documento_busqueda = documento_busqueda(especie.nombre_comun, especie.nombre_cientifico)
+            Especie.all_objects.filter(pk=especie.pk).update(documento_busqueda=especie.documento_busqueda)
+            
+            return super().delete(*args, **kwargs)
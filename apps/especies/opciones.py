@@ -0,0 +1,69 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .busqueda import buscar_especies
+from .cache import version, por_version, incrementar_version
+from .models import Especie, Taxonomia
+
+# Listas para los filtros (selects) de catálogo, galería y panel guardadas en la caché por versión.
+# Cada lista dice de qué modelos depende; al guardar o borrar uno de ellos (ver signals.py) su versión
+# sube y se vuelve a consultar en la siguiente petición. Para una lista nueva basta con crear otra ListaOpciones.
+# Si `construir` recibe parámetros (ej. la búsqueda) se guarda una copia por cada valor, todas con la misma versión.
+
+TIMEOUT_PARAMETROS = 60 * 60 # Las copias por parámetro se acumulan -> Que caduquen solas
+
+class ListaOpciones:
+    registradas = []
+
+    def __init__(self, clave, modelos, construir):
+        self.clave = f'opciones:{clave}'
+        self.modelos = modelos
+        self.construir = construir
+        ListaOpciones.registradas.append(self)
+
+    def obtener(self, *parametros):
+        if not parametros:
+            return por_version(self.clave, self.construir)
+        
+        llave = hashlib.md5(repr(parametros).encode()).hexdigest()
+        return cache.get_or_set(
+            f'{self.clave}:{version(self.clave)}:{llave}', lambda: self.construir(*parametros), TIMEOUT_PARAMETROS
+        )
+
+    def invalidar(self):
+        incrementar_version(self.clave)
+
+def modelos_con_listas():
+    return {modelo for lista in ListaOpciones.registradas for modelo in lista.modelos}
+
+def invalidar_listas(modelo):
+    for lista in ListaOpciones.registradas:
+        if modelo in lista.modelos:
+            lista.invalidar()
+
+# (id, nombre común) para el filtro por especie de la galería
+especies_activas = ListaOpciones('especies:activas', [Especie], lambda: list(
+    Especie.objects.values_list('id', 'nombre_comun').order_by('nombre_comun')
+))
+
+# En el panel también aparecen las especies desactivadas
+especies_todas = ListaOpciones('especies:todas', [Especie], lambda: list(
+    Especie.all_objects.values_list('id', 'nombre_comun').order_by('nombre_comun')
+))
+
+# Filas (tipo, estado, familia, total) de las especies que coinciden con la búsqueda -> Conteos del catálogo (ver facetas.py)
+def combinaciones(query):
+    queryset = Especie.objects.all()
+    if query:
+        queryset = queryset.filter(id__in=buscar_especies(query))
+    
+    return [
+        (tipo, estado, familia or '', total)
+        for tipo, estado, familia, total in queryset.values_list(
+            'tipo', 'estado_conservacion', 'taxonomia__familia'
+        ).annotate(total=Count('id')).order_by()
+    ]
+
+facetas_catalogo = ListaOpciones('facetas:catalogo', [Especie, Taxonomia], combinaciones)
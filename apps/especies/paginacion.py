@@ -0,0 +1,182 @@
+import base64
+import hashlib
+import json
+import math
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404
+
+# Paginación por cursor (keyset): en lugar de OFFSET n se pide "las siguientes filas después de esta",
+# con un WHERE sobre las columnas del orden (y el id para desempatar). Cuesta lo mismo en la página 1
+# que en la 500, siempre que haya un índice sobre esas columnas.
+# El total de páginas sale de un COUNT guardado en caché unos segundos -> Es aproximado.
+
+TIMEOUT_CONTEO = 60
+
+# ('-fecha_creacion', '-id') -> [('fecha_creacion', True), ('id', True)] (campo, descendente)
+def campos_orden(orden):
+    return [(campo.lstrip('-'), campo.startswith('-')) for campo in orden]
+
+# Valores de la fila <-> texto para la URL
+def codificar_cursor(valores):
+    texto = json.dumps(valores, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor, model, orden):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        campos = campos_orden(orden)
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            raise ValueError
+        return [model._meta.get_field(campo).to_python(valor) for (campo, _), valor in zip(campos, valores)]
+    except Exception:
+        raise Http404("Cursor inválido.")
+
+# Filas que van después (o antes) de `valores` según el orden:
+# (a > x) OR (a = x AND b > y) OR ... con > o < según la dirección de cada campo
+def filtro_cursor(orden, valores, anteriores=False):
+    filtro = Q()
+    iguales = {}
+    for (campo, descendente), valor in zip(campos_orden(orden), valores):
+        operador = 'lt' if descendente != anteriores else 'gt'
+        filtro |= Q(**iguales, **{f'{campo}__{operador}': valor})
+        iguales[campo] = valor
+    return filtro
+
+def invertir(orden):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+
+def valores_fila(fila, orden):
+    return [getattr(fila, campo) for campo, _ in campos_orden(orden)]
+
+# Solo hacia adelante y sin conteo (feeds con scroll infinito)
+# Regresa (filas, cursor de la siguiente página o '' si ya no hay más)
+def siguientes(queryset, orden, tamano, cursor=None):
+    if cursor:
+        queryset = queryset.filter(filtro_cursor(orden, decodificar_cursor(cursor, queryset.model, orden)))
+
+    filas = list(queryset.order_by(*orden)[:tamano + 1])
+    if len(filas) <= tamano:
+        return filas, ''
+    return filas[:tamano], codificar_cursor(valores_fila(filas[tamano - 1], orden))
+
+# COUNT(*) de la consulta filtrada, guardado en caché por su SQL
+def conteo_aproximado(queryset):
+    sql, parametros = queryset.order_by().query.sql_with_params()
+    clave = 'conteo:' + hashlib.md5(repr((sql, parametros)).encode()).hexdigest()
+    return cache.get_or_set(clave, queryset.count, TIMEOUT_CONTEO)
+
+class PaginadorCursor:
+    def __init__(self, count, per_page):
+        self.count = count
+        self.per_page = per_page
+        self.num_pages = max(1, math.ceil(count / per_page))
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+# Se comporta como el Page de Django para los templates (paginador.html) y las vistas
+class PaginaCursor:
+    es_cursor = True
+
+    def __init__(self, queryset, orden, tamano, cursor=None, anteriores=False, numero=1):
+        self.orden = list(orden)
+        self.paginator = PaginadorCursor(conteo_aproximado(queryset), tamano)
+
+        if cursor:
+            queryset = queryset.filter(filtro_cursor(self.orden, decodificar_cursor(cursor, queryset.model, self.orden), anteriores))
+
+        # Sin cursor hacia atrás es la última página: solo las filas que sobran de las páginas completas
+        # -> Mismos cortes que avanzando desde la primera
+        if anteriores and not cursor:
+            tamano = self.paginator.count - (self.paginator.num_pages - 1) * tamano
+
+        # Una fila de más para saber si hay otra página en esa dirección
+        filas = list(queryset.order_by(*(invertir(self.orden) if anteriores else self.orden))[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano]
+
+        if anteriores: # Se leyeron al revés -> Se regresan al orden normal
+            filas.reverse()
+            self._anterior, self._siguiente = hay_mas, bool(cursor) # Sin cursor -> Es la última página
+        else:
+            self._anterior, self._siguiente = bool(cursor), hay_mas
+
+        self.object_list = filas
+
+        # El número de página es informativo (viaja en la URL), los extremos se ajustan al conteo
+        if not self._anterior:
+            self.number = 1
+        elif not self._siguiente:
+            self.number = max(numero, self.paginator.num_pages) if anteriores else numero
+        else:
+            self.number = max(2, min(numero, self.paginator.num_pages - 1))
+
+    @property
+    def cursor_siguiente(self):
+        return codificar_cursor(valores_fila(self.object_list[-1], self.orden)) if self._siguiente and self.object_list else ''
+
+    @property
+    def cursor_anterior(self):
+        return codificar_cursor(valores_fila(self.object_list[0], self.orden)) if self._anterior and self.object_list else ''
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._siguiente
+
+    def has_previous(self):
+        return self._anterior
+
+    def has_other_pages(self):
+        return self._anterior or self._siguiente
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+# Para ListView: `orden_cursor` son los campos del orden terminando en un campo único (id)
+# - Por defecto ?page=n usa el Paginator normal (OFFSET)
+# - Con ?cursor= (vacío -> primera página) y &direccion=anterior se resuelve por keyset,
+#   los enlaces de paginador.html conservan el modo
+# - Las búsquedas ordenadas por relevancia siempre usan el Paginator normal
+class PaginacionCursorMixin:
+    orden_cursor = ('id',)
+
+    def usar_cursor(self, queryset):
+        if 'relevancia' in queryset.query.annotations:
+            return False
+
+        return 'cursor' in self.request.GET or 'direccion' in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.usar_cursor(queryset):
+            if not queryset.ordered:
+                queryset = queryset.order_by(*self.orden_cursor)
+            return super().paginate_queryset(queryset, page_size)
+
+        try:
+            numero = int(self.request.GET.get(self.page_kwarg) or 1)
+        except ValueError:
+            numero = 1
+
+        pagina = PaginaCursor(
+            queryset,
+            self.orden_cursor,
+            page_size,
+            cursor=self.request.GET.get('cursor'),
+            anteriores=self.request.GET.get('direccion') == 'anterior',
+            numero=numero,
+        )
+        return pagina.paginator, pagina, pagina.object_list, pagina.has_other_pages()
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from .models import Especie, EspecieDetalle, Taxonomia, Galeria, Url
+from .cache import invalidar_especie
+from .opciones import modelos_con_listas, invalidar_listas
+
+# bulk_create no envía post_save -> La subida masiva avisa con esta señal (sender=Galeria, especie=...)
+imagenes_creadas = Signal()
+
+# El worker terminó una imagen (update(), sin post_save) -> Ya puede usarse como portada (sender=Galeria, galeria=...)
+imagen_procesada = Signal()
+
+# Nombres, familia o género nuevos -> El autocompletado se reconstruye en la siguiente búsqueda
+@receiver(post_save, sender=Especie)
+@receiver(post_delete, sender=Especie)
+@receiver(post_save, sender=Taxonomia)
+@receiver(post_delete, sender=Taxonomia)
+def invalidar_autocompletar(sender, **kwargs):
+    from .autocompletar import indice
+    indice.invalidar()
+
+# Listas de los filtros (opciones.py): save(), soft_delete() y activar() pasan por post_save
+def invalidar_opciones(sender, **kwargs):
+    invalidar_listas(sender)
+
+for modelo in modelos_con_listas():
+    post_save.connect(invalidar_opciones, sender=modelo, dispatch_uid=f'opciones_{modelo._meta.label}_save')
+    post_delete.connect(invalidar_opciones, sender=modelo, dispatch_uid=f'opciones_{modelo._meta.label}_delete')
+
+# La ficha guardada de la especie deja de servir cuando cambia cualquiera de sus datos
+# (los cambios de la propia Especie ya mueven su fecha_actualizacion -> auto_now)
+@receiver(post_save, sender=EspecieDetalle)
+@receiver(post_delete, sender=EspecieDetalle)
+@receiver(post_save, sender=Taxonomia)
+@receiver(post_delete, sender=Taxonomia)
+@receiver(post_save, sender=Galeria)
+@receiver(post_delete, sender=Galeria)
+@receiver(post_save, sender=Url)
+@receiver(post_delete, sender=Url)
+def invalidar_pagina_datos_especie(sender, instance, **kwargs):
+    invalidar_especie(instance.especie_id)
+
+# Imagen borrada -> Su original y sus variantes se borran si ninguna otra fila los usa
+# Al confirmar la transacción: si el borrado se revierte, la fila sigue apuntando a sus archivos
+@receiver(post_delete, sender=Galeria)
+def liberar_archivos_galeria(sender, instance, **kwargs):
+    def liberar():
+        with transaction.atomic():
+            Galeria.bloquear_archivos(instance.especie_id)
+            instance.liberar_archivos(instance.imagen.name, instance.variantes)
+    
+    transaction.on_commit(liberar)
+
+@receiver(imagenes_creadas)
+def invalidar_pagina_imagenes_creadas(sender, especie, **kwargs):
+    invalidar_especie(especie.id)
@@ -0,0 +1,82 @@
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from .models import Galeria
+from .imagenes import procesar_imagen
+from .signals import imagen_procesada
+
+# Cola de procesamiento de la Galeria respaldada por la DB:
+# Las imagenes con estado PENDIENTE son los trabajos, un worker (manage.py procesar_galeria)
+# las reclama y las convierte en un pool de procesos sin bloquear las vistas.
+
+ERRORES_IMAGEN = (OSError, ValueError, Image.DecompressionBombError)
+
+# Más que esto en PROCESANDO -> El worker que la reclamó se cayó y --reintentar la regresa a la cola
+TIMEOUT_PROCESANDO = timedelta(minutes=30)
+
+# Marca como PROCESANDO hasta `limite` imagenes pendientes y regresa sus ids
+# skip_locked -> Varios workers pueden reclamar al mismo tiempo sin tomar las mismas imagenes
+def reclamar_pendientes(limite):
+    with transaction.atomic():
+        ids = list(
+            Galeria.all_objects.select_for_update(skip_locked=True)
+            .filter(estado='PENDIENTE')
+            .order_by('id')
+            .values_list('id', flat=True)[:limite]
+        )
+        Galeria.all_objects.filter(id__in=ids).update(estado='PROCESANDO', fecha_reclamo=timezone.now())
+    return ids
+
+# Regresa a la cola las imagenes con error y las que se quedaron a medias (worker caído)
+# Las que un worker vivo sigue procesando (reclamadas hace menos de TIMEOUT_PROCESANDO) no se tocan
+def reintentar_fallidas():
+    abandonadas = Q(estado='PROCESANDO') & (
+        Q(fecha_reclamo__lt=timezone.now() - TIMEOUT_PROCESANDO) | Q(fecha_reclamo__isnull=True)
+    )
+    return Galeria.all_objects.filter(Q(estado='ERROR') | abandonadas).update(estado='PENDIENTE')
+
+# Procesa un lote de imagenes pendientes en el pool, regresa cuantas se reclamaron
+# Cualquier falla (imagen dañada, error de la DB, pool caído) deja solo esa imagen en ERROR -> Ninguna se queda en PROCESANDO
+# Si el pool se cayó se avisa con BrokenProcessPool después de marcar el lote, el worker crea uno nuevo
+def procesar_pendientes(pool, limite, log=print):
+    ids = reclamar_pendientes(limite)
+    imagenes = Galeria.all_objects.select_related('especie').in_bulk(ids)
+    pool_caido = None
+
+    futuros = {}
+    for galeria in imagenes.values():
+        try:
+            with galeria.imagen.storage.open(galeria.imagen.name, 'rb') as archivo:
+                datos = archivo.read()
+            futuros[pool.submit(procesar_imagen, datos)] = galeria
+        except Exception as error:
+            marcar_error(galeria, error, log)
+            if isinstance(error, BrokenProcessPool):
+                pool_caido = error
+
+    # Guardamos cada imagen en cuanto termina, el pool sigue con las demás
+    for futuro in as_completed(futuros):
+        galeria = futuros[futuro]
+        try:
+            webp, variantes = futuro.result()
+            galeria.aplicar_procesamiento(webp, variantes)
+        except Exception as error:
+            marcar_error(galeria, error, log)
+            if isinstance(error, BrokenProcessPool):
+                pool_caido = error
+        else:
+            imagen_procesada.send(sender=Galeria, galeria=galeria)
+
+    if pool_caido:
+        raise pool_caido
+    return len(ids)
+
+def marcar_error(galeria, error, log):
+    log(f"{galeria.imagen.name}: {error}")
+    Galeria.all_objects.filter(pk=galeria.pk).update(estado='ERROR')
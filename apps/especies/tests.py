@@ -1,3 +1,886 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models.signals import post_save
+from django.http import Http404
+from django.test import SimpleTestCase, TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import condicional, tareas
+from .almacenamiento import almacenamiento_por_contenido
+from .busqueda import buscar_especies, documento_busqueda, filtrar, normalizar, relevancia, terminos
+from .cache import invalidar_especie
+from .facetas import con_conteo, contar_facetas
+from .imagenes import VARIANTES, codificar_variantes, procesar_imagen, ruta_variante
+from .models import Especie, Galeria, Taxonomia, Url
+from .opciones import ListaOpciones, especies_activas, especies_todas
+from .paginacion import PaginaCursor, codificar_cursor, decodificar_cursor, filtro_cursor, siguientes
+from .utils import hash_archivo, nombre_galeria, ruta_galeria
+from .views.public import EspecieDetailView
+
+MEDIA_PRUEBAS = tempfile.mkdtemp(prefix='arboles-pruebas-')
+
+# Las pruebas no tocan la caché compartida (sesiones, páginas guardadas) ni los archivos de MEDIA_ROOT
+# y no necesitan collectstatic
+PRUEBAS = override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    MEDIA_ROOT=MEDIA_PRUEBAS,
+)
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_PRUEBAS, ignore_errors=True)
+
+def imagen(ancho, alto, formato='PNG'):
+    salida = BytesIO()
+    Image.new('RGB', (ancho, alto), 'green').save(salida, format=formato)
+    return salida.getvalue()
+
+def tamano(datos):
+    return Image.open(BytesIO(datos)).size
+
+def ejecutar(comando, *args):
+    salida, errores = StringIO(), StringIO()
+    call_command(comando, *args, stdout=salida, stderr=errores)
+    return salida.getvalue(), errores.getvalue()
+
+def crear_usuario(username='staff', **kwargs):
+    return get_user_model().objects.create_user(username=username, password='clave', **kwargs)
+
+def crear_especies(creador, nombres):
+    return [
+        Especie.objects.create(nombre_comun=f'Común {nombre}', nombre_cientifico=nombre, creador=creador)
+        for nombre in nombres
+    ]
+
+# El color cambia el contenido -> Cada imagen tiene su propio archivo
+def crear_imagen(especie, color=(0, 128, 0), ancho=400, **kwargs):
+    salida = BytesIO()
+    Image.new('RGB', (ancho, ancho // 2), color).save(salida, format='PNG')
+    archivo = SimpleUploadedFile('foto.png', salida.getvalue(), content_type='image/png')
+    return Galeria.all_objects.create(especie=especie, autor=especie.creador, imagen=archivo, **kwargs)
+
+@PRUEBAS
+class VariantesTests(SimpleTestCase):
+    def test_ruta_variante(self):
+        self.assertEqual(ruta_variante('galeria/ceiba/abc.webp', 'card'), 'galeria/ceiba/abc_card.webp')
+        self.assertEqual(ruta_variante('galeria/ceiba/abc.jpg', 'thumb'), 'galeria/ceiba/abc_thumb.webp')
+
+    def test_codificar_variantes_anchos(self):
+        variantes = codificar_variantes(Image.new('RGB', (2400, 1200)))
+        self.assertEqual([(nombre, ancho) for nombre, ancho, _ in variantes], VARIANTES)
+        for (_, ancho, datos), (_, esperado) in zip(variantes, VARIANTES):
+            self.assertEqual(tamano(datos), (esperado, esperado // 2))
+            self.assertEqual(Image.open(BytesIO(datos)).format, 'WEBP')
+
+    def test_codificar_variantes_no_agranda(self):
+        variantes = codificar_variantes(Image.new('RGBA', (300, 100)))
+        self.assertEqual([(nombre, ancho) for nombre, ancho, _ in variantes], [('thumb', 160), ('card', 300)])
+        self.assertEqual(tamano(variantes[1][2]), (300, 100))
+
+    def test_procesar_imagen(self):
+        webp, variantes = procesar_imagen(imagen(500, 250))
+        self.assertEqual(Image.open(BytesIO(webp)).format, 'WEBP')
+        self.assertEqual([ancho for _, ancho, _ in variantes], [160, 480, 500])
+
+        # Si ya era WebP no se vuelve a convertir el original
+        webp, _ = procesar_imagen(imagen(200, 100, formato='WEBP'))
+        self.assertIsNone(webp)
+
+    def test_variante_url_usa_la_siguiente_mas_grande(self):
+        galeria = Galeria(imagen='galeria/ceiba/abc.webp', variantes={
+            'thumb': {'nombre': 'galeria/ceiba/abc_thumb.webp', 'ancho': 160},
+            'carousel': {'nombre': 'galeria/ceiba/abc_carousel.webp', 'ancho': 1200},
+        })
+        self.assertEqual(galeria.url_thumb, '/media/galeria/ceiba/abc_thumb.webp')
+        self.assertEqual(galeria.url_card, '/media/galeria/ceiba/abc_carousel.webp')
+        self.assertEqual(galeria.url_carousel, '/media/galeria/ceiba/abc_carousel.webp')
+        self.assertEqual(galeria.url_full, '/media/galeria/ceiba/abc.webp') # Sin variante -> El original
+
+    def test_variante_url_sin_procesar(self):
+        galeria = Galeria(imagen='galeria/ceiba/abc.jpg')
+        self.assertEqual(galeria.url_thumb, '/media/galeria/ceiba/abc.jpg')
+        self.assertEqual(galeria.srcset, '')
+
+    def test_srcset(self):
+        galeria = Galeria(imagen='galeria/ceiba/abc.webp', variantes={
+            'card': {'nombre': 'galeria/ceiba/abc_card.webp', 'ancho': 480},
+            'thumb': {'nombre': 'galeria/ceiba/abc_thumb.webp', 'ancho': 160},
+        })
+        self.assertEqual(
+            galeria.srcset,
+            '/media/galeria/ceiba/abc_thumb.webp 160w, /media/galeria/ceiba/abc_card.webp 480w',
+        )
+
+# Un pool de hilos tiene la misma interfaz que el de procesos y comparte la base de datos de la prueba
+@PRUEBAS
+class ColaGaleriaTests(TestCase):
+    def setUp(self):
+        self.especie, = crear_especies(crear_usuario(), ['Ceiba pentandra'])
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+
+    def estados(self, *galerias):
+        return [Galeria.all_objects.get(pk=galeria.pk).estado for galeria in galerias]
+
+    def test_subida_queda_pendiente(self):
+        galeria = crear_imagen(self.especie)
+        self.assertEqual(galeria.estado, 'PENDIENTE')
+        self.assertTrue(galeria.imagen.name.endswith('.png'))
+        self.assertFalse(Galeria.objects.filter(pk=galeria.pk).exists()) # Aún no se muestra
+
+    def test_reclamar_pendientes(self):
+        galerias = [crear_imagen(self.especie, color=(0, i, 0)) for i in range(3)]
+
+        primeras = tareas.reclamar_pendientes(2)
+        self.assertEqual(primeras, [galerias[0].pk, galerias[1].pk])
+        self.assertEqual(self.estados(*galerias), ['PROCESANDO', 'PROCESANDO', 'PENDIENTE'])
+        self.assertIsNotNone(Galeria.all_objects.get(pk=galerias[0].pk).fecha_reclamo)
+
+        # Las ya reclamadas no se vuelven a entregar
+        self.assertEqual(tareas.reclamar_pendientes(2), [galerias[2].pk])
+        self.assertEqual(tareas.reclamar_pendientes(2), [])
+
+    @skipUnlessDBFeature('has_select_for_update_skip_locked')
+    def test_reclamar_salta_las_bloqueadas(self):
+        crear_imagen(self.especie)
+        with CaptureQueriesContext(connection) as consultas:
+            tareas.reclamar_pendientes(1)
+        self.assertTrue(any('SKIP LOCKED' in consulta['sql'] for consulta in consultas))
+
+    def test_procesar_pendientes(self):
+        galeria = crear_imagen(self.especie, ancho=600)
+        original = galeria.imagen.name
+
+        self.assertEqual(tareas.procesar_pendientes(self.pool, 10, log=lambda _: None), 1)
+
+        galeria = Galeria.all_objects.get(pk=galeria.pk)
+        self.assertEqual(galeria.estado, 'LISTA')
+        self.assertTrue(galeria.imagen.name.endswith('.webp'))
+        self.assertEqual([datos['ancho'] for datos in galeria.variantes.values()], [160, 480, 600])
+
+        storage = galeria.imagen.storage
+        self.assertTrue(storage.exists(galeria.imagen.name))
+        self.assertTrue(all(storage.exists(datos['nombre']) for datos in galeria.variantes.values()))
+        self.assertFalse(storage.exists(original)) # El PNG se reemplazó por el WebP
+        self.assertTrue(Galeria.objects.filter(pk=galeria.pk).exists())
+
+    def test_imagen_danada_queda_en_error(self):
+        danada = Galeria.all_objects.create(
+            especie=self.especie, autor=self.especie.creador,
+            imagen=SimpleUploadedFile('foto.jpg', b'no es una imagen', content_type='image/jpeg'),
+        )
+        buena = crear_imagen(self.especie)
+        errores = []
+
+        tareas.procesar_pendientes(self.pool, 10, log=errores.append)
+
+        self.assertEqual(self.estados(danada, buena), ['ERROR', 'LISTA'])
+        self.assertEqual(len(errores), 1)
+
+    def test_cualquier_falla_deja_la_imagen_en_error(self):
+        galerias = [crear_imagen(self.especie, color=(0, i, 0)) for i in range(2)]
+        aplicar = Galeria.aplicar_procesamiento
+
+        def fallar_la_primera(galeria, *args):
+            if galeria.pk == galerias[0].pk:
+                raise DatabaseError("Conexión perdida")
+            return aplicar(galeria, *args)
+
+        with mock.patch.object(Galeria, 'aplicar_procesamiento', fallar_la_primera):
+            tareas.procesar_pendientes(self.pool, 10, log=lambda _: None)
+
+        self.assertEqual(self.estados(*galerias), ['ERROR', 'LISTA'])
+
+    def test_pool_caido(self):
+        galeria = crear_imagen(self.especie)
+        roto = mock.Mock(submit=mock.Mock(side_effect=tareas.BrokenProcessPool("Pool caído")))
+
+        with self.assertRaises(tareas.BrokenProcessPool):
+            tareas.procesar_pendientes(roto, 10, log=lambda _: None)
+        self.assertEqual(self.estados(galeria), ['ERROR'])
+
+    def test_reintentar_fallidas(self):
+        error, reciente, abandonada, lista = [crear_imagen(self.especie, color=(0, i, 0)) for i in range(4)]
+        Galeria.all_objects.filter(pk=error.pk).update(estado='ERROR')
+        Galeria.all_objects.filter(pk=reciente.pk).update(estado='PROCESANDO', fecha_reclamo=timezone.now())
+        Galeria.all_objects.filter(pk=abandonada.pk).update(
+            estado='PROCESANDO', fecha_reclamo=timezone.now() - tareas.TIMEOUT_PROCESANDO - timedelta(minutes=1)
+        )
+        Galeria.all_objects.filter(pk=lista.pk).update(estado='LISTA')
+
+        self.assertEqual(tareas.reintentar_fallidas(), 2)
+        self.assertEqual(self.estados(error, reciente, abandonada, lista), ['PENDIENTE', 'PROCESANDO', 'PENDIENTE', 'LISTA'])
+
+@PRUEBAS
+class NombresPorContenidoTests(TestCase):
+    def setUp(self):
+        self.especie, = crear_especies(crear_usuario(), ['Ceiba pentandra'])
+        self.storage = almacenamiento_por_contenido
+
+    def test_ruta_galeria(self):
+        datos = imagen(10, 10)
+        galeria = Galeria(especie=self.especie, imagen=SimpleUploadedFile('Foto Ceiba.JPG', datos))
+        self.assertEqual(
+            ruta_galeria(galeria, 'Foto Ceiba.JPG'),
+            f'galeria/ceiba-pentandra/{hash_archivo(datos)}.jpg',
+        )
+
+    # Filas con los nombres de antes (ceiba_1.png), dos de ellas compartiendo el mismo archivo
+    def test_renombrar_galeria(self):
+        datos, otros = imagen(20, 10), imagen(30, 10)
+        self.storage.save('galeria/ceiba-pentandra/ceiba_1.png', ContentFile(datos))
+        self.storage.save('galeria/ceiba-pentandra/ceiba_1_thumb.webp', ContentFile(b'variante'))
+        self.storage.save('galeria/ceiba-pentandra/ceiba_2.png', ContentFile(otros))
+
+        variantes = {'thumb': {'nombre': 'galeria/ceiba-pentandra/ceiba_1_thumb.webp', 'ancho': 20}}
+        compartidas = [
+            Galeria.all_objects.create(
+                especie=self.especie, autor=self.especie.creador,
+                imagen='galeria/ceiba-pentandra/ceiba_1.png', variantes=variantes,
+            )
+            for _ in range(2)
+        ]
+        sola = Galeria.all_objects.create(
+            especie=self.especie, autor=self.especie.creador, imagen='galeria/ceiba-pentandra/ceiba_2.png'
+        )
+
+        ejecutar('renombrar_galeria', '--dry-run')
+        self.assertTrue(self.storage.exists('galeria/ceiba-pentandra/ceiba_1.png'))
+
+        salida, errores = ejecutar('renombrar_galeria')
+        self.assertEqual(errores, '')
+        self.assertIn('2 imágenes renombradas', salida)
+
+        nuevo = nombre_galeria(self.especie, hash_archivo(datos), '.png')
+        for galeria in compartidas:
+            galeria.refresh_from_db()
+            self.assertEqual(galeria.imagen.name, nuevo)
+            self.assertEqual(galeria.variantes['thumb']['nombre'], nuevo.replace('.png', '_thumb.webp'))
+        self.assertTrue(self.storage.exists(nuevo))
+        self.assertTrue(self.storage.exists(nuevo.replace('.png', '_thumb.webp')))
+        self.assertFalse(self.storage.exists('galeria/ceiba-pentandra/ceiba_1.png'))
+
+        sola.refresh_from_db()
+        self.assertEqual(sola.imagen.name, nombre_galeria(self.especie, hash_archivo(otros), '.png'))
+
+        # Ya están en el esquema nuevo -> Una segunda corrida no hace nada
+        salida, errores = ejecutar('renombrar_galeria')
+        self.assertIn('0 imágenes renombradas', salida)
+
+@PRUEBAS
+class ArchivosCompartidosTests(TestCase):
+    def setUp(self):
+        self.especie, = crear_especies(crear_usuario(), ['Ceiba pentandra'])
+        self.storage = almacenamiento_por_contenido
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.pool.shutdown)
+
+    def archivos(self, galeria):
+        galeria.refresh_from_db()
+        return [galeria.imagen.name, *[datos['nombre'] for datos in galeria.variantes.values()]]
+
+    def test_misma_foto_mismo_archivo(self):
+        primera = crear_imagen(self.especie, color=(1, 2, 3))
+        archivos = set(self.storage.listdir('galeria/ceiba-pentandra')[1])
+        segunda = crear_imagen(self.especie, color=(1, 2, 3))
+
+        self.assertEqual(primera.imagen.name, segunda.imagen.name)
+        self.assertEqual(set(self.storage.listdir('galeria/ceiba-pentandra')[1]), archivos) # No se escribió otro
+
+    def test_procesar_conserva_el_original_mientras_otra_fila_lo_usa(self):
+        primera, segunda = crear_imagen(self.especie), crear_imagen(self.especie)
+        original = primera.imagen.name
+
+        tareas.reclamar_pendientes(1) # Solo la primera
+        primera = Galeria.all_objects.get(pk=primera.pk)
+        primera.aplicar_procesamiento(*procesar_imagen(self.storage.open(original).read()))
+        self.assertTrue(self.storage.exists(original)) # La segunda sigue pendiente con el PNG
+
+        tareas.procesar_pendientes(self.pool, 10, log=lambda _: None)
+        self.assertEqual(self.archivos(primera), self.archivos(segunda))
+        self.assertFalse(self.storage.exists(original))
+        self.assertTrue(all(self.storage.exists(nombre) for nombre in self.archivos(segunda)))
+
+    def test_borrar_libera_los_archivos_que_nadie_usa(self):
+        primera, segunda = crear_imagen(self.especie), crear_imagen(self.especie)
+        tareas.procesar_pendientes(self.pool, 10, log=lambda _: None)
+        archivos = self.archivos(primera)
+        self.assertEqual(len(archivos), 3) # Original, thumb y card (400px)
+        self.assertEqual(self.archivos(segunda), archivos)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            primera.delete()
+        self.assertTrue(all(self.storage.exists(nombre) for nombre in archivos)) # La segunda los usa
+
+        with self.captureOnCommitCallbacks(execute=True):
+            segunda.delete()
+        self.assertFalse(any(self.storage.exists(nombre) for nombre in archivos))
+
+    def test_borrado_revertido_no_borra_archivos(self):
+        galeria = crear_imagen(self.especie)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            galeria.delete()
+        # Sin ejecutar los callbacks (la transacción no se confirmó) el archivo sigue ahí
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(self.storage.exists(galeria.imagen.name))
+
+    def test_cambiar_la_foto_libera_la_anterior(self):
+        galeria = crear_imagen(self.especie)
+        anterior = galeria.imagen.name
+
+        salida = BytesIO()
+        Image.new('RGB', (50, 50), 'red').save(salida, format='PNG')
+        galeria.imagen = SimpleUploadedFile('otra.png', salida.getvalue())
+        galeria.save()
+
+        self.assertNotEqual(galeria.imagen.name, anterior)
+        self.assertFalse(self.storage.exists(anterior))
+        self.assertTrue(self.storage.exists(galeria.imagen.name))
+        self.assertEqual(galeria.estado, 'PENDIENTE')
+
+@PRUEBAS
+class BusquedaTests(TestCase):
+    def test_normalizar_quita_acentos_mayusculas_y_espacios(self):
+        self.assertEqual(normalizar("Árbol  de Fuego"), "arbol de fuego")
+        self.assertEqual(normalizar("  Ñandú\tÁRBOL "), "nandu arbol")
+        self.assertEqual(normalizar(None), "")
+
+    def test_terminos(self):
+        self.assertEqual(terminos("Ceiba, pentandra!"), ['ceiba', 'pentandra'])
+        self.assertEqual(terminos("  "), [])
+
+    def test_documento_busqueda(self):
+        self.assertEqual(
+            documento_busqueda('Ceiba', 'Ceiba pentandra', 'Malváceas', None),
+            'ceiba ceiba pentandra malvaceas',
+        )
+
+    def test_relevancia_palabra_completa_prefijo_y_subcadena(self):
+        documento = 'ceiba pentandra malvaceas'
+        self.assertEqual(relevancia(documento, ['ceiba']), 3)
+        self.assertEqual(relevancia(documento, ['cei']), 2)
+        self.assertEqual(relevancia(documento, ['iba']), 1)
+        self.assertEqual(relevancia(documento, ['ceiba', 'pent']), 5)
+
+    def test_documento_se_guarda_con_la_especie(self):
+        especie, = crear_especies(crear_usuario(), ['Tabebuia rosea'])
+        especie.refresh_from_db()
+        self.assertEqual(especie.documento_busqueda, 'comun tabebuia rosea tabebuia rosea')
+
+    def test_buscar_todas_las_palabras_sin_acentos(self):
+        ceiba, tabebuia, _ = crear_especies(crear_usuario(), ['Ceiba pentandra', 'Tabebuia rosea', 'Ceiba aesculifolia'])
+        Especie.objects.filter(pk=tabebuia.pk).update(documento_busqueda=normalizar('Árbol rosa Tabebuia rosea'))
+
+        self.assertEqual(set(buscar_especies('ÁRBOL')), {tabebuia.id})
+        self.assertEqual(set(buscar_especies('ceiba pent')), {ceiba.id})
+        self.assertEqual(buscar_especies('ceiba roble'), {})
+        self.assertEqual(buscar_especies(' ,. '), {})
+
+    def test_filtrar_ordena_por_relevancia(self):
+        # "rosa" es palabra completa en una, prefijo en otra y subcadena en la última
+        subcadena, prefijo, completa = crear_especies(crear_usuario(), ['Aa', 'Bb', 'Cc'])
+        for especie, documento in [(subcadena, 'verderosa'), (prefijo, 'rosaceas'), (completa, 'rosa')]:
+            Especie.objects.filter(pk=especie.pk).update(documento_busqueda=documento)
+
+        resultado = filtrar(Especie.objects.order_by('nombre_cientifico'), 'rosa')
+        self.assertEqual([especie.id for especie in resultado], [completa.id, prefijo.id, subcadena.id])
+        self.assertFalse(filtrar(Especie.objects.all(), 'roble').exists())
+
+    def test_catalogo_filtra_con_el_buscador(self):
+        crear_especies(crear_usuario(), ['Ceiba pentandra', 'Tabebuia rosea'])
+        respuesta = self.client.get('/especies/', {'query': 'ceiba'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([especie.nombre_cientifico for especie in respuesta.context['especies']], ['Ceiba pentandra'])
+        self.assertEqual(respuesta.context['query'], 'ceiba')
+
+@PRUEBAS
+class TaxonomiaBusquedaTests(TestCase):
+    def setUp(self):
+        self.especie, = crear_especies(crear_usuario(), ['Ceiba pentandra'])
+        self.taxonomia = Taxonomia.objects.create(
+            especie=self.especie, division='Streptophyta', clase='Equisetopsida', orden='Malvales',
+            familia='Malvaceae', genero='Ceiba',
+        )
+
+    def autocompletar(self, query):
+        respuesta = self.client.get('/especies/autocompletar', {'query': query})
+        return [resultado['nombre_cientifico'] for resultado in respuesta.json()['resultados']]
+
+    def test_renombrar_taxon_cambia_busqueda_y_autocompletado(self):
+        self.assertEqual(set(buscar_especies('malvaceae')), {self.especie.id})
+        self.assertEqual(self.autocompletar('malvaceae'), ['Ceiba pentandra'])
+
+        self.taxonomia.familia = 'Bombacaceae'
+        self.taxonomia.save()
+
+        self.assertEqual(set(buscar_especies('bombacaceae')), {self.especie.id})
+        self.assertEqual(buscar_especies('malvaceae'), {})
+        self.assertEqual(self.autocompletar('bombacaceae'), ['Ceiba pentandra'])
+        self.assertEqual(self.autocompletar('malvaceae'), [])
+
+    def test_documento_listo_antes_de_invalidar(self):
+        # Lo que vería otro proceso que reconstruye el índice en cuanto cambia la firma
+        vistos = []
+        def leer_documento(sender, instance, **kwargs):
+            vistos.append(Especie.all_objects.get(pk=instance.pk).documento_busqueda)
+        post_save.connect(leer_documento, sender=Taxonomia)
+        self.addCleanup(post_save.disconnect, leer_documento, sender=Taxonomia)
+
+        self.taxonomia.genero = 'Bombax'
+        self.taxonomia.save()
+        self.assertEqual(len(vistos), 1)
+        self.assertIn('bombax', vistos[0].split())
+
+    def test_borrar_taxonomia_quita_familia_y_genero(self):
+        self.assertEqual(self.autocompletar('malvaceae'), ['Ceiba pentandra'])
+        self.taxonomia.delete()
+
+        self.especie.refresh_from_db()
+        self.assertEqual(self.especie.documento_busqueda, 'comun ceiba pentandra ceiba pentandra')
+        self.assertEqual(buscar_especies('malvaceae'), {})
+        self.assertEqual(self.autocompletar('malvaceae'), [])
+
+@PRUEBAS
+class CachePaginaEspecieTests(TestCase):
+    def setUp(self):
+        cache.clear() # LocMemCache de las pruebas, no la caché del sitio
+        self.creador = crear_usuario()
+        self.especie, = crear_especies(self.creador, ['Ceiba pentandra'])
+        self.detalle = f'/especies/detalle/{self.especie.slug}'
+        self.clave = f'pagina:especie:{self.especie.slug}'
+
+    def test_visitante_recibe_la_pagina_guardada(self):
+        self.assertEqual(self.client.get(self.detalle).status_code, 200)
+        guardada = cache.get(self.clave)
+        self.assertEqual(guardada['version'], Especie.objects.get(pk=self.especie.pk).fecha_actualizacion)
+
+        with mock.patch.object(EspecieDetailView, 'get_context_data') as renderizar:
+            respuesta = self.client.get(self.detalle)
+        renderizar.assert_not_called()
+        self.assertEqual(respuesta.content, guardada['contenido'])
+
+    def test_nueva_fecha_actualizacion_vuelve_a_generar_la_pagina(self):
+        self.client.get(self.detalle)
+        # Otro proceso cambia la especie sin pasar por las señales de este
+        Especie.all_objects.filter(pk=self.especie.pk).update(nombre_comun='Pochote')
+        self.assertNotContains(self.client.get(self.detalle), 'Pochote') # Misma versión -> Página guardada
+
+        invalidar_especie(self.especie.pk)
+        self.assertContains(self.client.get(self.detalle), 'Pochote')
+        self.assertEqual(cache.get(self.clave)['version'], Especie.objects.get(pk=self.especie.pk).fecha_actualizacion)
+
+    def test_cambios_en_sus_datos_invalidan_la_pagina(self):
+        self.client.get(self.detalle)
+        Url.objects.create(especie=self.especie, tipo='Wiki', url='https://es.wikipedia.org/wiki/Ceiba_pentandra')
+        self.assertContains(self.client.get(self.detalle), 'https://es.wikipedia.org/wiki/Ceiba_pentandra')
+
+    def test_detalle_inactivo_es_404(self):
+        self.client.get(self.detalle)
+        self.especie.soft_delete()
+        self.assertEqual(self.client.get(self.detalle).status_code, 404)
+
+    def test_usuarios_autenticados_no_usan_la_pagina_guardada(self):
+        self.client.force_login(self.creador)
+        self.assertEqual(self.client.get(self.detalle).status_code, 200)
+        self.assertIsNone(cache.get(self.clave))
+
+@PRUEBAS
+class PaginacionTests(TestCase):
+    orden = ('nombre_cientifico', 'id')
+
+    def setUp(self):
+        cache.clear() # El conteo aproximado se guarda en caché
+        # Desordenadas a propósito -> El orden sale del ORDER BY
+        crear_especies(crear_usuario(), ['Eugenia', 'Acacia', 'Dalbergia', 'Bursera', 'Ceiba'])
+        self.nombres = ['Acacia', 'Bursera', 'Ceiba', 'Dalbergia', 'Eugenia']
+
+    def nombres_de(self, filas):
+        return [fila.nombre_cientifico for fila in filas]
+
+    def test_cursor_ida_y_vuelta(self):
+        especie = Especie.objects.get(nombre_cientifico='Ceiba')
+        cursor = codificar_cursor([especie.nombre_cientifico, especie.id])
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decodificar_cursor(cursor, Especie, self.orden), ['Ceiba', especie.id])
+
+    def test_cursor_invalido_es_404(self):
+        for cursor in ['no-es-base64!', codificar_cursor(['Ceiba']), codificar_cursor({'a': 1}), codificar_cursor(['Ceiba', 'x'])]:
+            with self.subTest(cursor=cursor), self.assertRaises(Http404):
+                decodificar_cursor(cursor, Especie, self.orden)
+
+    def test_filtro_cursor(self):
+        ceiba = Especie.objects.get(nombre_cientifico='Ceiba')
+        valores = [ceiba.nombre_cientifico, ceiba.id]
+
+        despues = Especie.objects.filter(filtro_cursor(self.orden, valores)).order_by(*self.orden)
+        self.assertEqual(self.nombres_de(despues), ['Dalbergia', 'Eugenia'])
+
+        antes = Especie.objects.filter(filtro_cursor(self.orden, valores, anteriores=True)).order_by(*self.orden)
+        self.assertEqual(self.nombres_de(antes), ['Acacia', 'Bursera'])
+
+        descendente = ('-nombre_cientifico', '-id')
+        despues = Especie.objects.filter(filtro_cursor(descendente, valores)).order_by(*descendente)
+        self.assertEqual(self.nombres_de(despues), ['Bursera', 'Acacia'])
+
+    def test_filtro_cursor_desempata_por_id(self):
+        Especie.objects.filter(nombre_cientifico__in=['Bursera', 'Ceiba']).update(nombre_comun='Repetido')
+        orden = ('nombre_comun', 'id')
+        bursera = Especie.objects.get(nombre_cientifico='Bursera')
+
+        despues = Especie.objects.filter(nombre_comun='Repetido').filter(
+            filtro_cursor(orden, [bursera.nombre_comun, bursera.id])
+        )
+        self.assertEqual(self.nombres_de(despues), ['Ceiba'])
+
+    def test_pagina_cursor_adelante_y_atras(self):
+        primera = PaginaCursor(Especie.objects.all(), self.orden, 2)
+        self.assertEqual(self.nombres_de(primera), ['Acacia', 'Bursera'])
+        self.assertEqual((primera.number, primera.paginator.num_pages), (1, 3))
+        self.assertFalse(primera.has_previous())
+        self.assertTrue(primera.has_next())
+        self.assertEqual(primera.cursor_anterior, '')
+
+        segunda = PaginaCursor(Especie.objects.all(), self.orden, 2, cursor=primera.cursor_siguiente, numero=2)
+        self.assertEqual(self.nombres_de(segunda), ['Ceiba', 'Dalbergia'])
+        self.assertEqual(segunda.number, 2)
+        self.assertTrue(segunda.has_previous() and segunda.has_next())
+
+        tercera = PaginaCursor(Especie.objects.all(), self.orden, 2, cursor=segunda.cursor_siguiente, numero=3)
+        self.assertEqual(self.nombres_de(tercera), ['Eugenia'])
+        self.assertFalse(tercera.has_next())
+        self.assertEqual(tercera.cursor_siguiente, '')
+
+        # De regreso desde la tercera
+        atras = PaginaCursor(Especie.objects.all(), self.orden, 2, cursor=tercera.cursor_anterior, anteriores=True, numero=2)
+        self.assertEqual(self.nombres_de(atras), ['Ceiba', 'Dalbergia'])
+        self.assertTrue(atras.has_previous() and atras.has_next())
+
+        inicio = PaginaCursor(Especie.objects.all(), self.orden, 2, cursor=atras.cursor_anterior, anteriores=True, numero=1)
+        self.assertEqual(self.nombres_de(inicio), ['Acacia', 'Bursera'])
+        self.assertEqual(inicio.number, 1)
+        self.assertFalse(inicio.has_previous())
+
+    def test_ultima_pagina_con_los_cortes_de_ida(self):
+        ultima = PaginaCursor(Especie.objects.all(), self.orden, 2, anteriores=True, numero=3)
+        self.assertEqual(self.nombres_de(ultima), ['Eugenia'])
+        self.assertEqual(ultima.number, 3)
+        self.assertTrue(ultima.has_previous())
+        self.assertFalse(ultima.has_next())
+
+        atras = PaginaCursor(Especie.objects.all(), self.orden, 2, cursor=ultima.cursor_anterior, anteriores=True, numero=2)
+        self.assertEqual(self.nombres_de(atras), ['Ceiba', 'Dalbergia'])
+
+        # Páginas completas -> La última también
+        Especie.objects.get(nombre_cientifico='Eugenia').delete()
+        cache.clear()
+        ultima = PaginaCursor(Especie.objects.all(), self.orden, 2, anteriores=True, numero=2)
+        self.assertEqual(self.nombres_de(ultima), ['Ceiba', 'Dalbergia'])
+
+    def test_catalogo_usa_offset_por_defecto(self):
+        respuesta = self.client.get('/especies/')
+        self.assertEqual(respuesta.status_code, 200)
+        pagina = respuesta.context['page_obj']
+        self.assertFalse(getattr(pagina, 'es_cursor', False))
+        self.assertEqual(self.nombres_de(pagina), self.nombres)
+
+    def test_catalogo_con_cursor(self):
+        crear_especies(Especie.objects.first().creador, [f'Zanthoxylum {numero:02}' for numero in range(8)])
+        todas = self.nombres + [f'Zanthoxylum {numero:02}' for numero in range(8)] # 13 especies, 12 por página
+
+        primera = self.client.get('/especies/', {'cursor': ''}).context['page_obj']
+        self.assertTrue(primera.es_cursor)
+        self.assertEqual(self.nombres_de(primera), todas[:12])
+
+        siguiente = self.client.get('/especies/', {'cursor': primera.cursor_siguiente, 'page': 2}).context['page_obj']
+        self.assertEqual(self.nombres_de(siguiente), todas[12:])
+
+        # "Última" -> La misma página que avanzando
+        respuesta = self.client.get('/especies/', {'cursor': '', 'direccion': 'anterior', 'page': 2})
+        ultima = respuesta.context['page_obj']
+        self.assertEqual(self.nombres_de(ultima), todas[12:])
+        self.assertEqual(ultima.number, 2)
+        self.assertContains(respuesta, '&page=1&cursor="')
+        self.assertContains(respuesta, f'&page=1&cursor={ultima.cursor_anterior}&direccion=anterior')
+
+        self.assertEqual(self.client.get('/especies/', {'cursor': 'basura'}).status_code, 404)
+
+    def test_busqueda_usa_offset(self):
+        respuesta = self.client.get('/especies/', {'query': 'ceiba', 'cursor': ''})
+        self.assertFalse(getattr(respuesta.context['page_obj'], 'es_cursor', False))
+        self.assertEqual(self.nombres_de(respuesta.context['page_obj']), ['Ceiba'])
+
+@PRUEBAS
+class GaleriaFeedTests(TestCase):
+    def setUp(self):
+        self.ceiba, self.tabebuia, self.inactiva = crear_especies(crear_usuario(), ['Ceiba pentandra', 'Tabebuia rosea', 'Acacia farnesiana'])
+        self.inactiva.soft_delete()
+
+        # Una por minuto -> La más reciente es la última creada
+        inicio = timezone.now() - timedelta(hours=1)
+        self.imagenes = []
+        for numero, (especie, categoria) in enumerate([
+            (self.ceiba, 'GENERAL'), (self.tabebuia, 'FLORES'), (self.ceiba, 'HOJAS'),
+            (self.tabebuia, 'GENERAL'), (self.ceiba, 'FLORES'), (self.inactiva, 'GENERAL'),
+        ]):
+            galeria = crear_imagen(especie, color=(numero, 0, 0), ancho=100, categoria=categoria)
+            Galeria.all_objects.filter(pk=galeria.pk).update(estado='LISTA', fecha_creacion=inicio + timedelta(minutes=numero))
+            self.imagenes.append(galeria)
+        # Sin procesar -> No sale en el feed
+        crear_imagen(self.ceiba, color=(255, 255, 255), ancho=100)
+
+    def feed(self, **parametros):
+        return self.client.get('/especies/galeria/feed', parametros)
+
+    def recorrer(self, **parametros):
+        vistas, cursor = [], ''
+        while True:
+            datos = self.feed(cursor=cursor, **parametros).json()
+            vistas.extend(datos['resultados'])
+            cursor = datos['siguiente']
+            if not cursor:
+                return vistas
+
+    def test_siguientes_recorre_todas_las_filas(self):
+        orden = ('-fecha_creacion', '-id')
+        vistas, cursor = [], None
+        while True:
+            filas, cursor = siguientes(Galeria.objects.all(), orden, 2, cursor)
+            vistas.extend(fila.pk for fila in filas)
+            if not cursor:
+                break
+        self.assertEqual(vistas, [galeria.pk for galeria in reversed(self.imagenes[:5])])
+
+    def test_feed_recorre_de_la_mas_reciente_a_la_mas_vieja(self):
+        resultados = self.recorrer(limite=2)
+        self.assertEqual(
+            [(resultado['nombre_cientifico'], resultado['categoria']) for resultado in resultados],
+            [('Ceiba pentandra', 'Flor / Pétalos'), ('Tabebuia rosea', 'Vista General'), ('Ceiba pentandra', 'Hoja / Folíolo'),
+             ('Tabebuia rosea', 'Flor / Pétalos'), ('Ceiba pentandra', 'Vista General')],
+        )
+        self.assertEqual(set(resultados[0]), {
+            'thumb', 'full', 'srcset', 'categoria', 'nombre_comun', 'nombre_cientifico',
+            'tipo', 'tipo_nombre', 'estado_conservacion', 'color_uicn', 'url',
+        })
+        self.assertEqual(resultados[0]['url'], f'/especies/detalle/{self.ceiba.slug}')
+
+    def test_feed_con_filtros(self):
+        resultados = self.recorrer(limite=1, especie_buscar=self.ceiba.id)
+        self.assertEqual([resultado['categoria'] for resultado in resultados], ['Flor / Pétalos', 'Hoja / Folíolo', 'Vista General'])
+
+        resultados = self.recorrer(categoria='FLORES')
+        self.assertEqual([resultado['nombre_cientifico'] for resultado in resultados], ['Ceiba pentandra', 'Tabebuia rosea'])
+
+        resultados = self.recorrer(query='tabebuia', limite=1)
+        self.assertEqual([resultado['categoria'] for resultado in resultados], ['Vista General', 'Flor / Pétalos'])
+
+    def test_feed_parametros_invalidos(self):
+        for parametros in [{'limite': 'x'}, {'especie_buscar': 'x'}, {'cursor': 'basura'}]:
+            with self.subTest(parametros=parametros):
+                respuesta = self.feed(**parametros)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('error', respuesta.json())
+
+    def test_feed_limita_el_tamano(self):
+        self.assertEqual(len(self.feed(limite=0).json()['resultados']), 1)
+        self.assertEqual(len(self.feed(limite=1000).json()['resultados']), 5)
+
+@PRUEBAS
+class ListasOpcionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ceiba, self.acacia = crear_especies(crear_usuario(), ['Ceiba pentandra', 'Acacia farnesiana'])
+
+    def test_lista_guardada_hasta_que_cambia_una_especie(self):
+        esperado = [(self.acacia.id, 'Común Acacia farnesiana'), (self.ceiba.id, 'Común Ceiba pentandra')]
+        self.assertEqual(especies_activas.obtener(), esperado)
+        with self.assertNumQueries(0):
+            self.assertEqual(especies_activas.obtener(), esperado)
+
+        self.ceiba.nombre_comun = 'Pochote'
+        self.ceiba.save()
+        self.assertEqual(especies_activas.obtener(), [(self.acacia.id, 'Común Acacia farnesiana'), (self.ceiba.id, 'Pochote')])
+
+    def test_soft_delete_y_activar(self):
+        self.acacia.soft_delete()
+        self.assertEqual(especies_activas.obtener(), [(self.ceiba.id, 'Común Ceiba pentandra')])
+        self.assertEqual(len(especies_todas.obtener()), 2) # El panel también muestra las desactivadas
+
+        self.acacia.activar()
+        self.assertEqual(len(especies_activas.obtener()), 2)
+
+    def test_borrar_una_especie(self):
+        especies_activas.obtener()
+        self.acacia.delete()
+        self.assertEqual(especies_activas.obtener(), [(self.ceiba.id, 'Común Ceiba pentandra')])
+
+    def test_copias_por_parametro_comparten_version(self):
+        llamadas = []
+        lista = ListaOpciones('pruebas:parametros', [Especie], lambda prefijo: llamadas.append(prefijo) or prefijo.upper())
+        self.addCleanup(ListaOpciones.registradas.remove, lista)
+
+        self.assertEqual(lista.obtener('a'), 'A')
+        self.assertEqual(lista.obtener('b'), 'B')
+        self.assertEqual(lista.obtener('a'), 'A')
+        self.assertEqual(llamadas, ['a', 'b'])
+
+        self.ceiba.save() # Invalida todas las copias
+        lista.obtener('a')
+        lista.obtener('b')
+        self.assertEqual(llamadas, ['a', 'b', 'a', 'b'])
+
+    def test_endpoint_opciones_especies(self):
+        self.acacia.soft_delete()
+        respuesta = self.client.get('/especies/opciones')
+        self.assertEqual(respuesta.json(), {'resultados': [{'id': self.ceiba.id, 'nombre': 'Común Ceiba pentandra'}]})
+        with self.assertNumQueries(0):
+            self.client.get('/especies/opciones')
+
+@PRUEBAS
+class FacetasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        creador = crear_usuario()
+        datos = [
+            # nombre, tipo, estado, familia
+            ('Ceiba pentandra', 'ARBOL', 'LC', 'Malvaceae'),
+            ('Ceiba aesculifolia', 'ARBOL', 'NT', 'Malvaceae'),
+            ('Sabal mexicana', 'PALMERA', 'LC', 'Arecaceae'),
+            ('Bursera simaruba', 'ARBOL', 'LC', None), # Sin taxonomía
+        ]
+        for nombre, tipo, estado, familia in datos:
+            especie = Especie.objects.create(
+                nombre_comun=nombre, nombre_cientifico=nombre, creador=creador, tipo=tipo, estado_conservacion=estado
+            )
+            if familia:
+                Taxonomia.objects.create(
+                    especie=especie, division='Streptophyta', clase='Equisetopsida', orden='Orden',
+                    familia=familia, genero=nombre.split()[0],
+                )
+
+    def contar(self, query='', **seleccion):
+        return {faceta: dict(conteo) for faceta, conteo in contar_facetas(query, seleccion).items()}
+
+    def test_sin_filtros(self):
+        self.assertEqual(self.contar(), {
+            'tipo': {'ARBOL': 3, 'PALMERA': 1},
+            'estado': {'LC': 3, 'NT': 1},
+            'familia': {'Malvaceae': 2, 'Arecaceae': 1}, # Sin taxonomía no cuenta como familia
+        })
+
+    def test_cada_faceta_ignora_su_propio_filtro(self):
+        conteos = self.contar(tipo='PALMERA')
+        self.assertEqual(conteos['tipo'], {'ARBOL': 3, 'PALMERA': 1})
+        self.assertEqual(conteos['estado'], {'LC': 1})
+        self.assertEqual(conteos['familia'], {'Arecaceae': 1})
+
+        conteos = self.contar(estado='LC', familia='Malvaceae')
+        self.assertEqual(conteos['tipo'], {'ARBOL': 1})
+        self.assertEqual(conteos['estado'], {'LC': 1, 'NT': 1})
+        self.assertEqual(conteos['familia'], {'Malvaceae': 1, 'Arecaceae': 1})
+
+    def test_con_busqueda(self):
+        self.assertEqual(self.contar('ceiba'), {
+            'tipo': {'ARBOL': 2},
+            'estado': {'LC': 1, 'NT': 1},
+            'familia': {'Malvaceae': 2},
+        })
+        self.assertEqual(self.contar('roble'), {'tipo': {}, 'estado': {}, 'familia': {}})
+
+    def test_conteos_cambian_con_la_taxonomia_y_la_especie(self):
+        self.contar()
+        taxonomia = Taxonomia.objects.get(especie__nombre_cientifico='Sabal mexicana')
+        taxonomia.familia = 'Palmae'
+        taxonomia.save()
+        self.assertEqual(self.contar()['familia'], {'Malvaceae': 2, 'Palmae': 1})
+
+        Especie.objects.get(nombre_cientifico='Ceiba aesculifolia').soft_delete()
+        self.assertEqual(self.contar()['estado'], {'LC': 3})
+
+    def test_con_conteo(self):
+        self.assertEqual(
+            con_conteo([('ARBOL', 'Árbol'), ('PALMERA', 'Palmera')], Counter({'ARBOL': 3})),
+            [('ARBOL', 'Árbol (3)'), ('PALMERA', 'Palmera (0)')],
+        )
+
+    def test_catalogo_muestra_los_conteos(self):
+        respuesta = self.client.get('/especies/', {'tipo': 'ARBOL'})
+        self.assertEqual(respuesta.context['TIPO_CHOICES'], [('ARBOL', 'Árbol (3)'), ('PALMERA', 'Palmera (1)')])
+        self.assertEqual(respuesta.context['FAMILIA_CHOICES'], [('Malvaceae', 'Malvaceae (2)')])
+
+        # La familia seleccionada aparece aunque no tenga especies con los demás filtros
+        respuesta = self.client.get('/especies/', {'tipo': 'ARBOL', 'familia': 'Arecaceae'})
+        self.assertIn(('Arecaceae', 'Arecaceae (0)'), respuesta.context['FAMILIA_CHOICES'])
+
+@PRUEBAS
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        self.creador = crear_usuario()
+        self.especie, = crear_especies(self.creador, ['Ceiba pentandra'])
+        self.detalle = f'/especies/detalle/{self.especie.slug}'
+        self.urls = [self.detalle, '/especies/', '/especies/galeria']
+
+    def test_304_hasta_que_cambian_los_datos(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                etag = respuesta['ETag']
+                self.assertTrue(respuesta.has_header('Last-Modified'))
+                self.assertIn('no-cache', respuesta['Cache-Control'])
+
+                # Solo la agregación de la firma, sin consultar ni renderizar la página
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+                Url.objects.create(especie=self.especie, tipo='Otro', url=f'https://ejemplo.org{url}')
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        respuesta = self.client.get('/especies/')
+        ultima = respuesta['Last-Modified']
+        self.assertEqual(self.client.get('/especies/', HTTP_IF_MODIFIED_SINCE=ultima).status_code, 304)
+
+        invalidar_especie(self.especie.pk)
+        # La fecha nueva cae en el mismo segundo -> El ETag sí cambia
+        self.assertEqual(self.client.get('/especies/', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 200)
+
+    def test_borrar_una_especie_cambia_el_etag(self):
+        otra, = crear_especies(self.creador, ['Acacia farnesiana'])
+        etag = self.client.get('/especies/')['ETag']
+        otra.delete() # La fecha máxima no cambia, el número de filas sí
+        self.assertEqual(self.client.get('/especies/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_plantillas_nuevas_cambian_el_etag(self):
+        etag = self.client.get('/especies/')['ETag']
+        despliegue = datetime(2100, 1, 1, tzinfo=dt_timezone.utc)
+        with mock.patch.object(condicional, 'fecha_plantillas', return_value=despliegue):
+            respuesta = self.client.get('/especies/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Last-Modified'], 'Fri, 01 Jan 2100 00:00:00 GMT')
+
+    def test_usuarios_autenticados_sin_validadores(self):
+        self.client.force_login(self.creador)
+        for url in self.urls:
+            with self.subTest(url=url):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertFalse(respuesta.has_header('ETag'))
+                self.assertFalse(respuesta.has_header('Last-Modified'))
@@ -14,6 +14,7 @@ urlpatterns = [
     # Galeria
     path('galeria', panel.GaleriaListView.as_view(), name="mi_galeria"),
     path('galeria/crear', panel.GaleriaCreateView.as_view(), name="crear_imagen"),
+    path('galeria/crear-masiva', panel.GaleriaMasivaView.as_view(), name="crear_imagenes"),
     path('galeria/editar/<int:pk>', panel.GaleriaUpdateView.as_view(), name="editar_imagen"),
     path('galeria/eliminar/<int:pk>', panel.GaleriaDeleteView.as_view(), name="eliminar_imagen"),
     # Urls
@@ -8,6 +8,9 @@ urlpatterns = [
     # Especies
     path('', public.EspecieListView.as_view(), name="catalogo_especies"),
     path('detalle/<slug:slug>', public.EspecieDetailView.as_view(), name="detalle_especie"),
+    path('autocompletar', public.autocompletar_especies, name="autocompletar"),
     # Galeria
     path('galeria', public.GaleriaListView.as_view(), name="galeria"),
+    path('galeria/feed', public.galeria_feed, name="galeria_feed"),
+    path('opciones', public.opciones_especies, name="opciones_especies"),
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import hashlib
 
 # Especie
 TIPO_CHOICES = [
@@ -34,14 +35,44 @@ CATEGORIAS_CHOICES = [
     ('OTRO', 'Otro'),
 ]
 
+ESTADO_PROCESAMIENTO_CHOICES = [
+    ('PENDIENTE', 'Pendiente'),
+    ('PROCESANDO', 'Procesando'),
+    ('LISTA', 'Lista'),
+    ('ERROR', 'Error'),
+]
+
+# Los nombres de archivo salen del contenido (SHA-256) -> No hace falta consultar la DB
+# y dos subidas al mismo tiempo no pueden chocar
+LONGITUD_HASH = 16
+
+def hash_archivo(archivo):
+    sha = hashlib.sha256()
+    
+    if isinstance(archivo, bytes):
+        sha.update(archivo)
+    else:
+        for chunk in archivo.chunks(): # chunks() regresa al inicio del archivo
+            sha.update(chunk)
+    
+    return sha.hexdigest()[:LONGITUD_HASH]
+
+def nombre_galeria(especie, huella, extension='.webp'):
+    return os.path.join('galeria', especie.slug, f"{huella}{extension.lower()}")
+
 def ruta_galeria(instance, filename):
-    # 1. Recuperamos la extensión original del archivo (ej: .jpg)
-    base, extension = os.path.splitext(filename)
+    # Conservamos la extensión original del archivo (ej: .jpg) hasta que se convierta a WebP
+    extension = os.path.splitext(filename)[1]
     
-    Galeria = instance.__class__
-    query = Galeria.objects.filter(especie=instance.especie, categoria=instance.categoria)
-    total = query.count()
+    return nombre_galeria(instance.especie, hash_archivo(instance.imagen), extension)
+
+# Mueve un archivo dentro del storage, regresa el nombre final
+def mover_archivo(storage, origen, destino):
+    if origen == destino:
+        return origen
     
-    img = f"{str(instance.categoria).lower()}_{total + 1}{extension}"
+    with storage.open(origen, 'rb') as archivo:
+        destino = storage.save(destino, archivo)
+    storage.delete(origen)
     
-    return os.path.join('galeria', instance.especie.slug, img)
\ No newline at end of file
+    return destino
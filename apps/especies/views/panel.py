@@ -1,17 +1,22 @@
+import os
+
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.views.generic import ListView, UpdateView, CreateView, DeleteView
-from django.db.models import OuterRef, Subquery
+from django.views.generic import ListView, UpdateView, CreateView, DeleteView, FormView
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
-from django.db.models import Q
-from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 
 from ..models import Especie, Galeria, Url
-from ..forms import EspecieForm, TaxonomiaForm, EspecieDetalleForm, GaleriaForm, UrlForm
-from ..utils import TIPO_CHOICES, CATEGORIAS_CHOICES, ESTADO_CONSERVACION_CHOICES, ESTADO_ESPECIE
+from ..forms import EspecieForm, TaxonomiaForm, EspecieDetalleForm, GaleriaForm, GaleriaMasivaForm, UrlForm
+from ..utils import TIPO_CHOICES, CATEGORIAS_CHOICES, ESTADO_CONSERVACION_CHOICES, ESTADO_ESPECIE, nombre_galeria, hash_archivo
+from ..signals import imagenes_creadas
+from ..busqueda import filtrar
+from ..categorias import imagenes_por_categoria, portadas
+from ..paginacion import PaginacionCursorMixin
+from ..opciones import especies_todas
 
 from apps.perfiles.models import Usuario
 
@@ -20,20 +25,15 @@ class StaffRequireMixin(LoginRequiredMixin, UserPassesTestMixin):
         return self.request.user.rol == Usuario.Rol.STAFF or self.request.user.rol == Usuario.Rol.ADMIN
     
 # Listar Especies
-class EspecieListView(StaffRequireMixin, ListView):
+class EspecieListView(StaffRequireMixin, PaginacionCursorMixin, ListView):
     model = Especie
     template_name = "staff/mis_especies.html"
     context_object_name = "especies"
     paginate_by = 12
+    orden_cursor = ('nombre_cientifico', 'id') # Paginación por cursor (ver paginacion.py)
     
     def get_queryset(self):
         queryset = self.model.all_objects.get_queryset() # Trae todas las especies incluso las inactivas
-        queryset = queryset.prefetch_related(
-            Prefetch(
-                'imagenes',
-                queryset=Galeria.all_objects.all(), # Traera todas las imagenes incluso las de especies inactivas
-            )
-        )
         
         # Solo muestra las especies que yo cree
         if self.request.user.rol == Usuario.Rol.STAFF:
@@ -46,12 +46,7 @@ class EspecieListView(StaffRequireMixin, ListView):
         
         # Buscador
         if self.query:            
-            queryset = queryset.filter(
-                Q(nombre_comun__icontains=self.query) |
-                Q(nombre_cientifico__icontains=self.query) |
-                Q(taxonomia__familia__icontains=self.query) |
-                Q(taxonomia__genero__icontains=self.query)
-            )
+            queryset = filtrar(queryset, self.query)
             
         # Filtros
         if self.tipo:
@@ -68,6 +63,12 @@ class EspecieListView(StaffRequireMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        # Portada de cada especie de la página en una sola consulta (incluye imagenes de especies inactivas)
+        # Solo imagenes LISTA -> Una pendiente todavía no tiene variantes y se serviría el original
+        imagenes = portadas(context['especies'], Galeria.all_objects.filter(estado='LISTA'))
+        for especie in context['especies']:
+            especie.portada = imagenes.get(especie.id)
+        
         # Buscador
         context['query'] = self.query
         
@@ -248,21 +249,15 @@ class EspecieActivarView(StaffRequireMixin, UpdateView):
         return super().form_valid(form)
     
 # Listar Imagenes
-class GaleriaListView(StaffRequireMixin, ListView):
+class GaleriaListView(StaffRequireMixin, PaginacionCursorMixin, ListView):
     model = Galeria
     template_name = "staff/mi_galeria.html"
     context_object_name = "imagenes"
     paginate_by = 16
+    orden_cursor = ('-fecha_creacion', '-id') # Las más recientes primero
     
     def get_queryset(self):
-        subquery = Galeria.all_objects.filter(
-            especie=OuterRef('especie'), # Valor de afuera
-            categoria='GENERAL'
-        ).values('imagen')[:1]
-        
-        queryset = self.model.all_objects.get_queryset().select_related('especie').annotate(
-            imagen_principal=Subquery(subquery)
-        )
+        queryset = self.model.all_objects.get_queryset().select_related('especie')
         
         # Solo muestra las imagenes que yo subí
         if self.request.user.rol == Usuario.Rol.STAFF:
@@ -279,12 +274,7 @@ class GaleriaListView(StaffRequireMixin, ListView):
         
         # Buscador
         if self.query:
-            queryset = queryset.filter(
-                Q(especie__nombre_comun__icontains=self.query) |
-                Q(especie__nombre_cientifico__icontains=self.query) |
-                Q(especie__taxonomia__familia__icontains=self.query) |
-                Q(especie__taxonomia__genero__icontains=self.query)
-            )
+            queryset = filtrar(queryset, self.query, campo='especie')
     
         #Filtros
         if self.tipo:
@@ -306,12 +296,19 @@ class GaleriaListView(StaffRequireMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        # Imagen GENERAL de la especie de cada imagen de la página, en una sola consulta
+        portadas = imagenes_por_categoria(
+            {imagen.especie_id for imagen in context['imagenes']}, ['GENERAL'], Galeria.all_objects.filter(estado='LISTA')
+        )
+        for imagen in context['imagenes']:
+            imagen.imagen_principal = portadas.get(imagen.especie_id, {}).get('GENERAL')
+        
         # Buscador
         context['query'] = self.query
         
         # Filtros
         context['TIPO_CHOICES'] = TIPO_CHOICES
-        context['ESPECIE_BUSCAR_CHOICES'] = Especie.all_objects.values_list('id', 'nombre_comun').order_by('nombre_comun') # Hacemos la consulta al momento para que no se desactualize
+        context['ESPECIE_BUSCAR_CHOICES'] = especies_todas.obtener() # En caché, se actualiza al cambiar una Especie (ver opciones.py)
         context['ESTADO_CONSERVACION_CHOICES'] = ESTADO_CONSERVACION_CHOICES
         context['CATEGORIAS_CHOICES'] = CATEGORIAS_CHOICES
         
@@ -341,6 +338,51 @@ class GaleriaCreateView(StaffRequireMixin, CreateView):
             # Si alguno falla, volvemos a renderizar la página con los errores
             return self.render_to_response(self.get_context_data(form=form))
 
+# Subir varias Imagenes de una Especie
+class GaleriaMasivaView(StaffRequireMixin, FormView):
+    form_class = GaleriaMasivaForm
+    template_name = "staff/galeria_masiva_form.html"
+    success_url = reverse_lazy('panel:mi_galeria')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['CATEGORIAS_CHOICES'] = CATEGORIAS_CHOICES
+        return context
+    
+    def form_valid(self, form):
+        especie = form.cleaned_data['especie']
+        archivos = form.cleaned_data['imagenes']
+        
+        # Una categoria por archivo (en el mismo orden), si falta se usa la del formulario
+        validas = dict(CATEGORIAS_CHOICES)
+        categorias = self.request.POST.getlist('categorias')
+        categorias = [
+            categorias[i] if i < len(categorias) and categorias[i] in validas else form.cleaned_data['categoria']
+            for i in range(len(archivos))
+        ]
+        
+        # Solo se guardan los originales: la conversión a WebP y las variantes las hace
+        # el worker de la cola (manage.py procesar_galeria), igual que con una sola imagen
+        imagenes = []
+        with transaction.atomic():
+            Galeria.bloquear_archivos(especie.id) # Igual que Galeria.save() -> Nadie borra estos archivos antes del INSERT
+            
+            for archivo, categoria in zip(archivos, categorias):
+                # El nombre sale del contenido -> No hay consultas ni choques entre subidas
+                extension = os.path.splitext(archivo.name)[1]
+                nombre = nombre_galeria(especie, hash_archivo(archivo), extension)
+                
+                galeria = Galeria(especie=especie, autor=self.request.user, categoria=categoria, estado='PENDIENTE')
+                galeria.imagen.name = galeria.imagen.storage.save(nombre, archivo)
+                imagenes.append(galeria)
+            
+            # Un solo INSERT para todas las imagenes
+            Galeria.objects.bulk_create(imagenes)
+        imagenes_creadas.send(sender=Galeria, especie=especie)
+        
+        messages.success(self.request, f"Se subieron {len(imagenes)} imágenes de {especie.nombre_comun}, se mostrarán en cuanto terminen de procesarse.")
+        return super().form_valid(form)
+
 # Editar Imagen
 class GaleriaUpdateView(StaffRequireMixin, UpdateView):
     model = Galeria
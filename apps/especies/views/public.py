@@ -1,15 +1,25 @@
+from django.http import JsonResponse, Http404
+from django.urls import reverse
 from django.views.generic import ListView, DetailView
-from django.db.models import Q
 
 from ..utils import TIPO_CHOICES, CATEGORIAS_CHOICES, ESTADO_CONSERVACION_CHOICES
 from ..models import Especie, Galeria
+from ..busqueda import filtrar
+from ..autocompletar import autocompletar, LIMITE
+from ..cache import CachePaginaEspecieMixin
+from ..opciones import especies_activas
+from ..facetas import contar_facetas, con_conteo
+from ..categorias import imagenes_por_categoria, portadas
+from ..paginacion import PaginacionCursorMixin, siguientes
+from ..condicional import GetCondicionalMixin
 
 # Listar Especies
-class EspecieListView(ListView):
+class EspecieListView(GetCondicionalMixin, PaginacionCursorMixin, ListView): # 304 si no hay cambios (ver condicional.py)
     model = Especie
     template_name = "especies/catalogo_especies.html"
     context_object_name = "especies"
     paginate_by = 12
+    orden_cursor = ('nombre_cientifico', 'id') # Paginación por cursor (ver paginacion.py)
     
     def get_queryset(self):
         queryset = super().get_queryset().order_by('nombre_cientifico')
@@ -17,15 +27,11 @@ class EspecieListView(ListView):
         self.query = self.request.GET.get('query', '') # Buscador
         self.tipo = self.request.GET.get('tipo', '') # Filtro tipo (Arbol, Palmera)
         self.estado = self.request.GET.get('estado', '') # Filtro estado IUCN (NE, DD, LC, NT, ...)
+        self.familia = self.request.GET.get('familia', '') # Filtro familia (Taxonomia)
         
         # Buscador
         if self.query:            
-            queryset = queryset.filter(
-                Q(nombre_comun__icontains=self.query) |
-                Q(nombre_cientifico__icontains=self.query) |
-                Q(taxonomia__familia__icontains=self.query) |
-                Q(taxonomia__genero__icontains=self.query)
-            )
+            queryset = filtrar(queryset, self.query) # Ordena por relevancia
             
         #Filtros
         if self.tipo:
@@ -33,6 +39,9 @@ class EspecieListView(ListView):
             
         if self.estado:
             queryset = queryset.filter(estado_conservacion=self.estado)
+        
+        if self.familia:
+            queryset = queryset.filter(taxonomia__familia=self.familia)
     
         return queryset
     
@@ -40,18 +49,37 @@ class EspecieListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        # Portada de cada tarjeta en una sola consulta, sin importar cuantas especies tenga la página
+        imagenes = portadas(context['especies'])
+        for especie in context['especies']:
+            especie.portada = imagenes.get(especie.id)
+        
         # Buscador
         context['query'] = self.query
-        # Filtros
-        context['TIPO_CHOICES'] = TIPO_CHOICES
-        context['ESTADO_CONSERVACION_CHOICES'] = ESTADO_CONSERVACION_CHOICES
+        # Filtros con cuantas especies hay en cada opción para la búsqueda actual (ver facetas.py)
+        conteos = contar_facetas(self.query, {'tipo': self.tipo, 'estado': self.estado, 'familia': self.familia})
+        if self.familia:
+            conteos['familia'][self.familia] += 0 # La familia seleccionada siempre aparece
+        context['TIPO_CHOICES'] = con_conteo(TIPO_CHOICES, conteos['tipo'])
+        context['ESTADO_CONSERVACION_CHOICES'] = con_conteo(ESTADO_CONSERVACION_CHOICES, conteos['estado'])
+        context['FAMILIA_CHOICES'] = con_conteo([(familia, familia) for familia in sorted(conteos['familia'])], conteos['familia'])
         context['tipo'] = self.tipo
         context['estado'] = self.estado
+        context['familia'] = self.familia
         
         return context
 
+# Sugerencias del buscador mientras se escribe -> JSON sin renderizar el catálogo
+def autocompletar_especies(request):
+    try:
+        limite = max(1, min(int(request.GET.get('limite', LIMITE)), 20))
+    except ValueError:
+        limite = LIMITE
+    
+    return JsonResponse({'resultados': autocompletar(request.GET.get('query', ''), limite)})
+
 # Detalle Especie
-class EspecieDetailView(DetailView):
+class EspecieDetailView(GetCondicionalMixin, CachePaginaEspecieMixin, DetailView): # La ficha renderizada se guarda en caché (ver cache.py)
     model = Especie
     template_name = "especies/detalle_especie.html"
     context_object_name = "especie"
@@ -68,20 +96,24 @@ class EspecieDetailView(DetailView):
         
         especie = self.object
         
-        context['imagen_corteza'] = Galeria.objects.filter(especie=especie, categoria="CORTEZA").first()
-        context['imagen_hojas'] = Galeria.objects.filter(especie=especie, categoria="HOJAS").first()
-        context['imagen_flores'] = Galeria.objects.filter(especie=especie, categoria="FLORES").first()
-        context['imagen_fruto'] = Galeria.objects.filter(especie=especie, categoria="FRUTO").first()
-        context['imagen_semilla'] = Galeria.objects.filter(especie=especie, categoria="SEMILLA").first()
+        # Sale de las imagenes del prefetch_related -> Sin consultas extra
+        imagenes = imagenes_por_categoria([especie])[especie.id]
+        
+        context['imagen_corteza'] = imagenes.get("CORTEZA")
+        context['imagen_hojas'] = imagenes.get("HOJAS")
+        context['imagen_flores'] = imagenes.get("FLORES")
+        context['imagen_fruto'] = imagenes.get("FRUTO")
+        context['imagen_semilla'] = imagenes.get("SEMILLA")
         
         return context
 
 # Listar Galeria
-class GaleriaListView(ListView):
+class GaleriaListView(GetCondicionalMixin, PaginacionCursorMixin, ListView):
     model = Galeria
     template_name = "especies/galeria.html"
     context_object_name = "imagenes"
     paginate_by = 16
+    orden_cursor = ('-fecha_creacion', '-id') # Las más recientes primero
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -92,33 +124,13 @@ class GaleriaListView(ListView):
         self.especie_buscar = self.request.GET.get('especie_buscar', '') # Filtro Especie
         self.categoria = self.request.GET.get('categoria', '') # Filtro Categoria Imagen
         
-        # Para eficiencia mejora los JOINS
-        queryset = queryset.select_related('especie', 'especie__taxonomia') 
-        
-        # Buscador
-        if self.query:
-            queryset = queryset.filter(
-                Q(especie__nombre_comun__icontains=self.query) |
-                Q(especie__nombre_cientifico__icontains=self.query) |
-                Q(especie__taxonomia__familia__icontains=self.query) |
-                Q(especie__taxonomia__genero__icontains=self.query)
-            )
-    
-        #Filtros
-        if self.tipo:
-            queryset = queryset.filter(especie__tipo=self.tipo)
-            
-        if self.estado:
-            queryset = queryset.filter(especie__estado_conservacion=self.estado)
-            
         if self.especie_buscar:
             self.especie_buscar = int(self.especie_buscar)
-            queryset = queryset.filter(especie=self.especie_buscar)
         
-        if self.categoria:
-            queryset = queryset.filter(categoria=self.categoria)
-            
-        return queryset
+        # Para eficiencia mejora los JOINS
+        queryset = queryset.select_related('especie', 'especie__taxonomia') 
+        
+        return filtrar_galeria(queryset, self.query, self.tipo, self.estado, self.especie_buscar, self.categoria)
     
     # Regresando el query para que se autocomplete en el buscador
     def get_context_data(self, **kwargs):
@@ -128,8 +140,8 @@ class GaleriaListView(ListView):
         context['query'] = self.query
         
         # Filtros
+        # Las especies del filtro las pide el navegador a opciones_especies (en caché) -> No se consultan en cada página
         context['TIPO_CHOICES'] = TIPO_CHOICES
-        context['ESPECIE_BUSCAR_CHOICES'] = Especie.objects.values_list('id', 'nombre_comun').order_by('nombre_comun') # Hacemos la consulta al momento para que no se desactualize
         context['ESTADO_CONSERVACION_CHOICES'] = ESTADO_CONSERVACION_CHOICES
         context['CATEGORIAS_CHOICES'] = CATEGORIAS_CHOICES
         
@@ -139,4 +151,79 @@ class GaleriaListView(ListView):
         context['especie_buscar'] = self.especie_buscar
         context['categoria'] = self.categoria
         
-        return context
\ No newline at end of file
+        return context
+
+# Filtros de la galería pública, los comparten la vista HTML y el feed JSON
+def filtrar_galeria(queryset, query='', tipo='', estado='', especie_buscar='', categoria=''):
+    # Buscador
+    if query:
+        queryset = filtrar(queryset, query, campo='especie')
+
+    #Filtros
+    if tipo:
+        queryset = queryset.filter(especie__tipo=tipo)
+        
+    if estado:
+        queryset = queryset.filter(especie__estado_conservacion=estado)
+        
+    if especie_buscar:
+        queryset = queryset.filter(especie=especie_buscar)
+    
+    if categoria:
+        queryset = queryset.filter(categoria=categoria)
+        
+    return queryset
+
+# Scroll infinito de la galería: las siguientes imagenes después de `cursor` con los mismos filtros
+# Solo los campos que necesita la tarjeta, sin renderizar HTML
+LIMITE_FEED = 16
+
+def galeria_feed(request):
+    try:
+        limite = max(1, min(int(request.GET.get('limite', LIMITE_FEED)), 48))
+        especie_buscar = int(request.GET.get('especie_buscar') or 0)
+    except ValueError:
+        return JsonResponse({'error': "Los parámetros limite y especie_buscar deben ser numéricos."}, status=400)
+    
+    queryset = Galeria.objects.select_related('especie').only(
+        'imagen', 'variantes', 'categoria', 'fecha_creacion', 'especie',
+        'especie__nombre_comun', 'especie__nombre_cientifico', 'especie__slug',
+        'especie__tipo', 'especie__estado_conservacion', 'especie__is_active',
+    )
+    queryset = filtrar_galeria(
+        queryset,
+        request.GET.get('query', ''),
+        request.GET.get('tipo', ''),
+        request.GET.get('estado', ''),
+        especie_buscar,
+        request.GET.get('categoria', ''),
+    )
+    
+    # Con búsqueda también va de la más reciente a la más vieja -> El cursor necesita un orden fijo
+    try:
+        imagenes, cursor = siguientes(queryset, GaleriaListView.orden_cursor, limite, request.GET.get('cursor'))
+    except Http404:
+        return JsonResponse({'error': "Cursor inválido."}, status=400)
+    
+    return JsonResponse({
+        'resultados': [{
+            'thumb': imagen.url_card,
+            'full': imagen.url_full,
+            'srcset': imagen.srcset,
+            'categoria': imagen.get_categoria_display(),
+            'nombre_comun': imagen.especie.nombre_comun,
+            'nombre_cientifico': imagen.especie.nombre_cientifico,
+            'tipo': imagen.especie.tipo,
+            'tipo_nombre': imagen.especie.get_tipo_display(),
+            'estado_conservacion': imagen.especie.estado_conservacion,
+            'color_uicn': imagen.especie.color_uicn,
+            'url': reverse('public:detalle_especie', kwargs={'slug': imagen.especie.slug}) if imagen.especie.is_active else None,
+        } for imagen in imagenes],
+        'siguiente': cursor,
+    })
+
+# Especies para el filtro de la galería, en caché hasta que cambie alguna Especie (ver opciones.py)
+def opciones_especies(request):
+    return JsonResponse({'resultados': [
+        {'id': id_especie, 'nombre': nombre} for id_especie, nombre in especies_activas.obtener()
+    ]})
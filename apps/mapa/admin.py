@@ -5,7 +5,7 @@ from .models import Historial, Zona, Inventario
 
 @admin.register(Historial)
 class HistorialAdmin(admin.ModelAdmin):
-    list_display = ('imagen', 'fecha_asociada', 'fecha_creacion', 'autor')
+    list_display = ('imagen', 'fecha_asociada', 'fecha_creacion', 'autor', 'estado', 'cobertura')
     list_filter = ('autor', )    
     search_fields = ('fecha_asociada', )
     ordering = ('fecha_creacion', )
@@ -22,7 +22,7 @@ class InventarioInline(admin.TabularInline):
 
 @admin.register(Zona)
 class ZonaAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'descripcion']
+    list_display = ['nombre', 'descripcion', 'total_especies', 'total_arboles']
     exclude = ('slug', )
     inlines = [InventarioInline]
     
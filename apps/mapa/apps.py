@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class MapaConfig(AppConfig):
-    name = 'apps.mapa'
\ No newline at end of file
+    name = 'apps.mapa'
+
+    def ready(self):
+        from . import signals # Conecta los receivers
@@ -0,0 +1,77 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# Cobertura de dosel (copas de los árboles) de las imágenes satelitales del Historial.
+# Cada imagen se reduce a ANCHO px y se clasifica pixel por pixel con NumPy (sin ciclos de Python):
+# índice de exceso de verde (ExG = 2g - r - b sobre colores normalizados) mayor a UMBRAL_EXG -> Dosel.
+# Entre dos fechas seguidas se comparan las máscaras: dosel ganado (verde) y perdido (rojo).
+
+ANCHO = 1024 # Resolución del análisis, suficiente para porcentajes y capas del visor
+UMBRAL_EXG = 0.05
+BRILLO_MINIMO = 60 # Suma R+G+B -> Las sombras muy oscuras no se cuentan como vegetación
+
+COLOR_DOSEL = (34, 197, 94, 150)
+COLOR_GANADO = (34, 197, 94, 190)
+COLOR_PERDIDO = (220, 53, 69, 190)
+
+def cargar(datos):
+    img = Image.open(BytesIO(datos))
+    img.draft('RGB', (ANCHO, ANCHO)) # JPEG: decodifica directo a menor resolución
+    img = img.convert('RGB')
+    if img.width > ANCHO:
+        img = img.resize((ANCHO, max(1, round(img.height * ANCHO / img.width))), Image.BILINEAR)
+    return np.asarray(img, dtype=np.float32)
+
+def indice_verde(pixeles):
+    suma = pixeles.sum(axis=2)
+    normalizados = pixeles / np.maximum(suma, 1)[..., None]
+    r, g, b = normalizados[..., 0], normalizados[..., 1], normalizados[..., 2]
+    return 2 * g - r - b, suma
+
+def png(img):
+    salida = BytesIO()
+    img.save(salida, format='PNG', optimize=True)
+    return salida.getvalue()
+
+# Capa RGBA transparente con `color` donde la máscara es verdadera
+def capa(mascaras_colores, forma):
+    rgba = np.zeros((*forma, 4), dtype=np.uint8)
+    for mascara, color in mascaras_colores:
+        rgba[mascara] = color
+    return png(Image.fromarray(rgba, 'RGBA'))
+
+def a_mascara(datos):
+    return np.asarray(Image.open(BytesIO(datos)).convert('L')) > 127
+
+# Se ejecutan en los procesos del pool -> Solo reciben y regresan bytes y números
+
+# Regresa ({cobertura, indice}, PNG de la máscara, PNG de la capa para el visor)
+def analizar_imagen(datos):
+    pixeles = cargar(datos)
+    exg, suma = indice_verde(pixeles)
+    dosel = (exg > UMBRAL_EXG) & (suma > BRILLO_MINIMO)
+
+    estadisticas = {
+        'cobertura': float(dosel.mean() * 100), # % del área con dosel
+        'indice': float(exg.mean()),
+    }
+    mascara = png(Image.fromarray(dosel.astype(np.uint8) * 255, 'L').convert('1'))
+    return estadisticas, mascara, capa([(dosel, COLOR_DOSEL)], dosel.shape)
+
+# Regresa ({ganancia, perdida} en % del área, PNG de la capa de cambios)
+def comparar(mascara_antes, mascara_despues):
+    antes, despues = a_mascara(mascara_antes), a_mascara(mascara_despues)
+    if antes.shape != despues.shape: # Imágenes de distinto tamaño -> Se lleva la anterior al tamaño de la nueva
+        redimensionada = Image.fromarray(antes.astype(np.uint8) * 255, 'L').resize(despues.shape[::-1], Image.NEAREST)
+        antes = np.asarray(redimensionada) > 127
+
+    ganado = despues & ~antes
+    perdido = antes & ~despues
+
+    estadisticas = {
+        'ganancia': float(ganado.mean() * 100),
+        'perdida': float(perdido.mean() * 100),
+    }
+    return estadisticas, capa([(ganado, COLOR_GANADO), (perdido, COLOR_PERDIDO)], despues.shape)
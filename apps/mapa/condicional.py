@@ -0,0 +1,5 @@
+from apps.especies.condicional import UltimoCambio
+from .models import Zona
+
+# Los cambios del Inventario mueven la fecha de su Zona (ver Zona.actualizar_totales)
+cambios_mapa = UltimoCambio('mapa', lambda: Zona.objects)
@@ -0,0 +1,176 @@
+import codecs
+import csv
+import json
+import re
+import zipfile
+from itertools import chain, groupby
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+from .models import Inventario, InventarioCampus, Zona
+
+# Exportación del inventario por streaming: las filas salen de la base de datos con .iterator()
+# y se escriben al navegador conforme se generan -> La memoria no crece con el tamaño del inventario.
+# Columnas: lista de (clave, título) -> La clave se usa en JSON Lines y el título en CSV/XLSX.
+
+CHUNK = 2000 # Filas por lectura de la base de datos
+FILAS_POR_ENVIO = 500 # Cada cuantas filas se manda lo que lleva comprimido el XLSX
+
+# Inventario de una zona (o del campus completo) ordenado del más abundante al menos
+COLUMNAS_ZONA = [
+    ('nombre_comun', 'Nombre Común'),
+    ('nombre_cientifico', 'Nombre Científico'),
+    ('cantidad', 'Cantidad'),
+]
+
+def filas_zona(zona):
+    if zona.slug == "campus":
+        inventario = InventarioCampus.objects.all()
+    else:
+        inventario = zona.inventario.filter(cantidad__gt=0)
+
+    return inventario.values_list(
+        'especie__nombre_comun', 'especie__nombre_cientifico', 'cantidad'
+    ).iterator(chunk_size=CHUNK)
+
+# Todas las zonas: una fila por especie y una columna por zona, en una sola pasada sobre el Inventario
+# ordenado por especie -> Solo se tiene en memoria la especie actual
+def pivote_zonas():
+    zonas = list(Zona.objects.exclude(slug="campus").order_by('nombre').values_list('id', 'slug', 'nombre')) # Campus es la suma de todas
+    posiciones = {id_zona: posicion for posicion, (id_zona, _, _) in enumerate(zonas)}
+
+    columnas = [
+        ('nombre_comun', 'Nombre Común'),
+        ('nombre_cientifico', 'Nombre Científico'),
+        *[(slug, f'Zona {nombre}') for _, slug, nombre in zonas],
+        ('total', 'Total'),
+    ]
+
+    registros = Inventario.objects.filter(
+        cantidad__gt=0, zona_id__in=posiciones
+    ).order_by('especie__nombre_cientifico', 'especie_id').values_list(
+        'especie_id', 'especie__nombre_comun', 'especie__nombre_cientifico', 'zona_id', 'cantidad'
+    ).iterator(chunk_size=CHUNK)
+
+    def filas():
+        for _, grupo in groupby(registros, key=lambda registro: registro[0]):
+            cantidades = [0] * len(zonas)
+            for _, nombre_comun, nombre_cientifico, id_zona, cantidad in grupo:
+                cantidades[posiciones[id_zona]] = cantidad
+            yield [nombre_comun, nombre_cientifico, *cantidades, sum(cantidades)]
+
+    return columnas, filas()
+
+# CSV
+# csv.writer necesita un archivo -> Este solo regresa la línea para mandarla en el stream
+class Eco:
+    def write(self, valor):
+        return valor
+
+def generar_csv(columnas, filas):
+    escritor = csv.writer(Eco())
+    yield codecs.BOM_UTF8 # Para que Excel reconozca los acentos
+    yield escritor.writerow([titulo for _, titulo in columnas])
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+# JSON Lines -> Un objeto por línea
+def generar_jsonl(columnas, filas):
+    claves = [clave for clave, _ in columnas]
+    for fila in filas:
+        yield json.dumps(dict(zip(claves, fila)), ensure_ascii=False) + '\n'
+
+# XLSX: es un ZIP con unos XML. La hoja se escribe fila por fila dentro del ZIP y lo que ya salió
+# comprimido se manda al navegador. Las celdas de texto van en línea (inlineStr) -> No hace falta
+# juntar todos los textos en sharedStrings.xml antes de escribir la hoja.
+class Tubo:
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes.clear()
+        return datos
+
+CARACTERES_INVALIDOS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]') # No se permiten en XML
+
+def celda(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(CARACTERES_INVALIDOS.sub('', str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+def archivos_xlsx(hoja):
+    hoja = escape(re.sub(r'[\[\]:*?/\\]', '', hoja)[:31], {'"': '&quot;'}) # Reglas de Excel para el nombre
+    return {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'
+        ),
+    }
+
+def generar_xlsx(columnas, filas, hoja='Inventario'):
+    tubo = Tubo()
+    with zipfile.ZipFile(tubo, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, contenido in archivos_xlsx(hoja).items():
+            archivo.writestr(nombre, contenido)
+        yield tubo.vaciar()
+
+        with archivo.open('xl/worksheets/sheet1.xml', 'w') as hoja_xml:
+            hoja_xml.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for numero, fila in enumerate(chain([[titulo for _, titulo in columnas]], filas), start=1):
+                hoja_xml.write(f'<row r="{numero}">{"".join(celda(valor) for valor in fila)}</row>'.encode())
+                if numero % FILAS_POR_ENVIO == 0:
+                    yield tubo.vaciar()
+            hoja_xml.write(b'</sheetData></worksheet>')
+    yield tubo.vaciar() # Directorio central del ZIP
+
+# formato -> (generador, content type, extensión)
+FORMATOS = {
+    'csv': (generar_csv, 'text/csv; charset=utf-8', 'csv'),
+    'jsonl': (generar_jsonl, 'application/x-ndjson; charset=utf-8', 'jsonl'),
+    'xlsx': (generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+def respuesta_exportacion(formato, nombre, columnas, filas):
+    generar, tipo, extension = FORMATOS[formato]
+    response = StreamingHttpResponse(generar(columnas, filas), content_type=tipo)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.{extension}"'
+    return response
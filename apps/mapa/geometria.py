@@ -0,0 +1,296 @@
+import math
+import re
+
+# Geometría de las Zonas: los `vector_path` son el atributo 'd' de un path SVG exportado de Inkscape.
+# Aquí se leen como polígonos (listas de puntos) y se vuelven a escribir compactos.
+
+TOLERANCIA = 0.25 # Distancia máxima (en unidades del SVG) entre el path original y el simplificado
+DECIMALES = 2 # Decimales de las coordenadas del path compacto
+
+TOKENS = re.compile(r'[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+# Cuantos números consume cada comando
+PARAMETROS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+# Regresa una lista de subpaths -> (puntos [(x, y), ...], cerrado)
+# Las curvas y arcos se convierten en segmentos de recta
+def parsear_path(d):
+    tokens = TOKENS.findall(d)
+    if not tokens or tokens[0] not in 'Mm':
+        raise ValueError("El path debe empezar con M o m.")
+
+    subpaths = []
+    puntos = None
+    x = y = 0.0
+    inicio = (0.0, 0.0)
+    control = None # Último punto de control, para S y T
+    i = 0
+    comando = None
+
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            comando = tokens[i]
+            i += 1
+        elif comando is None:
+            raise ValueError(f"Número sin comando: {tokens[i]}")
+
+        tipo = comando.upper()
+        relativo = comando.islower()
+        n = PARAMETROS[tipo]
+
+        if tipo == 'Z':
+            if puntos:
+                subpaths.append((puntos, True))
+            puntos = None
+            x, y = inicio
+            control = None
+            comando = None # Después de Z tiene que venir otro comando
+            continue
+
+        try:
+            valores = [float(valor) for valor in tokens[i:i + n]]
+        except ValueError:
+            raise ValueError(f"Parámetros incompletos para {comando}")
+        if len(valores) < n:
+            raise ValueError(f"Parámetros incompletos para {comando}")
+        i += n
+
+        # Después de M/m los pares siguientes son L/l implícitos
+        if tipo == 'M':
+            if puntos:
+                subpaths.append((puntos, False))
+            x, y = (x + valores[0], y + valores[1]) if relativo else valores
+            inicio = (x, y)
+            puntos = [inicio]
+            comando = 'l' if relativo else 'L'
+            control = None
+            continue
+
+        if puntos is None: # Comando después de Z -> El subpath empieza donde terminó el anterior
+            puntos = [(x, y)]
+
+        dx, dy = (x, y) if relativo else (0.0, 0.0)
+        nuevo_control = None
+
+        if tipo == 'L':
+            segmento = [(dx + valores[0], dy + valores[1])]
+        elif tipo == 'H':
+            segmento = [(dx + valores[0] if relativo else valores[0], y)]
+        elif tipo == 'V':
+            segmento = [(x, dy + valores[0] if relativo else valores[0])]
+        elif tipo in 'CS':
+            if tipo == 'C':
+                c1 = (dx + valores[0], dy + valores[1])
+                resto = valores[2:]
+            else:
+                c1 = reflejar(control, (x, y)) if control and control[2] == 'C' else (x, y)
+                resto = valores
+            c2 = (dx + resto[0], dy + resto[1])
+            fin = (dx + resto[2], dy + resto[3])
+            segmento = bezier((x, y), c1, c2, fin)
+            nuevo_control = (*c2, 'C')
+        elif tipo in 'QT':
+            if tipo == 'Q':
+                c1 = (dx + valores[0], dy + valores[1])
+                fin = (dx + valores[2], dy + valores[3])
+            else:
+                c1 = reflejar(control, (x, y)) if control and control[2] == 'Q' else (x, y)
+                fin = (dx + valores[0], dy + valores[1])
+            # Una cuadrática es una cúbica con los controles a 2/3
+            segmento = bezier(
+                (x, y),
+                (x + 2 / 3 * (c1[0] - x), y + 2 / 3 * (c1[1] - y)),
+                (fin[0] + 2 / 3 * (c1[0] - fin[0]), fin[1] + 2 / 3 * (c1[1] - fin[1])),
+                fin,
+            )
+            nuevo_control = (*c1, 'Q')
+        else: # A
+            fin = (dx + valores[5], dy + valores[6])
+            segmento = arco((x, y), valores[0], valores[1], valores[2], bool(valores[3]), bool(valores[4]), fin)
+
+        puntos.extend(segmento)
+        x, y = segmento[-1]
+        control = nuevo_control
+
+    if puntos:
+        subpaths.append((puntos, False))
+    return subpaths
+
+def reflejar(control, punto):
+    return (2 * punto[0] - control[0], 2 * punto[1] - control[1])
+
+# Puntos de una curva de Bézier cúbica (sin el inicial), más segmentos entre más larga sea
+def bezier(p0, p1, p2, p3):
+    largo = math.dist(p0, p1) + math.dist(p1, p2) + math.dist(p2, p3)
+    pasos = max(2, min(32, math.ceil(largo / 2)))
+
+    puntos = []
+    for paso in range(1, pasos + 1):
+        t = paso / pasos
+        u = 1 - t
+        puntos.append((
+            u**3 * p0[0] + 3 * u**2 * t * p1[0] + 3 * u * t**2 * p2[0] + t**3 * p3[0],
+            u**3 * p0[1] + 3 * u**2 * t * p1[1] + 3 * u * t**2 * p2[1] + t**3 * p3[1],
+        ))
+    return puntos
+
+# Puntos de un arco elíptico (sin el inicial), según la parametrización por extremos de la especificación SVG
+def arco(p0, rx, ry, rotacion, grande, barrido, p1):
+    rx, ry = abs(rx), abs(ry)
+    if not rx or not ry or p0 == p1:
+        return [p1]
+
+    phi = math.radians(rotacion)
+    cos, sin = math.cos(phi), math.sin(phi)
+    mx, my = (p0[0] - p1[0]) / 2, (p0[1] - p1[1]) / 2
+    x1 = cos * mx + sin * my
+    y1 = -sin * mx + cos * my
+
+    # Radios muy chicos -> Se escalan para que el arco alcance
+    escala = x1**2 / rx**2 + y1**2 / ry**2
+    if escala > 1:
+        rx, ry = rx * math.sqrt(escala), ry * math.sqrt(escala)
+
+    numerador = rx**2 * ry**2 - rx**2 * y1**2 - ry**2 * x1**2
+    factor = math.sqrt(max(0, numerador / (rx**2 * y1**2 + ry**2 * x1**2)))
+    if grande == barrido:
+        factor = -factor
+    cx1, cy1 = factor * rx * y1 / ry, -factor * ry * x1 / rx
+
+    cx = cos * cx1 - sin * cy1 + (p0[0] + p1[0]) / 2
+    cy = sin * cx1 + cos * cy1 + (p0[1] + p1[1]) / 2
+
+    theta = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    delta = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx) - theta
+    if barrido and delta < 0:
+        delta += 2 * math.pi
+    elif not barrido and delta > 0:
+        delta -= 2 * math.pi
+
+    pasos = max(2, min(64, math.ceil(abs(delta) * max(rx, ry) / 2)))
+    puntos = []
+    for paso in range(1, pasos + 1):
+        angulo = theta + delta * paso / pasos
+        ex, ey = rx * math.cos(angulo), ry * math.sin(angulo)
+        puntos.append((cos * ex - sin * ey + cx, sin * ex + cos * ey + cy))
+    puntos[-1] = p1
+    return puntos
+
+# Douglas-Peucker: quita los puntos que están a menos de `tolerancia` de la recta que los salta
+def douglas_peucker(puntos, tolerancia):
+    if len(puntos) < 3:
+        return list(puntos)
+
+    conservar = [False] * len(puntos)
+    conservar[0] = conservar[-1] = True
+    pendientes = [(0, len(puntos) - 1)]
+
+    # Iterativo para no topar con el límite de recursión en paths largos
+    while pendientes:
+        inicio, fin = pendientes.pop()
+        maxima, indice = 0.0, None
+
+        for i in range(inicio + 1, fin):
+            distancia = distancia_segmento(puntos[i], puntos[inicio], puntos[fin])
+            if distancia > maxima:
+                maxima, indice = distancia, i
+
+        if indice is not None and maxima > tolerancia:
+            conservar[indice] = True
+            pendientes.append((inicio, indice))
+            pendientes.append((indice, fin))
+
+    return [punto for punto, conservado in zip(puntos, conservar) if conservado]
+
+def distancia_segmento(p, a, b):
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    largo = dx * dx + dy * dy
+    if not largo:
+        return math.dist(p, a)
+
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / largo))
+    return math.dist(p, (a[0] + t * dx, a[1] + t * dy))
+
+def simplificar(subpaths, tolerancia=TOLERANCIA):
+    resultado = []
+    for puntos, cerrado in subpaths:
+        if cerrado and puntos[0] != puntos[-1]:
+            puntos = puntos + [puntos[0]] # El anillo cierra en el punto inicial
+        resultado.append((douglas_peucker(puntos, tolerancia), cerrado))
+    return resultado
+
+# Escribe los subpaths con comandos relativos (m, l, h, v, z) y coordenadas redondeadas
+def compactar(subpaths, decimales=DECIMALES):
+    escala = 10 ** decimales
+    partes = []
+    actual = (0, 0)
+    ultimo_comando = None
+
+    # Trabajamos con enteros (coordenada * escala) -> Los relativos no acumulan error de redondeo
+    for puntos, cerrado in subpaths:
+        enteros = []
+        for x, y in puntos:
+            punto = (round(x * escala), round(y * escala))
+            if not enteros or punto != enteros[-1]:
+                enteros.append(punto)
+        if cerrado and len(enteros) > 1 and enteros[-1] == enteros[0]:
+            enteros.pop() # z regresa al inicio
+        if not enteros:
+            continue
+
+        # El primer movimiento es absoluto (relativo al origen da lo mismo)
+        inicio = enteros[0]
+        partes.append(('m', [inicio[0] - actual[0], inicio[1] - actual[1]]))
+        ultimo_comando = 'm'
+
+        previo = inicio
+        for punto in enteros[1:]:
+            dx, dy = punto[0] - previo[0], punto[1] - previo[1]
+            if dy == 0:
+                comando, valores = 'h', [dx]
+            elif dx == 0:
+                comando, valores = 'v', [dy]
+            else:
+                comando, valores = 'l', [dx, dy]
+
+            # Después de m los pares ya son l implícitos -> No repetimos la letra
+            if comando == ultimo_comando or (comando == 'l' and ultimo_comando == 'm'):
+                partes[-1][1].extend(valores)
+            else:
+                partes.append((comando, valores))
+            ultimo_comando = 'm' if comando == 'l' and ultimo_comando == 'm' else comando
+            previo = punto
+
+        if cerrado:
+            partes.append(('z', []))
+            ultimo_comando = 'z'
+            actual = inicio
+        else:
+            actual = previo
+
+    return ''.join(comando + unir(valores, escala, decimales) for comando, valores in partes)
+
+def unir(valores, escala, decimales):
+    texto = ''
+    for valor in valores:
+        numero = formatear(valor / escala, decimales)
+        # Solo hace falta separar si el número no empieza con signo
+        if texto and not numero.startswith('-'):
+            texto += ' '
+        texto += numero
+    return texto
+
+# 12.50 -> 12.5, 0.5 -> .5, -0.5 -> -.5
+def formatear(valor, decimales):
+    numero = f'{valor:.{decimales}f}'.rstrip('0').rstrip('.') if decimales else str(int(valor))
+    if numero in ('', '-0'):
+        return '0'
+    if numero.startswith('0.'):
+        return numero[1:]
+    if numero.startswith('-0.'):
+        return '-' + numero[2:]
+    return numero
+
+# Path original -> Path simplificado y compacto, listo para el template
+def compactar_path(d, tolerancia=TOLERANCIA, decimales=DECIMALES):
+    return compactar(simplificar(parsear_path(d), tolerancia), decimales)
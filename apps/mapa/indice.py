@@ -0,0 +1,105 @@
+from apps.especies.cache import MemoriaPorVersion, firma_tabla
+from .geometria import parsear_path
+from .models import Zona
+
+# Índice espacial de las Zonas: polígonos con su caja envolvente repartidos en una rejilla.
+# Para un punto solo se revisan las zonas de su celda, y de esas solo las que tienen el punto en su caja.
+# Las coordenadas son las mismas de `vector_path`.
+
+CELDAS = 32 # La rejilla es de CELDAS x CELDAS sobre la extensión de todas las zonas
+
+class PoligonoZona:
+    def __init__(self, zona, anillos):
+        self.id = zona.id
+        self.nombre = zona.nombre
+        self.descripcion = zona.descripcion
+        self.slug = zona.slug
+        self.anillos = anillos
+
+        xs = [x for anillo in anillos for x, _ in anillo]
+        ys = [y for anillo in anillos for _, y in anillo]
+        self.caja = (min(xs), min(ys), max(xs), max(ys))
+
+        # Área (fórmula del zapato) -> Si dos zonas se enciman gana la más chica, la más específica
+        self.area = sum(abs(area_anillo(anillo)) for anillo in anillos)
+
+    def en_caja(self, x, y):
+        x0, y0, x1, y1 = self.caja
+        return x0 <= x <= x1 and y0 <= y <= y1
+
+    # Regla par-impar sobre todos los anillos -> Los huecos de la zona quedan fuera
+    def contiene(self, x, y):
+        if not self.en_caja(x, y):
+            return False
+
+        dentro = False
+        for anillo in self.anillos:
+            previo = anillo[-1]
+            for punto in anillo:
+                if (punto[1] > y) != (previo[1] > y):
+                    cruce = (previo[0] - punto[0]) * (y - punto[1]) / (previo[1] - punto[1]) + punto[0]
+                    if x < cruce:
+                        dentro = not dentro
+                previo = punto
+        return dentro
+
+def area_anillo(anillo):
+    return sum(
+        x0 * y1 - x1 * y0
+        for (x0, y0), (x1, y1) in zip(anillo, anillo[1:] + anillo[:1])
+    ) / 2
+
+class IndiceZonas:
+    def __init__(self, zonas):
+        self.poligonos = []
+        for zona in zonas:
+            try:
+                anillos = [puntos for puntos, _ in parsear_path(zona.vector_path) if len(puntos) >= 3]
+            except ValueError:
+                continue # Zona sin geometría válida -> No se puede ubicar nada en ella
+            if anillos:
+                self.poligonos.append(PoligonoZona(zona, anillos))
+
+        self.celdas = {}
+        if not self.poligonos:
+            return
+
+        self.x0 = min(poligono.caja[0] for poligono in self.poligonos)
+        self.y0 = min(poligono.caja[1] for poligono in self.poligonos)
+        x1 = max(poligono.caja[2] for poligono in self.poligonos)
+        y1 = max(poligono.caja[3] for poligono in self.poligonos)
+        self.ancho = (x1 - self.x0) / CELDAS or 1
+        self.alto = (y1 - self.y0) / CELDAS or 1
+
+        # Cada zona se registra en todas las celdas que toca su caja
+        for poligono in self.poligonos:
+            cx0, cy0 = self.celda(poligono.caja[0], poligono.caja[1])
+            cx1, cy1 = self.celda(poligono.caja[2], poligono.caja[3])
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.celdas.setdefault((cx, cy), []).append(poligono)
+
+    def celda(self, x, y):
+        cx = min(CELDAS - 1, max(0, int((x - self.x0) / self.ancho)))
+        cy = min(CELDAS - 1, max(0, int((y - self.y0) / self.alto)))
+        return cx, cy
+
+    # La zona más chica que contiene el punto, o None
+    def buscar(self, x, y):
+        if not self.celdas:
+            return None
+
+        candidatos = [
+            poligono for poligono in self.celdas.get(self.celda(x, y), [])
+            if poligono.contiene(x, y)
+        ]
+        return min(candidatos, key=lambda poligono: poligono.area, default=None)
+
+# Un índice por proceso, se reconstruye cuando cambia una Zona (la firma sale de la base de datos
+# -> Los cambios hechos desde otro proceso también se ven)
+indice = MemoriaPorVersion('mapa:zonas', lambda: IndiceZonas(
+    Zona.objects.only('id', 'nombre', 'descripcion', 'slug', 'vector_path')
+), firma=lambda: firma_tabla(Zona.objects))
+
+def zona_en_punto(x, y):
+    return indice.obtener().buscar(x, y)
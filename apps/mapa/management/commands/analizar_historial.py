@@ -0,0 +1,44 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from apps.mapa.tareas import analizar_pendientes, comparar_consecutivas, reiniciar_analisis
+
+class Command(BaseCommand):
+    help = "Calcula la cobertura de dosel de las imágenes del Historial y los cambios entre fechas consecutivas (solo lo que falta)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Número de procesos para analizar imágenes (por defecto uno por CPU)."
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=None,
+            help="Imágenes que se leen y mandan al pool a la vez (por defecto el doble de workers)."
+        )
+        parser.add_argument(
+            '--todo',
+            action='store_true',
+            help="Borra el análisis anterior y recalcula todas las imágenes."
+        )
+
+    def handle(self, *args, **options):
+        if options['todo']:
+            total = reiniciar_analisis()
+            self.stdout.write(f"{total} imágenes se volverán a analizar.")
+        
+        lote = options['lote'] or options['workers'] * 2
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            analizadas = analizar_pendientes(pool, lote, log=self.stderr.write)
+            self.stdout.write(f"{analizadas} imágenes analizadas.")
+            
+            # Después de la cobertura -> Las comparaciones usan las máscaras recién guardadas
+            comparadas = comparar_consecutivas(pool, lote, log=self.stderr.write)
+            self.stdout.write(f"{comparadas} pares de fechas comparados.")
+        
+        self.stdout.write(self.style.SUCCESS("Análisis del Historial al día."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.mapa.models import Zona
+from apps.mapa.geometria import compactar_path, TOLERANCIA, DECIMALES
+
+class Command(BaseCommand):
+    help = "Genera el path compacto (simplificado, redondeado y relativo) de todas las Zonas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=TOLERANCIA,
+            help=f"Distancia máxima entre el path original y el simplificado (default {TOLERANCIA})."
+        )
+        parser.add_argument(
+            '--decimales',
+            type=int,
+            default=DECIMALES,
+            help=f"Decimales de las coordenadas (default {DECIMALES})."
+        )
+
+    def handle(self, *args, **options):
+        original = compacto = 0
+        
+        for zona in Zona.objects.iterator():
+            try:
+                path = compactar_path(zona.vector_path, options['tolerancia'], options['decimales'])
+            except ValueError as error:
+                self.stderr.write(f"{zona.nombre}: {error}")
+                continue
+            
+            # update() no pasa por auto_now -> La fecha se mueve a mano para el GET condicional del mapa
+            Zona.objects.filter(pk=zona.pk).update(vector_path_compacto=path, fecha_actualizacion=timezone.now())
+            original += len(zona.vector_path)
+            compacto += len(path)
+        
+        self.stdout.write(self.style.SUCCESS(f"Paths compactados: {original} -> {compacto} caracteres."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.mapa.models import InventarioCampus, Zona
+
+class Command(BaseCommand):
+    help = "Recalcula el inventario del campus y los totales de todas las zonas (tras cargas masivas o updates directos a la DB)"
+
+    def handle(self, *args, **options):
+        Zona.actualizar_totales()
+        InventarioCampus.refrescar()
+        
+        self.stdout.write(self.style.SUCCESS(f"{InventarioCampus.objects.count()} especies en el inventario del campus."))
@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from apps.especies.utils import hash_archivo, mover_archivo
+from apps.mapa.models import Historial
+from apps.mapa.utils import nombre_historial
+
+class Command(BaseCommand):
+    help = "Renombra las imágenes del Historial al esquema por contenido: historial/<hash>.<ext>"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Solo muestra los cambios, no mueve archivos."
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        
+        for historial in Historial.objects.iterator():
+            # Otra fila con el mismo archivo ya pudo moverlo (y actualizar esta) -> Se lee el nombre actual
+            historial.refresh_from_db(fields=['imagen'])
+            storage = historial.imagen.storage
+            anterior = historial.imagen.name
+            
+            try:
+                with storage.open(anterior, 'rb') as archivo:
+                    huella = hash_archivo(archivo)
+            except OSError as error:
+                self.stderr.write(f"{anterior}: {error}")
+                continue
+            
+            nuevo = nombre_historial(huella, os.path.splitext(anterior)[1])
+            if nuevo == anterior:
+                continue
+            
+            self.stdout.write(f"{anterior} -> {nuevo}")
+            total += 1
+            if options['dry_run']:
+                continue
+            
+            nuevo = mover_archivo(storage, anterior, nuevo)
+            # También las filas que compartían el archivo; sus teselas y su análisis se vuelven a encolar
+            Historial.reemplazar_imagen(anterior, nuevo)
+        
+        self.stdout.write(self.style.SUCCESS(f"{total} imágenes renombradas."))
+        if total and not options['dry_run']:
+            self.stdout.write("Ejecuta manage.py procesar_historial --una-vez y analizar_historial para regenerar teselas y cobertura.")
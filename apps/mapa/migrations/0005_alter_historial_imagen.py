@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 18:20
+
+import apps.especies.almacenamiento
+import apps.mapa.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapa', '0004_alter_historial_options_alter_inventario_especie'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historial',
+            name='imagen',
+            field=models.ImageField(help_text='Sube una imagen de alta calidad.', storage=apps.especies.almacenamiento.AlmacenamientoPorContenido(), upload_to=apps.mapa.utils.ruta_historial, verbose_name='Imagen Satelital del Campus'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import Sum, Count, Q
+
+
+# Llena los totales de las zonas que ya existen
+def calcular_totales(apps, schema_editor):
+    Zona = apps.get_model('mapa', 'Zona')
+    Inventario = apps.get_model('mapa', 'Inventario')
+
+    totales = Inventario.objects.values('zona').annotate(
+        especies=Count('id', filter=Q(cantidad__gt=0)),
+        arboles=Sum('cantidad'),
+    )
+    for fila in totales:
+        Zona.objects.filter(id=fila['zona']).update(
+            total_especies=fila['especies'] or 0,
+            total_arboles=fila['arboles'] or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapa', '0005_alter_historial_imagen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zona',
+            name='total_arboles',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Ejemplares'),
+        ),
+        migrations.AddField(
+            model_name='zona',
+            name='total_especies',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Especies'),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
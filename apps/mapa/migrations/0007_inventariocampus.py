@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-18 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum, OuterRef, Subquery
+
+
+# Llena el inventario del campus con los datos que ya existen
+def llenar_inventario(apps, schema_editor):
+    Especie = apps.get_model('especies', 'Especie')
+    Galeria = apps.get_model('especies', 'Galeria')
+    InventarioCampus = apps.get_model('mapa', 'InventarioCampus')
+
+    portada = Galeria.objects.filter(
+        especie=OuterRef('id'),
+        categoria='GENERAL'
+    ).order_by('id').values('id')[:1]
+
+    InventarioCampus.objects.bulk_create([
+        InventarioCampus(especie_id=fila['id'], cantidad=fila['total'] or 0, portada_id=fila['portada'])
+        for fila in Especie.objects.annotate(
+            total=Sum('inventario__cantidad'),
+            portada=Subquery(portada)
+        ).values('id', 'total', 'portada')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('especies', '0012_alter_galeria_imagen'),
+        ('mapa', '0006_zona_totales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventarioCampus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('especie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inventario_campus', to='especies.especie', verbose_name='Especie')),
+                ('portada', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='especies.galeria', verbose_name='Imagen Principal')),
+            ],
+            options={
+                'verbose_name_plural': 'Inventario del Campus',
+                'ordering': ['-cantidad'],
+            },
+        ),
+        migrations.RunPython(llenar_inventario, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapa', '0007_inventariocampus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zona',
+            name='vector_path_compacto',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
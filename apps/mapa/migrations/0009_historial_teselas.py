@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapa', '0008_zona_vector_path_compacto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historial',
+            name='alto',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historial',
+            name='ancho',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historial',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('LISTA', 'Lista'), ('ERROR', 'Error')], default='PENDIENTE', editable=False, max_length=10, verbose_name='Estado de las teselas'),
+        ),
+    ]
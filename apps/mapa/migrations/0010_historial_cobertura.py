@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 17:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapa', '0009_historial_teselas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historial',
+            name='cobertura',
+            field=models.FloatField(editable=False, null=True, verbose_name='Cobertura de dosel (%)'),
+        ),
+        migrations.AddField(
+            model_name='historial',
+            name='comparada_con',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='mapa.historial', verbose_name='Imagen anterior'),
+        ),
+        migrations.AddField(
+            model_name='historial',
+            name='ganancia',
+            field=models.FloatField(editable=False, null=True, verbose_name='Dosel ganado (%)'),
+        ),
+        migrations.AddField(
+            model_name='historial',
+            name='indice_verde',
+            field=models.FloatField(editable=False, null=True, verbose_name='Índice de verde (ExG) promedio'),
+        ),
+        migrations.AddField(
+            model_name='historial',
+            name='perdida',
+            field=models.FloatField(editable=False, null=True, verbose_name='Dosel perdido (%)'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapa', '0010_historial_cobertura'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventario',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última actualización'),
+        ),
+        migrations.AddField(
+            model_name='zona',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última actualización'),
+        ),
+    ]
@@ -1,11 +1,18 @@
+import os
+
+from django.core.files.base import ContentFile
 from django.db import models
 
 from apps.perfiles.models import Usuario
+from apps.especies.almacenamiento import almacenamiento_por_contenido
+from apps.especies.utils import ESTADO_PROCESAMIENTO_CHOICES
 from ..utils import ruta_historial
+from ..teselas import descriptor
 
 class Historial(models.Model):
     imagen = models.ImageField(
         upload_to=ruta_historial,
+        storage=almacenamiento_por_contenido, # Misma imagen -> mismo archivo
         verbose_name="Imagen Satelital del Campus",
         help_text="Sube una imagen de alta calidad."
     )
@@ -26,7 +33,199 @@ class Historial(models.Model):
         auto_now=True
     )
     
+    # Pirámide de teselas para el visor (ver teselas.py) -> La genera manage.py procesar_historial
+    estado = models.CharField(
+        max_length=10,
+        choices=ESTADO_PROCESAMIENTO_CHOICES,
+        default='PENDIENTE',
+        editable=False,
+        verbose_name="Estado de las teselas"
+    )
+    
+    # Cuándo un worker lo tomó de la cola -> Los que llevan demasiado en PROCESANDO se pueden reintentar
+    fecha_reclamo = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False
+    )
+    
+    ancho = models.PositiveIntegerField(
+        null=True,
+        editable=False
+    )
+    
+    alto = models.PositiveIntegerField(
+        null=True,
+        editable=False
+    )
+    
+    # Cobertura de dosel (ver cobertura.py) -> La calcula manage.py analizar_historial
+    cobertura = models.FloatField(
+        null=True,
+        editable=False,
+        verbose_name="Cobertura de dosel (%)"
+    )
+    
+    indice_verde = models.FloatField(
+        null=True,
+        editable=False,
+        verbose_name="Índice de verde (ExG) promedio"
+    )
+    
+    # Cambios contra la imagen anterior por fecha_asociada
+    comparada_con = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        editable=False,
+        related_name='+',
+        verbose_name="Imagen anterior"
+    )
+    
+    ganancia = models.FloatField(
+        null=True,
+        editable=False,
+        verbose_name="Dosel ganado (%)"
+    )
+    
+    perdida = models.FloatField(
+        null=True,
+        editable=False,
+        verbose_name="Dosel perdido (%)"
+    )
+    
     class Meta:
         verbose_name = "Historial"
         verbose_name_plural = "Historial"
-        ordering = ['fecha_asociada']
\ No newline at end of file
+        ordering = ['fecha_asociada']
+    
+    # historial/<hash>.png -> <hash>
+    @property
+    def huella(self):
+        return os.path.splitext(os.path.basename(self.imagen.name))[0]
+    
+    # Misma imagen -> Mismas teselas, no se vuelven a generar
+    @property
+    def base_teselas(self):
+        return os.path.join('teselas', self.huella)
+    
+    # Máscara del dosel (blanco y negro) y capa verde transparente para el visor
+    @property
+    def ruta_mascara(self):
+        return os.path.join('cobertura', f'{self.huella}_mascara.png')
+    
+    @property
+    def ruta_cobertura(self):
+        return os.path.join('cobertura', f'{self.huella}.png')
+    
+    # Mismo par de imágenes -> Misma capa de cambios
+    def ruta_cambios(self, anterior):
+        return os.path.join('cambios', f'{anterior.huella}_{self.huella}.png')
+    
+    @property
+    def url_cobertura(self):
+        if self.cobertura is None:
+            return None
+        return self.imagen.storage.url(self.ruta_cobertura)
+    
+    @property
+    def url_cambios(self):
+        if self.ganancia is None or self.comparada_con is None or self.comparada_con.imagen.name == self.imagen.name:
+            return None
+        return self.imagen.storage.url(self.ruta_cambios(self.comparada_con))
+    
+    @property
+    def url_dzi(self):
+        if self.estado != 'LISTA':
+            return None
+        return self.imagen.storage.url(f'{self.base_teselas}.dzi')
+    
+    # Guarda la pirámide generada en segundo plano (ver tareas.py)
+    # El .dzi se escribe al final -> Si existe, todas sus teselas ya están
+    def aplicar_teselas(self, ancho, alto, teselas):
+        storage = self.imagen.storage
+        
+        for ruta, contenido in teselas:
+            storage.save(f'{self.base_teselas}_files/{ruta}', ContentFile(contenido))
+        storage.save(f'{self.base_teselas}.dzi', ContentFile(descriptor(ancho, alto).encode()))
+        
+        self.marcar_lista(ancho, alto)
+    
+    def marcar_lista(self, ancho, alto):
+        self.ancho, self.alto, self.estado = ancho, alto, 'LISTA'
+        
+        # update() para no volver a disparar save()
+        Historial.objects.filter(pk=self.pk).update(ancho=ancho, alto=alto, estado=self.estado)
+    
+    # Guarda el análisis de cobertura (ver tareas.py)
+    def aplicar_cobertura(self, estadisticas, mascara, capa):
+        storage = self.imagen.storage
+        storage.save(self.ruta_mascara, ContentFile(mascara))
+        storage.save(self.ruta_cobertura, ContentFile(capa))
+        
+        self.cobertura, self.indice_verde = estadisticas['cobertura'], estadisticas['indice']
+        Historial.objects.filter(pk=self.pk).update(cobertura=self.cobertura, indice_verde=self.indice_verde)
+    
+    def aplicar_cambios(self, anterior, estadisticas, capa):
+        if capa is not None: # None -> Misma imagen en las dos fechas, no hay capa de cambios
+            self.imagen.storage.save(self.ruta_cambios(anterior), ContentFile(capa))
+        
+        self.comparada_con, self.ganancia, self.perdida = anterior, estadisticas['ganancia'], estadisticas['perdida']
+        Historial.objects.filter(pk=self.pk).update(comparada_con=anterior, ganancia=self.ganancia, perdida=self.perdida)
+    
+    # Los comandos de mantenimiento (renombrar_historial, deduplicar_media) cambian el archivo de varias filas
+    # con update(): las teselas y el análisis van por la huella del archivo -> Se vuelven a encolar
+    # (si otra fila ya tiene listo el archivo nuevo, los workers solo copian sus datos)
+    @classmethod
+    def reemplazar_imagen(cls, anterior, nuevo):
+        filas = cls.objects.filter(imagen=anterior)
+        huella = os.path.splitext(os.path.basename(anterior))[0]
+        
+        cls.objects.filter(comparada_con__in=filas).update(ganancia=None, perdida=None)
+        total = filas.update(
+            imagen=nuevo, estado='PENDIENTE', ancho=None, alto=None,
+            cobertura=None, indice_verde=None, ganancia=None, perdida=None
+        )
+        
+        if not cls.objects.filter(imagen__startswith=f'historial/{huella}.').exists():
+            cls.borrar_derivados(huella)
+        return total
+    
+    # Teselas, máscara y capas de una huella que ya nadie usa
+    @staticmethod
+    def borrar_derivados(huella):
+        storage = Historial.imagen.field.storage
+        
+        def borrar_carpeta(carpeta):
+            if not storage.exists(carpeta):
+                return
+            carpetas, archivos = storage.listdir(carpeta)
+            for nombre in carpetas:
+                borrar_carpeta(os.path.join(carpeta, nombre))
+            for nombre in archivos:
+                storage.delete(os.path.join(carpeta, nombre))
+            try:
+                os.rmdir(storage.path(carpeta)) # FileSystemStorage no borra las carpetas vacías
+            except (NotImplementedError, OSError):
+                pass
+        
+        borrar_carpeta(os.path.join('teselas', f'{huella}_files'))
+        storage.delete(os.path.join('teselas', f'{huella}.dzi'))
+        storage.delete(os.path.join('cobertura', f'{huella}.png'))
+        storage.delete(os.path.join('cobertura', f'{huella}_mascara.png'))
+        if storage.exists('cambios'):
+            for nombre in storage.listdir('cambios')[1]:
+                if huella in os.path.splitext(nombre)[0].split('_'):
+                    storage.delete(os.path.join('cambios', nombre))
+    
+    def save(self, *args, **kwargs):
+        # Imagen nueva -> Sus teselas y su análisis se generan en segundo plano
+        if self.imagen and not self.imagen._committed:
+            self.estado = 'PENDIENTE'
+            self.cobertura = self.indice_verde = self.ganancia = self.perdida = None
+            
+            # La imagen siguiente se comparó contra la anterior versión de esta
+            if self.pk:
+                Historial.objects.filter(comparada_con=self).update(ganancia=None, perdida=None)
+        
+        super().save(*args, **kwargs)
\ No newline at end of file
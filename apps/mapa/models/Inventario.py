@@ -19,6 +19,11 @@ class Inventario(models.Model):
     )
     
     cantidad = models.PositiveIntegerField(default=1)
+    
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última actualización"
+    )
 
     class Meta:
         # Evitar duplicados: No puedes tener dos registros de "Roble" en "Zona A"
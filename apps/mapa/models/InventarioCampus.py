@@ -0,0 +1,63 @@
+from django.db import models, transaction
+from django.db.models import Sum
+
+from apps.especies.models import Especie, Galeria
+from apps.especies.categorias import imagenes_por_categoria
+
+# Inventario de todo el campus ya agregado: una fila por especie con la suma de todas las zonas
+# Se refresca cuando cambian el Inventario, la Galeria o las Especies (ver signals.py)
+class InventarioCampus(models.Model):
+    especie = models.OneToOneField(
+        Especie,
+        on_delete=models.CASCADE,
+        related_name='inventario_campus',
+        verbose_name="Especie"
+    )
+    
+    cantidad = models.PositiveIntegerField(default=0)
+    
+    # Primera imagen GENERAL de la especie
+    portada = models.ForeignKey(
+        Galeria,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Imagen Principal"
+    )
+    
+    class Meta:
+        ordering = ['-cantidad']
+        verbose_name_plural = "Inventario del Campus"
+    
+    def __str__(self):
+        return f"{self.especie}: {self.cantidad}"
+    
+    # Mismo nombre que en ZonaDetailView -> El template de la zona sirve para los dos
+    @property
+    def imagen_principal(self):
+        return self.portada
+    
+    # Recalcula las filas de las especies indicadas (por id), o todas si no se indica ninguna
+    @classmethod
+    def refrescar(cls, *especie_ids):
+        especies = Especie.all_objects.all()
+        if especie_ids:
+            especies = especies.filter(id__in=especie_ids)
+        
+        totales = list(especies.annotate(total=Sum('inventario__cantidad')).values_list('id', 'total'))
+        # Solo imagenes LISTA, también de especies inactivas (el inventario las sigue mostrando)
+        # -> Desactivar y volver a activar una especie no le quita la portada
+        portadas = imagenes_por_categoria(
+            [id_especie for id_especie, _ in totales], ['GENERAL'], Galeria.all_objects.filter(estado='LISTA')
+        )
+        
+        filas = [
+            cls(especie_id=id_especie, cantidad=total or 0, portada=portadas.get(id_especie, {}).get('GENERAL'))
+            for id_especie, total in totales
+        ]
+        
+        with transaction.atomic():
+            borrar = cls.objects.filter(especie_id__in=especie_ids) if especie_ids else cls.objects.all()
+            borrar.delete()
+            cls.objects.bulk_create(filas)
@@ -1,7 +1,10 @@
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Sum, Count, Q
+from django.utils import timezone
 from django.utils.text import slugify
 
+from ..geometria import compactar_path
+
 class Zona(models.Model):
     nombre = models.CharField(
         max_length=50,
@@ -17,6 +20,13 @@ class Zona(models.Model):
         )
     
     vector_path = models.TextField(help_text="El atributo 'd' del path SVG")
+    
+    # Versión simplificada y con comandos relativos del path, es la que se dibuja en el mapa
+    # El original se conserva para poder editarlo
+    vector_path_compacto = models.TextField(
+        blank=True,
+        editable=False
+    )
 
     slug = models.SlugField(
         max_length=255, 
@@ -25,29 +35,52 @@ class Zona(models.Model):
         help_text="Texto para la URL (se genera automáticamente si se deja vacío)."
     )
     
-    _total_arboles_manual = None
+    # Totales del inventario guardados en la Zona -> El mapa no consulta el inventario de cada zona
+    # Se recalculan con actualizar_totales() cada que cambia el Inventario (ver signals.py)
+    total_especies = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Total de Especies"
+    )
+    
+    total_arboles = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Total de Ejemplares"
+    )
+    
+    # Junto con la del Inventario da la última modificación del mapa (ver apps/especies/condicional.py)
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última actualización"
+    )
+    
     _top_especies = None
     
     def __str__(self):
         return f'{self.nombre} - {self.descripcion}'
     
-    
-    @property
-    def total_especies(self):
-        return self.inventario.filter(cantidad__gt=0).count()
-    
-    @property
-    def total_arboles(self):
-        if self._total_arboles_manual is not None:
-            return self._total_arboles_manual
+    # Recalcula los totales de las zonas indicadas (por id) con una sola consulta de agregación
+    @classmethod
+    def actualizar_totales(cls, *ids):
+        from . import Inventario
         
-        resultado = self.inventario.aggregate(total=Sum('cantidad'))
-        return resultado['total'] or 0
-    
-    
-    @total_arboles.setter
-    def total_arboles(self, valor):
-        self._total_arboles_manual = valor
+        zonas = cls.objects.filter(id__in=ids) if ids else cls.objects.all()
+        totales = {
+            fila['zona']: fila
+            for fila in Inventario.objects.filter(zona__in=zonas).values('zona').annotate(
+                especies=Count('id', filter=Q(cantidad__gt=0)),
+                arboles=Sum('cantidad'),
+            )
+        }
+        
+        for zona in zonas.only('id'):
+            fila = totales.get(zona.id, {})
+            cls.objects.filter(id=zona.id).update(
+                total_especies=fila.get('especies') or 0,
+                total_arboles=fila.get('arboles') or 0,
+                fecha_actualizacion=timezone.now(), # Cambió su inventario -> Last-Modified del mapa y de la zona
+            )
 
     @property
     def top_especies(self):
@@ -61,8 +94,19 @@ class Zona(models.Model):
     def top_especies(self, valor):
         self._top_especies = valor
 
+    @property
+    def path_mapa(self):
+        return self.vector_path_compacto or self.vector_path
+    
+    def compactar_path(self):
+        try:
+            self.vector_path_compacto = compactar_path(self.vector_path)
+        except ValueError:
+            self.vector_path_compacto = '' # Path que no se pudo leer -> Se dibuja el original
+    
     # Generar el slug automáticamente
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.nombre)
+        self.compactar_path()
         super().save(*args, **kwargs)
\ No newline at end of file
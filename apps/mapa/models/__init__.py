@@ -1,3 +1,4 @@
 from .Historial import Historial
 from .Zona import Zona
-from .Inventario import Inventario
\ No newline at end of file
+from .Inventario import Inventario
+from .InventarioCampus import InventarioCampus
@@ -0,0 +1,51 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.especies.models import Especie, Galeria
+from apps.especies.signals import imagenes_creadas, imagen_procesada
+from .models import Zona, Inventario, InventarioCampus
+from .indice import indice
+
+# Al borrar una especie se borran en cascada su Galeria e Inventario
+# -> No hay que volver a crear su fila del campus (la especie ya no va a existir)
+def borrando_especie(origin):
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(modelo, Especie)
+
+# Cualquier cambio en el Inventario recalcula los totales de su Zona y el inventario del campus
+@receiver(post_save, sender=Inventario)
+@receiver(post_delete, sender=Inventario)
+def actualizar_inventario(sender, instance, origin=None, **kwargs):
+    Zona.actualizar_totales(instance.zona_id)
+    
+    if not borrando_especie(origin):
+        InventarioCampus.refrescar(instance.especie_id)
+
+# La imagen principal del campus sale de la Galeria
+@receiver(post_save, sender=Galeria)
+@receiver(post_delete, sender=Galeria)
+def actualizar_portada_campus(sender, instance, origin=None, **kwargs):
+    if not borrando_especie(origin):
+        InventarioCampus.refrescar(instance.especie_id)
+
+@receiver(imagenes_creadas, sender=Galeria)
+def actualizar_portada_campus_masiva(sender, especie, **kwargs):
+    InventarioCampus.refrescar(especie.id)
+
+# La portada solo puede ser una imagen LISTA -> Se vuelve a elegir cuando el worker termina una
+@receiver(imagen_procesada, sender=Galeria)
+def actualizar_portada_campus_procesada(sender, galeria, **kwargs):
+    InventarioCampus.refrescar(galeria.especie_id)
+
+# Las especies nuevas también aparecen en el inventario del campus
+@receiver(post_save, sender=Especie)
+def agregar_especie_campus(sender, instance, created, **kwargs):
+    if created:
+        InventarioCampus.refrescar(instance.id)
+
+# El índice espacial se reconstruye con la geometría nueva
+@receiver(post_save, sender=Zona)
+@receiver(post_delete, sender=Zona)
+def actualizar_indice_zonas(sender, **kwargs):
+    indice.invalidar()
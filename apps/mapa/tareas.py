@@ -0,0 +1,170 @@
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.especies.tareas import ERRORES_IMAGEN, TIMEOUT_PROCESANDO
+from .cobertura import analizar_imagen, comparar
+from .models import Historial
+from .teselas import generar_piramide
+
+# Cola de las teselas del Historial respaldada por la DB, igual que la de la Galería (apps/especies/tareas.py):
+# los registros con estado PENDIENTE son los trabajos y manage.py procesar_historial los corta en un pool de procesos.
+
+def reclamar_pendientes(limite):
+    with transaction.atomic():
+        ids = list(
+            Historial.objects.select_for_update(skip_locked=True)
+            .filter(estado='PENDIENTE')
+            .order_by('id')
+            .values_list('id', flat=True)[:limite]
+        )
+        Historial.objects.filter(id__in=ids).update(estado='PROCESANDO', fecha_reclamo=timezone.now())
+    return ids
+
+# Las que un worker vivo sigue procesando (reclamadas hace menos de TIMEOUT_PROCESANDO) no se tocan
+def reintentar_fallidas():
+    abandonadas = Q(estado='PROCESANDO') & (
+        Q(fecha_reclamo__lt=timezone.now() - TIMEOUT_PROCESANDO) | Q(fecha_reclamo__isnull=True)
+    )
+    return Historial.objects.filter(Q(estado='ERROR') | abandonadas).update(estado='PENDIENTE')
+
+# Cualquier falla deja solo ese registro en ERROR y un pool caído se avisa al final (ver apps/especies/tareas.py)
+def procesar_pendientes(pool, limite, log=print):
+    ids = reclamar_pendientes(limite)
+    pool_caido = None
+
+    futuros = {}
+    for historial in Historial.objects.in_bulk(ids).values():
+        try:
+            # La misma imagen ya tiene sus teselas (otro registro) -> Solo se copian las medidas
+            existente = Historial.objects.filter(imagen=historial.imagen.name, estado='LISTA').exclude(pk=historial.pk).first()
+            if existente:
+                historial.marcar_lista(existente.ancho, existente.alto)
+                continue
+
+            with historial.imagen.storage.open(historial.imagen.name, 'rb') as archivo:
+                datos = archivo.read()
+            futuros[pool.submit(generar_piramide, datos)] = historial
+        except Exception as error:
+            marcar_error(historial, error, log)
+            if isinstance(error, BrokenProcessPool):
+                pool_caido = error
+
+    for futuro in as_completed(futuros):
+        historial = futuros[futuro]
+        try:
+            historial.aplicar_teselas(*futuro.result())
+        except Exception as error:
+            marcar_error(historial, error, log)
+            if isinstance(error, BrokenProcessPool):
+                pool_caido = error
+
+    if pool_caido:
+        raise pool_caido
+    return len(ids)
+
+def marcar_error(historial, error, log):
+    log(f"{historial.imagen.name}: {error}")
+    Historial.objects.filter(pk=historial.pk).update(estado='ERROR')
+
+# Análisis de cobertura (ver cobertura.py) -> manage.py analizar_historial
+# Incremental: solo se analizan las imágenes sin cobertura y solo se comparan los pares que cambiaron
+# (imagen nueva, otra fecha_asociada o un registro borrado entre dos fechas).
+
+def leer(storage, *nombres):
+    datos = []
+    for nombre in nombres:
+        with storage.open(nombre, 'rb') as archivo:
+            datos.append(archivo.read())
+    return datos
+
+# trabajos: [(nombre para el log, función del pool, archivos a leer, al terminar)]
+# Se mandan al pool de `lote` en `lote` -> Solo se tienen en memoria las imágenes del lote actual
+def ejecutar(pool, storage, trabajos, lote, log):
+    hechos = 0
+    for inicio in range(0, len(trabajos), lote):
+        futuros = {}
+        for nombre, funcion, archivos, al_terminar in trabajos[inicio:inicio + lote]:
+            try:
+                futuros[pool.submit(funcion, *leer(storage, *archivos))] = (nombre, al_terminar)
+            except OSError as error:
+                log(f"{nombre}: {error}")
+
+        for futuro in as_completed(futuros):
+            nombre, al_terminar = futuros[futuro]
+            try:
+                al_terminar(*futuro.result())
+                hechos += 1
+            except ERRORES_IMAGEN as error:
+                log(f"{nombre}: {error}")
+    return hechos
+
+def analizar_pendientes(pool, lote, log=print):
+    analizadas = set(Historial.objects.filter(cobertura__isnull=False).values_list('imagen', flat=True))
+    pendientes = {} # imagen -> [Historial, ...] -> Cada imagen se analiza una sola vez
+
+    for historial in Historial.objects.filter(cobertura__isnull=True).order_by('id'):
+        pendientes.setdefault(historial.imagen.name, []).append(historial)
+
+    trabajos = []
+    for nombre, historiales in pendientes.items():
+        if nombre in analizadas: # Otro registro con la misma imagen -> Mismas estadísticas, los archivos ya están
+            existente = Historial.objects.filter(imagen=nombre, cobertura__isnull=False).first()
+            Historial.objects.filter(pk__in=[historial.pk for historial in historiales]).update(
+                cobertura=existente.cobertura, indice_verde=existente.indice_verde
+            )
+            continue
+
+        trabajos.append((nombre, analizar_imagen, [nombre], partial(aplicar_cobertura, historiales)))
+
+    return ejecutar(pool, Historial.imagen.field.storage, trabajos, lote, log)
+
+def aplicar_cobertura(historiales, estadisticas, mascara, capa):
+    historiales[0].aplicar_cobertura(estadisticas, mascara, capa)
+    Historial.objects.filter(pk__in=[historial.pk for historial in historiales[1:]]).update(
+        cobertura=estadisticas['cobertura'], indice_verde=estadisticas['indice']
+    )
+
+def comparar_consecutivas(pool, lote, log=print):
+    trabajos = []
+    historiales = list(Historial.objects.order_by('fecha_asociada', 'id'))
+
+    # La primera fecha no tiene contra qué compararse
+    if historiales and historiales[0].comparada_con_id is not None:
+        Historial.objects.filter(pk=historiales[0].pk).update(comparada_con=None, ganancia=None, perdida=None)
+
+    for anterior, historial in zip(historiales, historiales[1:]):
+        if anterior.cobertura is None or historial.cobertura is None: # Sin máscara todavía (error al analizar)
+            continue
+        if historial.comparada_con_id == anterior.id and historial.ganancia is not None:
+            continue
+
+        if historial.imagen.name == anterior.imagen.name: # Misma imagen -> Sin cambios
+            historial.aplicar_cambios(anterior, {'ganancia': 0.0, 'perdida': 0.0}, None)
+            continue
+
+        trabajos.append((
+            f"{anterior.imagen.name} -> {historial.imagen.name}",
+            comparar,
+            [anterior.ruta_mascara, historial.ruta_mascara],
+            partial(historial.aplicar_cambios, anterior),
+        ))
+
+    return ejecutar(pool, Historial.imagen.field.storage, trabajos, lote, log)
+
+# Para recalcular todo (por ejemplo, después de cambiar UMBRAL_EXG)
+# Los archivos se borran porque el almacenamiento por contenido no sobrescribe los que ya existen
+def reiniciar_analisis():
+    storage = Historial.imagen.field.storage
+    for historial in Historial.objects.select_related('comparada_con'):
+        rutas = [historial.ruta_mascara, historial.ruta_cobertura]
+        if historial.comparada_con:
+            rutas.append(historial.ruta_cambios(historial.comparada_con))
+        for ruta in rutas:
+            storage.delete(ruta)
+
+    return Historial.objects.update(cobertura=None, indice_verde=None, comparada_con=None, ganancia=None, perdida=None)
@@ -0,0 +1,64 @@
+import math
+from io import BytesIO
+
+from PIL import Image
+
+from apps.especies.imagenes import a_webp
+
+# Pirámide de teselas (Deep Zoom / DZI) de las imágenes satelitales del Historial:
+# cada nivel es la imagen a la mitad de tamaño que el siguiente, cortada en teselas WebP de TAMANO px.
+# El visor (OpenSeadragon) solo pide las teselas que se ven con el zoom actual.
+# Estructura: teselas/<hash>.dzi y teselas/<hash>_files/<nivel>/<columna>_<fila>.webp
+
+TAMANO = 256
+TRASLAPE = 1 # Pixeles repetidos en los bordes -> Sin líneas entre teselas al hacer zoom
+FORMATO = 'webp'
+
+# Nivel 0 -> 1x1 px, último nivel -> Tamaño original
+def nivel_maximo(ancho, alto):
+    return math.ceil(math.log2(max(ancho, alto, 1)))
+
+def tamano_nivel(ancho, alto, nivel, maximo):
+    escala = 2 ** (maximo - nivel)
+    return max(1, math.ceil(ancho / escala)), max(1, math.ceil(alto / escala))
+
+def descriptor(ancho, alto):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="{FORMATO}" Overlap="{TRASLAPE}" TileSize="{TAMANO}">'
+        f'<Size Width="{ancho}" Height="{alto}"/>'
+        '</Image>'
+    )
+
+# Se ejecuta en los procesos del pool -> Solo recibe y regresa bytes para poder serializarse
+# Regresa (ancho, alto, [(ruta dentro de <hash>_files, bytes WebP), ...])
+def generar_piramide(datos):
+    img = Image.open(BytesIO(datos))
+    img.load()
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    ancho, alto = img.size
+    maximo = nivel_maximo(ancho, alto)
+    teselas = []
+
+    actual = img
+    for nivel in range(maximo, -1, -1):
+        # Cada nivel sale del anterior (la mitad) -> Más rápido que reducir siempre desde el original
+        tamano = tamano_nivel(ancho, alto, nivel, maximo)
+        if actual.size != tamano:
+            actual = actual.resize(tamano, Image.LANCZOS)
+
+        columnas = math.ceil(tamano[0] / TAMANO)
+        filas = math.ceil(tamano[1] / TAMANO)
+        for columna in range(columnas):
+            for fila in range(filas):
+                caja = (
+                    max(0, columna * TAMANO - TRASLAPE),
+                    max(0, fila * TAMANO - TRASLAPE),
+                    min(tamano[0], (columna + 1) * TAMANO + TRASLAPE),
+                    min(tamano[1], (fila + 1) * TAMANO + TRASLAPE),
+                )
+                teselas.append((f'{nivel}/{columna}_{fila}.{FORMATO}', a_webp(actual.crop(caja))))
+
+    return ancho, alto, teselas
@@ -1,3 +1,707 @@
-from django.test import TestCase
+import codecs
+import json
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apps.especies.models import Especie, Galeria
+from apps.especies.signals import imagen_procesada
+from PIL import Image
+
+from . import tareas
+from .cobertura import ANCHO, analizar_imagen, comparar
+from .exportar import COLUMNAS_ZONA, FILAS_POR_ENVIO, celda, generar_csv, generar_jsonl, generar_xlsx, pivote_zonas
+from .geometria import compactar_path, douglas_peucker, formatear, parsear_path
+from .indice import IndiceZonas
+from .models import Historial, Inventario, InventarioCampus, Zona
+from .teselas import TAMANO, descriptor, generar_piramide, nivel_maximo, tamano_nivel
+
+MEDIA_PRUEBAS = tempfile.mkdtemp(prefix='arboles-pruebas-')
+
+# Las pruebas no tocan la caché compartida (sesiones, páginas guardadas) ni los archivos de MEDIA_ROOT
+# y no necesitan collectstatic
+PRUEBAS = override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    MEDIA_ROOT=MEDIA_PRUEBAS,
+)
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_PRUEBAS, ignore_errors=True)
+
+def crear_especie(nombre_cientifico, nombre_comun=None, creador=None):
+    creador = creador or get_user_model().objects.get_or_create(username='staff')[0]
+    return Especie.objects.create(
+        nombre_comun=nombre_comun or nombre_cientifico.split()[0],
+        nombre_cientifico=nombre_cientifico,
+        creador=creador,
+    )
+
+# Imagen ya procesada (o en el estado indicado) sin pasar por el worker, con el aviso que manda el worker
+def crear_imagen(especie, estado='LISTA', categoria='GENERAL', color=(0, 128, 0)):
+    salida = BytesIO()
+    Image.new('RGB', (20, 10), color).save(salida, format='PNG')
+    galeria = Galeria.all_objects.create(
+        especie=especie, autor=especie.creador, categoria=categoria,
+        imagen=SimpleUploadedFile('foto.png', salida.getvalue()),
+    )
+    Galeria.all_objects.filter(pk=galeria.pk).update(estado=estado)
+    if estado == 'LISTA':
+        imagen_procesada.send(sender=Galeria, galeria=galeria)
+    return galeria
+
+# Cuadrado de `lado` con la esquina superior izquierda en (x, y)
+def crear_zona(nombre, x=0, y=0, lado=10):
+    return Zona.objects.create(nombre=nombre, vector_path=f'M{x} {y}H{x + lado}V{y + lado}H{x}Z')
+
+def png(ancho, alto, color=(0, 128, 0)):
+    salida = BytesIO()
+    Image.new('RGB', (ancho, alto), color).save(salida, format='PNG')
+    return salida.getvalue()
+
+def crear_historial(fecha_asociada=date(2024, 1, 1), ancho=40, alto=20, color=(0, 128, 0), datos=None):
+    autor = get_user_model().objects.get_or_create(username='staff')[0]
+    return Historial.objects.create(
+        autor=autor, fecha_asociada=fecha_asociada,
+        imagen=SimpleUploadedFile('satelital.png', datos or png(ancho, alto, color)),
+    )
+
+# Vista satelital de 100 x 20 px: las primeras `columnas` son copas de árboles y el resto pavimento
+def con_dosel(columnas, ancho=100):
+    img = Image.new('RGB', (ancho, 20), (128, 128, 128))
+    img.paste((34, 139, 34), (0, 0, columnas, 20))
+    salida = BytesIO()
+    img.save(salida, format='PNG')
+    return salida.getvalue()
+
+@PRUEBAS
+class TotalesZonaTests(TestCase):
+    def setUp(self):
+        self.norte = crear_zona('Norte')
+        self.sur = crear_zona('Sur', y=10)
+        self.ceiba = crear_especie('Ceiba pentandra')
+        self.acacia = crear_especie('Acacia farnesiana')
+
+    def totales(self, zona):
+        zona.refresh_from_db()
+        return zona.total_especies, zona.total_arboles
+
+    def test_totales_siguen_al_inventario(self):
+        self.assertEqual(self.totales(self.norte), (0, 0))
+
+        ceiba = Inventario.objects.create(zona=self.norte, especie=self.ceiba, cantidad=3)
+        Inventario.objects.create(zona=self.norte, especie=self.acacia, cantidad=2)
+        Inventario.objects.create(zona=self.sur, especie=self.acacia, cantidad=7)
+        self.assertEqual(self.totales(self.norte), (2, 5))
+        self.assertEqual(self.totales(self.sur), (1, 7))
+
+        ceiba.cantidad = 0 # Sin ejemplares -> Ya no cuenta como especie de la zona
+        ceiba.save()
+        self.assertEqual(self.totales(self.norte), (1, 2))
+
+        ceiba.delete()
+        Inventario.objects.filter(zona=self.norte).get().delete()
+        self.assertEqual(self.totales(self.norte), (0, 0))
+        self.assertEqual(self.totales(self.sur), (1, 7))
+
+    def test_actualizar_totales_despues_de_un_update(self):
+        Inventario.objects.create(zona=self.norte, especie=self.ceiba, cantidad=3)
+        Inventario.objects.filter(zona=self.norte).update(cantidad=10) # Sin señales
+        self.assertEqual(self.totales(self.norte), (1, 3))
+
+        Zona.actualizar_totales()
+        self.assertEqual(self.totales(self.norte), (1, 10))
+
+    def test_mapa_sin_una_consulta_por_zona(self):
+        for i in range(5):
+            zona = crear_zona(f'Zona {i}', x=20 + i * 10)
+            Inventario.objects.create(zona=zona, especie=self.ceiba, cantidad=i + 1)
+
+        # Firma de las zonas (GET condicional) + zonas con sus totales
+        with self.assertNumQueries(2):
+            respuesta = self.client.get('/historial/mapa_inventario')
+        self.assertContains(respuesta, 'Total de Especies: 1<br>Total de Ejemplares: 5')
+
+@PRUEBAS
+class InventarioCampusTests(TestCase):
+    def setUp(self):
+        self.norte = crear_zona('Norte')
+        self.sur = crear_zona('Sur', y=10)
+        self.ceiba = crear_especie('Ceiba pentandra')
+        self.acacia = crear_especie('Acacia farnesiana')
+
+    def campus(self):
+        return {fila.especie_id: fila for fila in InventarioCampus.objects.all()}
+
+    def test_suma_de_todas_las_zonas(self):
+        Inventario.objects.create(zona=self.norte, especie=self.ceiba, cantidad=3)
+        inventario = Inventario.objects.create(zona=self.sur, especie=self.ceiba, cantidad=4)
+        Inventario.objects.create(zona=self.sur, especie=self.acacia, cantidad=1)
+
+        campus = self.campus()
+        self.assertEqual((campus[self.ceiba.id].cantidad, campus[self.acacia.id].cantidad), (7, 1))
+
+        inventario.delete()
+        self.assertEqual(self.campus()[self.ceiba.id].cantidad, 3)
+
+        # Especie nueva sin inventario -> Aparece con 0
+        tabebuia = crear_especie('Tabebuia rosea')
+        self.assertEqual(self.campus()[tabebuia.id].cantidad, 0)
+
+        # Borrar la especie borra su fila
+        self.acacia.delete()
+        self.assertNotIn(self.acacia.id, self.campus())
+
+    def test_portada_solo_de_imagenes_listas(self):
+        crear_imagen(self.ceiba, categoria='CORTEZA', color=(1, 1, 1))
+        pendiente = crear_imagen(self.ceiba, estado='PENDIENTE', color=(2, 2, 2))
+        InventarioCampus.refrescar(self.ceiba.id)
+        self.assertIsNone(self.campus()[self.ceiba.id].portada)
+
+        lista = crear_imagen(self.ceiba, color=(3, 3, 3))
+        self.assertEqual(self.campus()[self.ceiba.id].portada, lista)
+
+        # Cuando el worker termina la pendiente (id menor) pasa a ser la portada
+        Galeria.all_objects.filter(pk=pendiente.pk).update(estado='LISTA')
+        InventarioCampus.refrescar(self.ceiba.id)
+        self.assertEqual(self.campus()[self.ceiba.id].portada, pendiente)
+
+    def test_desactivar_no_quita_la_portada(self):
+        portada = crear_imagen(self.ceiba)
+        Inventario.objects.create(zona=self.norte, especie=self.ceiba, cantidad=3)
+
+        self.ceiba.soft_delete()
+        InventarioCampus.refrescar()
+        self.assertEqual(self.campus()[self.ceiba.id].portada, portada)
+
+        self.ceiba.activar()
+        self.assertEqual(self.campus()[self.ceiba.id].portada, portada)
+
+    def test_inventario_completo(self):
+        crear_zona('Campus', x=100)
+        crear_imagen(self.ceiba)
+        Inventario.objects.create(zona=self.norte, especie=self.ceiba, cantidad=3)
+        Inventario.objects.create(zona=self.sur, especie=self.acacia, cantidad=5)
+
+        # El inventario ya agregado (con especies y portadas) y la zona campus
+        with self.assertNumQueries(2):
+            respuesta = self.client.get('/historial/inventario_completo')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['zona'].total_arboles, 8)
+        self.assertEqual([fila.especie for fila in respuesta.context['inventario']], [self.acacia, self.ceiba])
+
+class GeometriaTests(SimpleTestCase):
+    def test_formatear(self):
+        self.assertEqual(formatear(12.50, 2), '12.5')
+        self.assertEqual(formatear(0.5, 2), '.5')
+        self.assertEqual(formatear(-0.5, 2), '-.5')
+        self.assertEqual(formatear(3.0, 2), '3')
+        self.assertEqual(formatear(-0.001, 2), '0')
+
+    def test_parsear_path(self):
+        self.assertEqual(
+            parsear_path('M0 0H5V5h-5z'),
+            [([(0.0, 0.0), (5.0, 0.0), (5.0, 5.0), (0.0, 5.0)], True)],
+        )
+        # Los pares después de m son l relativos
+        self.assertEqual(parsear_path('m1 1 2 0 0 2'), [([(1.0, 1.0), (3.0, 1.0), (3.0, 3.0)], False)])
+
+    def test_parsear_path_invalido(self):
+        for d in ['', 'L 0 0', '10 10', 'M 0 0 L 5']:
+            with self.subTest(d=d), self.assertRaises(ValueError):
+                parsear_path(d)
+
+    def test_douglas_peucker(self):
+        self.assertEqual(douglas_peucker([(0, 0), (1, 0.1), (2, 0)], 0.25), [(0, 0), (2, 0)])
+        self.assertEqual(douglas_peucker([(0, 0), (1, 1), (2, 0)], 0.25), [(0, 0), (1, 1), (2, 0)])
+        self.assertEqual(douglas_peucker([(0, 0), (1, 1)], 0.25), [(0, 0), (1, 1)])
+
+    def test_compactar_path(self):
+        self.assertEqual(compactar_path('M 10.5 20 L 30.25 20 L 30.25 40 Z'), 'm10.5 20h19.75v20z')
+        self.assertEqual(compactar_path('M 0 0 L 1 0.001 L 2 0 L 3 0.001 L 4 0'), 'm0 0h4')
+        self.assertEqual(compactar_path('m 0 0 l 10 0 l 0 10 z m 20 0 l 5 5'), 'm0 0h10v10zm20 0 5 5')
+
+    def test_compactar_path_curvas(self):
+        compacto = compactar_path('M0,0 C 0,10 10,10 10,0')
+        (puntos, cerrado), = parsear_path(compacto)
+        self.assertFalse(cerrado)
+        self.assertEqual(puntos[0], (0.0, 0.0))
+        self.assertAlmostEqual(puntos[-1][0], 10, places=1)
+        self.assertAlmostEqual(puntos[-1][1], 0, places=1)
+        self.assertLessEqual(max(y for _, y in puntos), 7.5 + 0.25) # La altura máxima de esta curva es 7.5
+
+@PRUEBAS
+class ZonaPathTests(TestCase):
+    def test_save_compacta_el_path(self):
+        zona = Zona.objects.create(nombre='Norte', vector_path='M 0.00 0.00 L 10.00 0.00 L 10.00 10.00 Z')
+        self.assertEqual(zona.vector_path_compacto, 'm0 0h10v10z')
+        self.assertEqual(zona.path_mapa, 'm0 0h10v10z')
+
+    def test_path_invalido_usa_el_original(self):
+        zona = Zona.objects.create(nombre='Sur', vector_path='L 0 0 10 10')
+        self.assertEqual(zona.vector_path_compacto, '')
+        self.assertEqual(zona.path_mapa, 'L 0 0 10 10')
+
+@PRUEBAS
+class BuscarZonaTests(TestCase):
+    def setUp(self):
+        self.norte = crear_zona('Norte', lado=100)
+        self.kiosko = crear_zona('Kiosko', x=40, y=40, lado=10) # Dentro de Norte
+        # Cuadrado con un hueco en medio (regla par-impar)
+        self.patio = Zona.objects.create(nombre='Patio', vector_path='M200 0H300V100H200ZM240 40H260V60H240Z')
+
+    def buscar(self, x, y):
+        respuesta = self.client.get('/historial/buscar_zona', {'x': x, 'y': y})
+        self.assertEqual(respuesta.status_code, 200)
+        zona = respuesta.json()['zona']
+        return zona and zona['slug']
+
+    def test_punto_en_zona(self):
+        self.assertEqual(self.buscar(10, 10), 'norte')
+        self.assertEqual(self.buscar(0, 0), 'norte') # En el borde de la caja
+        self.assertEqual(self.buscar(150, 50), None)
+        self.assertEqual(self.buscar(-5, 50), None)
+
+        respuesta = self.client.get('/historial/buscar_zona', {'x': 10, 'y': 10}).json()
+        self.assertEqual(respuesta['zona']['url'], '/historial/zona_detalle/norte')
+
+    def test_zonas_encimadas_gana_la_mas_chica(self):
+        self.assertEqual(self.buscar(45, 45), 'kiosko')
+
+    def test_huecos(self):
+        self.assertEqual(self.buscar(210, 10), 'patio')
+        self.assertEqual(self.buscar(250, 50), None)
+
+    def test_parametros_invalidos(self):
+        for parametros in [{}, {'x': 1}, {'x': 'a', 'y': 1}, {'x': 'nan', 'y': 1}, {'x': 'inf', 'y': 1}]:
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get('/historial/buscar_zona', parametros).status_code, 400)
+
+    def test_el_indice_sigue_a_las_zonas(self):
+        self.assertEqual(self.buscar(150, 50), None)
+
+        self.norte.vector_path = 'M0 0H200V100H0Z'
+        self.norte.save()
+        self.assertEqual(self.buscar(150, 50), 'norte')
+
+        self.kiosko.delete()
+        self.assertEqual(self.buscar(45, 45), 'norte')
+
+    def test_zona_sin_geometria_valida(self):
+        indice = IndiceZonas([Zona(nombre='Rota', vector_path='L 0 0'), Zona(nombre='Linea', vector_path='M0 0L5 5')])
+        self.assertEqual(indice.poligonos, [])
+        self.assertIsNone(indice.buscar(1, 1))
+
+@PRUEBAS
+class ExportarTests(TestCase):
+    def setUp(self):
+        self.ceiba = crear_especie('Ceiba pentandra', 'Ceiba')
+        self.acacia = crear_especie('Acacia farnesiana', 'Huizache')
+        self.norte = crear_zona('Norte')
+        self.sur = crear_zona('Sur', y=10)
+
+        Inventario.objects.create(zona=self.norte, especie=self.ceiba, cantidad=3)
+        Inventario.objects.create(zona=self.sur, especie=self.ceiba, cantidad=2)
+        Inventario.objects.create(zona=self.sur, especie=self.acacia, cantidad=5)
+        Inventario.objects.create(zona=self.norte, especie=self.acacia, cantidad=0) # No se exporta
+
+    def contenido(self, respuesta):
+        return b''.join(respuesta.streaming_content)
+
+    def test_csv(self):
+        partes = list(generar_csv(COLUMNAS_ZONA, [('Ceiba', 'Ceiba pentandra', 3), ('Árbol, "raro"', 'X', 1)]))
+        self.assertEqual(partes[0], codecs.BOM_UTF8)
+        self.assertEqual(partes[1], 'Nombre Común,Nombre Científico,Cantidad\r\n')
+        self.assertEqual(partes[2:], ['Ceiba,Ceiba pentandra,3\r\n', '"Árbol, ""raro""",X,1\r\n'])
+
+    def test_jsonl(self):
+        lineas = list(generar_jsonl(COLUMNAS_ZONA, [('Ceiba', 'Ceiba pentandra', 3), ('Árbol', 'X', 1)]))
+        self.assertTrue(all(linea.endswith('\n') for linea in lineas))
+        self.assertEqual(
+            [json.loads(linea) for linea in lineas],
+            [
+                {'nombre_comun': 'Ceiba', 'nombre_cientifico': 'Ceiba pentandra', 'cantidad': 3},
+                {'nombre_comun': 'Árbol', 'nombre_cientifico': 'X', 'cantidad': 1},
+            ],
+        )
+        self.assertIn('Árbol', lineas[1]) # Sin escapar los acentos
+
+    def test_xlsx(self):
+        filas = [('Ceiba', 'Ceiba pentandra', 3), ('A & B <\x01>', None, 1.5)]
+        contenido = b''.join(generar_xlsx(COLUMNAS_ZONA, filas, hoja='Zona: Norte'))
+
+        with zipfile.ZipFile(BytesIO(contenido)) as archivo:
+            self.assertIsNone(archivo.testzip())
+            self.assertIn('[Content_Types].xml', archivo.namelist())
+            self.assertIn('<sheet name="Zona Norte"', archivo.read('xl/workbook.xml').decode())
+
+            hoja = archivo.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(hoja.count('<row '), 3)
+        self.assertIn('<row r="1">', hoja)
+        self.assertIn('Nombre Científico', hoja)
+        self.assertIn('<c><v>3</v></c>', hoja)
+        self.assertIn('A &amp; B &lt;&gt;', hoja)
+
+    def test_xlsx_se_envia_por_partes(self):
+        leidas = []
+        def filas():
+            for numero in range(FILAS_POR_ENVIO * 3):
+                leidas.append(numero)
+                yield ('Especie', f'Especie {numero}', numero)
+
+        generador = generar_xlsx(COLUMNAS_ZONA, filas())
+        partes = [next(generador), next(generador)] # Archivos fijos y el primer envío de la hoja
+        self.assertEqual(len(leidas), FILAS_POR_ENVIO - 1) # La fila de títulos también cuenta
+        partes.extend(generador)
+
+        with zipfile.ZipFile(BytesIO(b''.join(partes))) as archivo:
+            self.assertIsNone(archivo.testzip())
+            self.assertEqual(archivo.read('xl/worksheets/sheet1.xml').decode().count('<row '), FILAS_POR_ENVIO * 3 + 1)
+
+    def test_celda(self):
+        self.assertEqual(celda(None), '<c/>')
+        self.assertEqual(celda(7), '<c><v>7</v></c>')
+        self.assertIn('inlineStr', celda(True)) # bool no es número en Excel
+
+    def test_pivote_zonas(self):
+        columnas, filas = pivote_zonas()
+        self.assertEqual(
+            [clave for clave, _ in columnas],
+            ['nombre_comun', 'nombre_cientifico', 'norte', 'sur', 'total'],
+        )
+        self.assertEqual(list(filas), [
+            ['Huizache', 'Acacia farnesiana', 0, 5, 5],
+            ['Ceiba', 'Ceiba pentandra', 3, 2, 5],
+        ])
+
+    def test_exportar_zona(self):
+        respuesta = self.client.get('/historial/exportar_inventario/norte', {'formato': 'jsonl'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('inventario_zona_norte.jsonl', respuesta['Content-Disposition'])
+        lineas = self.contenido(respuesta).decode().splitlines()
+        self.assertEqual([json.loads(linea)['cantidad'] for linea in lineas], [3])
+
+        respuesta = self.client.get('/historial/exportar_inventario/sur')
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            self.contenido(respuesta).decode('utf-8-sig').splitlines(),
+            ['Nombre Común,Nombre Científico,Cantidad', 'Huizache,Acacia farnesiana,5', 'Ceiba,Ceiba pentandra,2'],
+        )
+
+    def test_exportar_todas_las_zonas(self):
+        respuesta = self.client.get('/historial/exportar_inventario/zonas', {'formato': 'xlsx'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('inventario_zonas.xlsx', respuesta['Content-Disposition'])
+        with zipfile.ZipFile(BytesIO(self.contenido(respuesta))) as archivo:
+            hoja = archivo.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('Zona Norte', hoja)
+        self.assertEqual(hoja.count('<row '), 3)
+
+    def test_formato_o_zona_invalidos(self):
+        self.assertEqual(self.client.get('/historial/exportar_inventario/norte', {'formato': 'pdf'}).status_code, 400)
+        self.assertEqual(self.client.get('/historial/exportar_inventario/zonas', {'formato': 'pdf'}).status_code, 400)
+        self.assertEqual(self.client.get('/historial/exportar_inventario/oeste').status_code, 404)
+
+class PiramideTests(SimpleTestCase):
+    def test_niveles(self):
+        self.assertEqual(nivel_maximo(1, 1), 0)
+        self.assertEqual(nivel_maximo(600, 300), 10) # 2^10 = 1024 >= 600
+        self.assertEqual(tamano_nivel(600, 300, 10, 10), (600, 300))
+        self.assertEqual(tamano_nivel(600, 300, 9, 10), (300, 150))
+        self.assertEqual(tamano_nivel(600, 300, 1, 10), (2, 1))
+        self.assertEqual(tamano_nivel(600, 300, 0, 10), (1, 1))
+
+    def test_descriptor(self):
+        self.assertIn('<Size Width="600" Height="300"/>', descriptor(600, 300))
+        self.assertIn(f'TileSize="{TAMANO}"', descriptor(600, 300))
+
+    def test_generar_piramide(self):
+        ancho, alto, teselas = generar_piramide(png(600, 300))
+        self.assertEqual((ancho, alto), (600, 300))
+        teselas = dict(teselas)
+
+        # Último nivel: 3 columnas x 2 filas de 256 px, con 1 px repetido en los bordes interiores
+        ultimo = sorted(ruta for ruta in teselas if ruta.startswith('10/'))
+        self.assertEqual(ultimo, ['10/0_0.webp', '10/0_1.webp', '10/1_0.webp', '10/1_1.webp', '10/2_0.webp', '10/2_1.webp'])
+        tamanos = {ruta: Image.open(BytesIO(teselas[ruta])).size for ruta in ultimo}
+        self.assertEqual(tamanos['10/0_0.webp'], (257, 257))
+        self.assertEqual(tamanos['10/1_0.webp'], (258, 257))
+        self.assertEqual(tamanos['10/2_1.webp'], (600 - 511, 300 - 255))
+
+        self.assertEqual(Image.open(BytesIO(teselas['0/0_0.webp'])).size, (1, 1))
+        self.assertEqual({ruta.split('/')[0] for ruta in teselas}, {str(nivel) for nivel in range(11)})
+
+    def test_convierte_a_rgb(self):
+        salida = BytesIO()
+        Image.new('RGBA', (10, 10), (0, 0, 0, 0)).save(salida, format='PNG')
+        _, _, teselas = generar_piramide(salida.getvalue())
+        self.assertEqual(Image.open(BytesIO(dict(teselas)['4/0_0.webp'])).mode, 'RGB')
+
+@PRUEBAS
+class ColaHistorialTests(TestCase):
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+
+    def estados(self, *historiales):
+        return [Historial.objects.get(pk=historial.pk).estado for historial in historiales]
+
+    def test_aplicar_teselas(self):
+        historial = crear_historial(ancho=300, alto=40)
+        self.assertEqual(historial.estado, 'PENDIENTE')
+        self.assertIsNone(historial.url_dzi)
+
+        self.assertEqual(tareas.procesar_pendientes(self.pool, 10, log=lambda _: None), 1)
+
+        historial = Historial.objects.get(pk=historial.pk)
+        self.assertEqual((historial.estado, historial.ancho, historial.alto), ('LISTA', 300, 40))
+        storage = historial.imagen.storage
+        self.assertTrue(historial.url_dzi.endswith(f'teselas/{historial.huella}.dzi'))
+        self.assertIn('Width="300"', storage.open(f'{historial.base_teselas}.dzi').read().decode())
+        self.assertTrue(storage.exists(f'{historial.base_teselas}_files/9/1_0.webp'))
+
+    def test_misma_imagen_no_se_vuelve_a_cortar(self):
+        primero = crear_historial()
+        tareas.procesar_pendientes(self.pool, 10, log=lambda _: None)
+        segundo = crear_historial(fecha_asociada=date(2025, 1, 1)) # Mismo contenido -> Mismo archivo
+
+        roto = mock.Mock(submit=mock.Mock(side_effect=AssertionError("No debería cortarse")))
+        tareas.procesar_pendientes(roto, 10, log=lambda _: None)
+        segundo = Historial.objects.get(pk=segundo.pk)
+        self.assertEqual(segundo.imagen.name, primero.imagen.name)
+        self.assertEqual((segundo.estado, segundo.ancho, segundo.alto), ('LISTA', 40, 20))
+
+    def test_cualquier_falla_deja_el_registro_en_error(self):
+        historiales = [crear_historial(color=(0, i, 0)) for i in range(2)]
+        aplicar = Historial.aplicar_teselas
+
+        def fallar_el_primero(historial, *args):
+            if historial.pk == historiales[0].pk:
+                raise RuntimeError("Disco lleno")
+            return aplicar(historial, *args)
+
+        errores = []
+        with mock.patch.object(Historial, 'aplicar_teselas', fallar_el_primero):
+            tareas.procesar_pendientes(self.pool, 10, log=errores.append)
+
+        self.assertEqual(self.estados(*historiales), ['ERROR', 'LISTA'])
+        self.assertEqual(len(errores), 1)
+
+    def test_pool_caido(self):
+        historial = crear_historial()
+        roto = mock.Mock(submit=mock.Mock(side_effect=tareas.BrokenProcessPool("Pool caído")))
+
+        with self.assertRaises(tareas.BrokenProcessPool):
+            tareas.procesar_pendientes(roto, 10, log=lambda _: None)
+        self.assertEqual(self.estados(historial), ['ERROR'])
+
+    def test_reintentar_fallidas(self):
+        error, reciente, abandonado, listo = [crear_historial(color=(0, i, 0)) for i in range(4)]
+        Historial.objects.filter(pk=error.pk).update(estado='ERROR')
+        Historial.objects.filter(pk=reciente.pk).update(estado='PROCESANDO', fecha_reclamo=timezone.now())
+        Historial.objects.filter(pk=abandonado.pk).update(
+            estado='PROCESANDO', fecha_reclamo=timezone.now() - tareas.TIMEOUT_PROCESANDO - timedelta(minutes=1)
+        )
+        Historial.objects.filter(pk=listo.pk).update(estado='LISTA')
+
+        self.assertEqual(tareas.reintentar_fallidas(), 2)
+        self.assertEqual(self.estados(error, reciente, abandonado, listo), ['PENDIENTE', 'PROCESANDO', 'PENDIENTE', 'LISTA'])
+
+    def test_reemplazar_imagen(self):
+        historial = crear_historial()
+        tareas.procesar_pendientes(self.pool, 10, log=lambda _: None)
+        historial = Historial.objects.get(pk=historial.pk)
+        storage = historial.imagen.storage
+        anterior, huella = historial.imagen.name, historial.huella
+        nuevo = storage.save('historial/nuevo.png', SimpleUploadedFile('nuevo.png', png(40, 20, (1, 2, 3))))
+
+        self.assertEqual(Historial.reemplazar_imagen(anterior, nuevo), 1)
+
+        historial = Historial.objects.get(pk=historial.pk)
+        self.assertEqual((historial.imagen.name, historial.estado, historial.ancho), (nuevo, 'PENDIENTE', None))
+        # Nadie más usa la huella vieja -> Sus teselas se borran
+        self.assertFalse(storage.exists(f'teselas/{huella}.dzi'))
+        self.assertFalse(storage.exists(f'teselas/{huella}_files'))
+
+class CoberturaTests(SimpleTestCase):
+    def test_analizar_imagen(self):
+        estadisticas, mascara, capa = analizar_imagen(con_dosel(30))
+        self.assertAlmostEqual(estadisticas['cobertura'], 30)
+        self.assertGreater(estadisticas['indice'], 0)
+
+        mascara = Image.open(BytesIO(mascara))
+        self.assertEqual(mascara.size, (100, 20))
+        self.assertEqual(mascara.getpixel((10, 10)), 255)
+        self.assertEqual(mascara.getpixel((90, 10)), 0)
+
+        capa = Image.open(BytesIO(capa))
+        self.assertEqual(capa.mode, 'RGBA')
+        self.assertEqual(capa.getpixel((90, 10))[3], 0) # Transparente fuera del dosel
+
+    def test_sombras_no_son_dosel(self):
+        estadisticas, _, _ = analizar_imagen(png(10, 10, (5, 20, 5)))
+        self.assertEqual(estadisticas['cobertura'], 0)
+
+    def test_imagenes_grandes_se_reducen(self):
+        _, mascara, _ = analizar_imagen(con_dosel(1000, ancho=2048))
+        self.assertEqual(Image.open(BytesIO(mascara)).size, (ANCHO, 10))
+
+    def test_comparar(self):
+        _, antes, _ = analizar_imagen(con_dosel(50))
+        _, despues, _ = analizar_imagen(con_dosel(20))
+        estadisticas, capa = comparar(antes, despues)
+        self.assertAlmostEqual(estadisticas['perdida'], 30)
+        self.assertEqual(estadisticas['ganancia'], 0)
+
+        estadisticas, _ = comparar(despues, antes)
+        self.assertAlmostEqual(estadisticas['ganancia'], 30)
+
+        # Distinto tamaño -> La anterior se lleva al tamaño de la nueva
+        _, grande, _ = analizar_imagen(con_dosel(40, ancho=200))
+        estadisticas, capa = comparar(antes, grande)
+        self.assertAlmostEqual(estadisticas['perdida'], 30) # 100 de 200 columnas antes, 40 después
+        self.assertEqual(Image.open(BytesIO(capa)).size, (200, 20))
+
+@PRUEBAS
+class AnalisisHistorialTests(TestCase):
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+
+    def analizar(self):
+        return (
+            tareas.analizar_pendientes(self.pool, 2, log=self.fail),
+            tareas.comparar_consecutivas(self.pool, 2, log=self.fail),
+        )
+
+    def test_cobertura_y_cambios_entre_fechas(self):
+        enero = crear_historial(date(2024, 1, 1), datos=con_dosel(60))
+        julio = crear_historial(date(2024, 7, 1), datos=con_dosel(40))
+        self.assertEqual(self.analizar(), (2, 1))
+
+        enero, julio = Historial.objects.get(pk=enero.pk), Historial.objects.get(pk=julio.pk)
+        self.assertAlmostEqual(enero.cobertura, 60)
+        self.assertIsNone(enero.comparada_con)
+        self.assertEqual(julio.comparada_con, enero)
+        self.assertAlmostEqual(julio.perdida, 20)
+        self.assertEqual(julio.ganancia, 0)
+
+        storage = julio.imagen.storage
+        self.assertTrue(storage.exists(julio.ruta_mascara))
+        self.assertTrue(julio.url_cobertura)
+        self.assertTrue(storage.exists(julio.ruta_cambios(enero)))
+
+    def test_solo_se_analiza_lo_que_falta(self):
+        crear_historial(date(2024, 1, 1), datos=con_dosel(60))
+        crear_historial(date(2024, 7, 1), datos=con_dosel(40))
+        self.analizar()
+        self.assertEqual(self.analizar(), (0, 0))
+
+        # Una fecha nueva en medio -> Solo se analiza ella y se comparan sus dos pares
+        crear_historial(date(2024, 3, 1), datos=con_dosel(50))
+        self.assertEqual(self.analizar(), (1, 2))
+
+    def test_misma_imagen_se_analiza_una_vez(self):
+        primero = crear_historial(date(2024, 1, 1), datos=con_dosel(60))
+        segundo = crear_historial(date(2024, 2, 1), datos=con_dosel(60)) # Mismo archivo
+        self.assertEqual(self.analizar(), (1, 0))
+
+        segundo = Historial.objects.get(pk=segundo.pk)
+        self.assertAlmostEqual(segundo.cobertura, 60)
+        self.assertEqual(segundo.comparada_con_id, primero.pk)
+        self.assertEqual((segundo.ganancia, segundo.perdida), (0, 0))
+        self.assertIsNone(segundo.url_cambios) # Sin capa de cambios
+
+    def test_cambiar_o_borrar_fechas_vuelve_a_comparar(self):
+        enero = crear_historial(date(2024, 1, 1), datos=con_dosel(60))
+        marzo = crear_historial(date(2024, 3, 1), datos=con_dosel(50))
+        julio = crear_historial(date(2024, 7, 1), datos=con_dosel(40))
+        self.analizar()
+
+        marzo.delete() # Julio ahora se compara contra enero
+        self.assertEqual(self.analizar(), (0, 1))
+        self.assertEqual(Historial.objects.get(pk=julio.pk).comparada_con_id, enero.pk)
+
+        # Enero pasa al final -> Julio queda primero (sin comparación) y enero se compara contra julio
+        Historial.objects.filter(pk=enero.pk).update(fecha_asociada=date(2024, 12, 1))
+        self.assertEqual(self.analizar(), (0, 1))
+        julio, enero = Historial.objects.get(pk=julio.pk), Historial.objects.get(pk=enero.pk)
+        self.assertIsNone(julio.comparada_con)
+        self.assertIsNone(julio.ganancia)
+        self.assertEqual(enero.comparada_con_id, julio.pk)
+        self.assertAlmostEqual(enero.ganancia, 20)
+
+    def test_linea_de_tiempo(self):
+        julio = crear_historial(date(2024, 7, 1), datos=con_dosel(40))
+        enero = crear_historial(date(2024, 1, 1), datos=con_dosel(60))
+        crear_historial(date(2024, 12, 1), datos=con_dosel(45))
+        self.analizar()
+
+        # La lista y la fecha "Última" -> Las capas de cambios salen del select_related, sin una consulta por fecha
+        with self.assertNumQueries(2):
+            respuesta = self.client.get('/historial/mapa_historial')
+        capas = respuesta.context['capas']
+        self.assertEqual([capa['fecha'] for capa in capas], ['2024-01-01', '2024-07-01', '2024-12-01'])
+        self.assertIsNone(capas[0]['capa_cambios'])
+        self.assertAlmostEqual(capas[1]['perdida'], 20)
+        self.assertEqual(capas[1]['capa_cambios'], julio.imagen.storage.url(julio.ruta_cambios(enero)))
+        self.assertIsNone(capas[1]['dzi']) # Sin teselas todavía -> El visor abre la imagen completa
+        self.assertEqual(capas[1]['imagen'], julio.imagen.url)
+
+@PRUEBAS
+class CondicionalMapaTests(TestCase):
+    url = '/historial/mapa_inventario'
+
+    def setUp(self):
+        self.zona = crear_zona('Norte')
+
+    def test_304_hasta_que_cambian_las_zonas(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Los totales se actualizan con un UPDATE (sin save) -> También mueven la fecha de la zona
+        inventario = Inventario.objects.create(zona=self.zona, especie=crear_especie('Ceiba pentandra'), cantidad=4)
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+
+        etag = respuesta['ETag']
+        inventario.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_borrar_una_zona_cambia_el_etag(self):
+        otra = crear_zona('Sur', y=10)
+        etag = self.client.get(self.url)['ETag']
+        otra.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detalle_de_zona_depende_de_zonas_y_especies(self):
+        especie = crear_especie('Ceiba pentandra')
+        Inventario.objects.create(zona=self.zona, especie=especie, cantidad=4)
+        url = f'/historial/zona_detalle/{self.zona.slug}'
+
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        especie.nombre_comun = 'Pochote' # Solo cambia la especie
+        especie.save()
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Pochote')
+
+    def test_usuarios_autenticados_sin_validadores(self):
+        self.client.force_login(get_user_model().objects.create_user(username='staff', password='clave'))
+        self.assertFalse(self.client.get(self.url).has_header('ETag'))
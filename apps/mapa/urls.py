@@ -1,6 +1,6 @@
 from django.urls import path
 
-from .views import HistorialListView, mapa_inventario, inventario_completo, exportar_inventario_csv, ZonaDetailView
+from .views import HistorialListView, mapa_inventario, inventario_completo, exportar_inventario, exportar_inventario_zonas, ZonaDetailView, buscar_zona
 
 urlpatterns = [
     # Historial
@@ -9,5 +9,7 @@ urlpatterns = [
     path('mapa_inventario', mapa_inventario, name="mapa_inventario"),
     path('inventario_completo', inventario_completo, name="inventario_completo"),
     path('zona_detalle/<slug:slug>', ZonaDetailView.as_view(), name="zona_detalle"),
-    path('exportar_inventario/<slug:slug>', exportar_inventario_csv, name="exportar_inventario"),
+    path('exportar_inventario/zonas', exportar_inventario_zonas, name="exportar_inventario_zonas"),
+    path('exportar_inventario/<slug:slug>', exportar_inventario, name="exportar_inventario"),
+    path('buscar_zona', buscar_zona, name="buscar_zona"),
 ]
\ No newline at end of file
@@ -1,13 +1,11 @@
 import os
 
-from .models import Historial
+from apps.especies.utils import hash_archivo
+
+def nombre_historial(huella, extension):
+    return os.path.join('historial', f'{huella}{extension.lower()}')
 
 def ruta_historial(instance, filename):
-    base, extension = os.path.splitext(filename)
-    
-    Historial = instance.__class__
-    
-    total = Historial.objects.count()
+    extension = os.path.splitext(filename)[1]
     
-    img = f'historial_{total + 1}{extension}'
-    return os.path.join('historial', img)
\ No newline at end of file
+    return nombre_historial(hash_archivo(instance.imagen), extension)
\ No newline at end of file
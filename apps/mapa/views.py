@@ -1,87 +1,109 @@
-import csv
-import codecs
-from django.db.models import Sum
-from django.db.models import OuterRef, Subquery
-from django.http import HttpResponse
+import math
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.urls import reverse
 from django.shortcuts import get_object_or_404
 from django.views.generic import ListView, DetailView
 from django.shortcuts import render
 
-from apps.especies.models import Especie, Galeria
-from .models import Historial, Zona
+from apps.especies.categorias import imagenes_por_categoria
+from apps.especies.models import Galeria
+from apps.especies.condicional import GetCondicionalMixin, con_validadores, cambios_especies
+from .models import Historial, Zona, InventarioCampus
+from .indice import zona_en_punto
+from .condicional import cambios_mapa
+from .exportar import FORMATOS, COLUMNAS_ZONA, filas_zona, pivote_zonas, respuesta_exportacion
 
 # Listar Imágenes del Historial de la Masa Forestal
 class HistorialListView(ListView):
     model = Historial
+    queryset = Historial.objects.select_related('comparada_con') # Para la capa de cambios
     template_name = "mapa/mapa_historial.html"
     context_object_name = "imagenes"
     
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # Una capa por fecha para el visor: sus teselas (DZI) o, si aún no se generan, la imagen completa
+        context['capas'] = [
+            {
+                'fecha': historial.fecha_asociada.isoformat(),
+                'dzi': historial.url_dzi,
+                'imagen': historial.imagen.url,
+                'cobertura': historial.cobertura,
+                'capa_cobertura': historial.url_cobertura,
+                'ganancia': historial.ganancia,
+                'perdida': historial.perdida,
+                'capa_cambios': historial.url_cambios,
+            }
+            for historial in context['imagenes']
+        ]
+        
+        return context
+    
+@con_validadores(cambios_mapa) # 304 si las zonas no cambiaron (ver apps/especies/condicional.py)
 def mapa_inventario(request):
     return render(request, "mapa/mapa_inventario.html", {
         'zonas': Zona.objects.all()
     })
 
-def inventario_completo(request):
-    subquery = Galeria.all_objects.filter(
-        especie_id=OuterRef('id'), # Valor de afuera
-        categoria='GENERAL'
-    ).values('imagen')[:1]
+# Zona que contiene un punto del mapa -> Para que las brigadas ubiquen árboles desde la tableta
+# ?x=&y= en las mismas coordenadas que Zona.vector_path
+def buscar_zona(request):
+    try:
+        x, y = float(request.GET['x']), float(request.GET['y'])
+    except (KeyError, ValueError):
+        x = y = math.nan
     
-    inventario = Especie.all_objects.annotate(
-        cantidad=Sum('inventario__cantidad'),
-        imagen_principal=Subquery(subquery)
-    ).order_by('-cantidad')
-
-    # Para compatibilidad del template
-    # El template espera {{ item.especie }} -> Hacemos que el objeto item se apunte a sí mismo.
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return JsonResponse({'error': "Los parámetros x y y son obligatorios y deben ser numéricos."}, status=400)
     
-    for item in inventario:
-        item.especie = item
+    zona = zona_en_punto(x, y)
+    if zona is None:
+        return JsonResponse({'zona': None})
     
-    zona = Zona.objects.get(slug="campus")
-    zona.total_arboles = inventario.aggregate(total=Sum('cantidad'))['total']
-    zona.top_especies = inventario.order_by('-cantidad')[:5]
+    return JsonResponse({'zona': {
+        'nombre': zona.nombre,
+        'descripcion': zona.descripcion,
+        'slug': zona.slug,
+        'url': reverse('zona_detalle', kwargs={'slug': zona.slug}),
+    }})
+
+def inventario_completo(request):
+    # Ya viene agregado y ordenado del más abundante al menos
+    inventario = list(InventarioCampus.objects.select_related('especie', 'portada'))
     
-    for item in zona.top_especies:
-        item.especie = item
+    zona = Zona.objects.get(slug="campus")
+    zona.total_arboles = sum(item.cantidad for item in inventario)
+    zona.top_especies = inventario[:5]
     
     return render(request, "mapa/zona_detalle.html", {
         'zona': zona,
-        'dominante': inventario.first,
+        'dominante': inventario[0] if inventario else None,
         'inventario': inventario
     })
 
-def exportar_inventario_csv(request, slug):
+# Exportar Inventario -> ?formato=csv (por defecto), xlsx o jsonl (ver exportar.py)
+def exportar_inventario(request, slug):
     zona = get_object_or_404(Zona, slug=slug)
     
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="inventario_zona_{zona.slug}.csv"'
-    response.write(codecs.BOM_UTF8)
-
-    writer = csv.writer(response)
-    writer.writerow(['Nombre Común', 'Nombre Científico', 'Cantidad'])
-
-    if slug == "campus":
-        inventario = Especie.all_objects.annotate(
-            cantidad=Sum('inventario__cantidad')
-        ).order_by('-cantidad')
-        
-        for item in inventario:
-            item.especie = item
-    else:
-        inventario = zona.inventario.filter(cantidad__gt=0).select_related('especie')
-
-    for registro in inventario:
-        writer.writerow([
-            registro.especie.nombre_comun,
-            registro.especie.nombre_cientifico,
-            registro.cantidad,
-        ])
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return HttpResponseBadRequest("Formato no soportado.")
+    
+    return respuesta_exportacion(formato, f'inventario_zona_{zona.slug}', COLUMNAS_ZONA, filas_zona(zona))
 
-    return response
+# Especies x Zonas en una sola tabla
+def exportar_inventario_zonas(request):
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return HttpResponseBadRequest("Formato no soportado.")
+    
+    columnas, filas = pivote_zonas()
+    return respuesta_exportacion(formato, 'inventario_zonas', columnas, filas)
 
 # Detalle de la Zona
-class ZonaDetailView(DetailView):
+class ZonaDetailView(GetCondicionalMixin, DetailView):
+    cambios = (cambios_mapa, cambios_especies) # Inventario de la zona con nombres e imágenes de las especies
     model = Zona
     template_name = "mapa/zona_detalle.html"
     context_object_name = "zona"
@@ -91,15 +113,18 @@ class ZonaDetailView(DetailView):
         
         context['dominante'] = self.object.inventario.first # Esta ordenado -> First es el mas abundante
         
-        subquery = Galeria.all_objects.filter(
-            especie=OuterRef('especie'), # Valor de afuera
-            categoria='GENERAL'
-        ).values('imagen')[:1]
-
-        context['inventario'] = self.object.inventario.filter(
+        inventario = list(self.object.inventario.filter(
             cantidad__gt=0
-        ).select_related('especie').annotate(
-            imagen_principal=Subquery(subquery)
-        ).order_by('-cantidad')
+        ).select_related('especie').order_by('-cantidad'))
+        
+        # Imagen GENERAL de todas las especies de la zona en una sola consulta (solo imagenes ya procesadas,
+        # también de especies inactivas: igual que el inventario del campus)
+        portadas = imagenes_por_categoria(
+            [item.especie_id for item in inventario], ['GENERAL'], Galeria.all_objects.filter(estado='LISTA')
+        )
+        for item in inventario:
+            item.imagen_principal = portadas.get(item.especie_id, {}).get('GENERAL')
+        
+        context['inventario'] = inventario
         
         return context
\ No newline at end of file
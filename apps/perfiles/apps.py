@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PerfilesConfig(AppConfig):
     name = 'apps.perfiles'
+
+    def ready(self):
+        from . import signals # Conecta los receivers
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.perfiles.models import Usuario
+
+class Command(BaseCommand):
+    help = "Deja a cada usuario solo en el grupo de su rol y con sus permisos de staff/superusuario (tras cargas masivas o updates directos a la DB)"
+
+    def handle(self, *args, **options):
+        borradas, agregadas = Usuario.sincronizar_grupos()
+        
+        self.stdout.write(self.style.SUCCESS(f"{borradas} membresías quitadas, {agregadas} agregadas."))
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+
+# Expiración deslizante sin escribir la sesión en cada petición:
+# la sesión se vuelve a guardar (y con eso su cookie y su fecha de expiración se recorren SESSION_COOKIE_AGE)
+# solo si cambiaron sus datos o si la última renovación fue hace más de SESSION_RENOVAR_CADA segundos.
+# Una sesión inactiva caduca entre SESSION_COOKIE_AGE - SESSION_RENOVAR_CADA y SESSION_COOKIE_AGE.
+# Va después de SessionMiddleware -> Marca la sesión antes de que SessionMiddleware decida si la guarda.
+
+CLAVE = '_renovada'
+
+class SesionDeslizanteMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.renovar_cada = getattr(settings, 'SESSION_RENOVAR_CADA', settings.SESSION_COOKIE_AGE // 12)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        
+        sesion = getattr(request, 'session', None)
+        if sesion is None or sesion.is_empty(): # Visitantes sin sesión -> No se crea una
+            return response
+        
+        ahora = int(time.time())
+        if sesion.modified or ahora - sesion.get(CLAVE, 0) >= self.renovar_cada:
+            sesion[CLAVE] = ahora # Marca modified -> SessionMiddleware la guarda y renueva la cookie
+        
+        return response
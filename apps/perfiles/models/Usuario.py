@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser, Group
-from django.db import models
+from django.db import models, transaction
 import uuid
 
 class Usuario(AbstractUser):
@@ -22,6 +22,33 @@ class Usuario(AbstractUser):
         verbose_name="Rol de Usuario"
     )
     
+    # Grupo de cada rol
+    GRUPOS = {
+        Rol.ADMIN: 'Administrador',
+        Rol.STAFF: 'Staff',
+        Rol.MIEMBRO: 'Miembro',
+    }
+    
+    # Ids de los grupos por proceso -> No se buscan en cada save (se limpia si se borra un Group, ver signals.py)
+    # Se guardan hasta que la transacción se confirma: si se revierte, el Group recién creado ya no existe
+    _ids_grupos = {}
+    
+    @classmethod
+    def id_grupo(cls, rol):
+        if rol in cls._ids_grupos:
+            return cls._ids_grupos[rol]
+        
+        grupo, _ = Group.objects.get_or_create(name=cls.GRUPOS[rol])
+        transaction.on_commit(lambda: cls._ids_grupos.__setitem__(rol, grupo.id))
+        return grupo.id
+    
+    # Rol con el que se leyó de la DB -> Para saber si cambió al guardar
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._rol_original = instancia.__dict__.get('rol')
+        return instancia
+    
     def save(self, *args, **kwargs):
         if self.rol == self.Rol.ADMIN:
             self.is_staff = True
@@ -33,21 +60,54 @@ class Usuario(AbstractUser):
             self.is_staff = False
             self.is_superuser = False
         
+        # Los grupos solo se tocan si el rol cambió (o es nuevo)
+        # Un login (update_fields=['last_login']), soft_delete o activar no cambian el rol
+        update_fields = kwargs.get('update_fields')
+        sincronizar = (
+            (update_fields is None or 'rol' in update_fields)
+            and (self._state.adding or getattr(self, '_rol_original', None) != self.rol)
+        )
+        
         # Guardamos el usuario
         super().save(*args, **kwargs)
-
-        # Limpiamos grupos anteriores para evitar que sea staff Y Admin a la vez
-        self.groups.clear() 
-
-        if self.rol == self.Rol.ADMIN:
-            grupo, _ = Group.objects.get_or_create(name='Administrador')
-            self.groups.add(grupo)
-        elif self.rol == self.Rol.STAFF:
-            grupo, _ = Group.objects.get_or_create(name='Staff')
-            self.groups.add(grupo)
-        elif self.rol == self.Rol.MIEMBRO:
-            grupo, _ = Group.objects.get_or_create(name='Miembro')
-            self.groups.add(grupo)
+        
+        if sincronizar:
+            self.sincronizar_grupo()
+        
+    # Limpiamos grupos anteriores para evitar que sea staff Y Admin a la vez
+    def sincronizar_grupo(self):
+        self.groups.clear()
+        self.groups.add(self.id_grupo(self.rol))
+        self._rol_original = self.rol
+    
+    # Todos los usuarios a la vez (tras cargas masivas o updates directos a la DB)
+    # Pocas consultas sin importar cuantos usuarios: una por rol para los permisos, un DELETE de las
+    # membresías que sobran y un INSERT por rol de las que faltan
+    @classmethod
+    def sincronizar_grupos(cls):
+        Membresia = cls.groups.through
+        ids = {rol: cls.id_grupo(rol) for rol in cls.GRUPOS}
+        
+        with transaction.atomic():
+            cls.objects.filter(rol=cls.Rol.ADMIN).update(is_staff=True, is_superuser=True)
+            cls.objects.filter(rol=cls.Rol.STAFF).update(is_staff=True, is_superuser=False)
+            cls.objects.filter(rol=cls.Rol.MIEMBRO).update(is_staff=False, is_superuser=False)
+            
+            # Cada usuario se queda solo con el grupo de su rol
+            correctas = models.Q()
+            for rol, id_grupo in ids.items():
+                correctas |= models.Q(usuario__rol=rol, group_id=id_grupo)
+            borradas, _ = Membresia.objects.exclude(correctas).delete()
+            
+            agregadas = 0
+            for rol, id_grupo in ids.items():
+                faltantes = cls.objects.filter(rol=rol).exclude(groups=id_grupo).values_list('id', flat=True)
+                agregadas += len(Membresia.objects.bulk_create(
+                    [Membresia(usuario_id=id_usuario, group_id=id_grupo) for id_usuario in faltantes],
+                    ignore_conflicts=True,
+                ))
+        
+        return borradas, agregadas
         
     def __str__(self):
         return f"{self.username} - {self.get_rol_display()}"
@@ -0,0 +1,10 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Usuario
+
+# Si se borra un grupo de rol su id guardado ya no sirve -> Se vuelve a crear la próxima vez
+@receiver(post_delete, sender=Group)
+def limpiar_ids_grupos(sender, **kwargs):
+    Usuario._ids_grupos.clear()
@@ -1,3 +1,191 @@
-from django.test import TestCase
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import middleware
+from .models import Usuario
+
+# Las pruebas no tocan la caché compartida (sesiones, páginas guardadas) y no necesitan collectstatic
+PRUEBAS = override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+)
+
+def crear_usuario(username, rol=Usuario.Rol.MIEMBRO, **kwargs):
+    return Usuario.objects.create_user(username=username, password='clave', rol=rol, **kwargs)
+
+@PRUEBAS
+class PanelUsuariosTests(TestCase):
+    def setUp(self):
+        self.admin = crear_usuario('zeta', Usuario.Rol.ADMIN)
+        # Creados en desorden alfabético -> El panel los lista por id, como siempre
+        for username in ['mario', 'ana', 'luis']:
+            crear_usuario(username)
+        self.client.force_login(self.admin)
+
+    def usernames(self, respuesta):
+        return [usuario.username for usuario in respuesta.context['usuarios']]
+
+    def test_mismo_orden_con_y_sin_cursor(self):
+        esperado = ['zeta', 'mario', 'ana', 'luis']
+
+        offset = self.client.get('/perfiles/panel')
+        self.assertEqual(self.usernames(offset), esperado)
+
+        cursor = self.client.get('/perfiles/panel', {'cursor': ''})
+        self.assertTrue(cursor.context['page_obj'].es_cursor)
+        self.assertEqual(self.usernames(cursor), esperado)
+
+class GruposRolTests(TestCase):
+    def setUp(self):
+        # Los ids se guardan por proceso -> Cada prueba empieza sin ellos (sus grupos se revierten al terminar)
+        Usuario._ids_grupos.clear()
+        self.addCleanup(Usuario._ids_grupos.clear)
+
+    def grupos(self, usuario):
+        return list(usuario.groups.values_list('name', flat=True))
+
+    def test_usuario_nuevo_en_el_grupo_de_su_rol(self):
+        for rol, grupo, staff, superusuario in [
+            (Usuario.Rol.MIEMBRO, 'Miembro', False, False),
+            (Usuario.Rol.STAFF, 'Staff', True, False),
+            (Usuario.Rol.ADMIN, 'Administrador', True, True),
+        ]:
+            with self.subTest(rol=rol):
+                usuario = crear_usuario(f'usuario_{rol.lower()}', rol)
+                self.assertEqual(self.grupos(usuario), [grupo])
+                self.assertEqual((usuario.is_staff, usuario.is_superuser), (staff, superusuario))
+
+    def test_cambio_de_rol_cambia_el_grupo(self):
+        usuario = crear_usuario('ana')
+        usuario = Usuario.objects.get(pk=usuario.pk) # Leído de la DB, como en el panel
+        usuario.rol = Usuario.Rol.STAFF
+        usuario.save()
+        self.assertEqual(self.grupos(usuario), ['Staff'])
+
+        usuario.rol = Usuario.Rol.ADMIN
+        usuario.save()
+        self.assertEqual(self.grupos(usuario), ['Administrador'])
+        self.assertTrue(usuario.is_superuser)
+
+    def test_guardar_sin_cambiar_el_rol_no_toca_los_grupos(self):
+        usuario = crear_usuario('ana')
+        extra = Group.objects.create(name='Extra')
+        usuario.groups.add(extra)
+
+        usuario = Usuario.objects.get(pk=usuario.pk)
+        usuario.first_name = 'Ana'
+        usuario.save()
+        usuario.save(update_fields=['last_login'])
+        usuario.soft_delete()
+        usuario.activar()
+        self.assertEqual(sorted(self.grupos(usuario)), ['Extra', 'Miembro'])
+
+    def test_ids_de_grupos_solo_tras_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            crear_usuario('ana')
+        self.assertEqual(Usuario._ids_grupos, {}) # Transacción sin confirmar -> El grupo nuevo podría no existir
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_usuario('luis')
+        self.assertEqual(Usuario._ids_grupos, {Usuario.Rol.MIEMBRO: Group.objects.get(name='Miembro').id})
+
+    def test_borrar_el_grupo_limpia_los_ids(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_usuario('ana')
+        Group.objects.get(name='Miembro').delete()
+        self.assertEqual(Usuario._ids_grupos, {})
+
+        usuario = crear_usuario('luis') # Se vuelve a crear
+        self.assertEqual(self.grupos(usuario), ['Miembro'])
+
+    def test_sincronizar_grupos(self):
+        ana = crear_usuario('ana')
+        luis = crear_usuario('luis', Usuario.Rol.STAFF)
+        luis.groups.add(Group.objects.create(name='Extra'))
+        # Updates directos a la DB -> Sin save() ni grupos
+        Usuario.objects.filter(pk=ana.pk).update(rol=Usuario.Rol.ADMIN)
+        Usuario.objects.filter(pk=luis.pk).update(rol=Usuario.Rol.MIEMBRO)
+
+        salida = StringIO()
+        call_command('sincronizar_grupos', stdout=salida)
+        self.assertIn('3 membresías quitadas, 2 agregadas.', salida.getvalue())
+
+        ana.refresh_from_db()
+        luis.refresh_from_db()
+        self.assertEqual(self.grupos(ana), ['Administrador'])
+        self.assertEqual((ana.is_staff, ana.is_superuser), (True, True))
+        self.assertEqual(self.grupos(luis), ['Miembro'])
+        self.assertEqual((luis.is_staff, luis.is_superuser), (False, False))
+
+        # Ya está sincronizado -> No cambia nada
+        salida = StringIO()
+        call_command('sincronizar_grupos', stdout=salida)
+        self.assertIn('0 membresías quitadas, 0 agregadas.', salida.getvalue())
+
+@PRUEBAS
+@override_settings(SESSION_RENOVAR_CADA=300)
+class SesionDeslizanteTests(TestCase):
+    url = '/especies/autocompletar'
+
+    def setUp(self):
+        self.ahora = time.time()
+        self.client.force_login(crear_usuario('ana'))
+
+    # Petición a los `segundos` desde el inicio -> (escrituras a django_session, cookie de sesión o None)
+    def pedir(self, segundos=0):
+        with mock.patch.object(middleware.time, 'time', return_value=self.ahora + segundos):
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = self.client.get(self.url)
+        escrituras = [
+            consulta for consulta in consultas.captured_queries
+            if 'django_session' in consulta['sql'] and consulta['sql'].lstrip().startswith(('INSERT', 'UPDATE'))
+        ]
+        return len(escrituras), respuesta.cookies.get(settings.SESSION_COOKIE_NAME)
+
+    def test_renueva_solo_cada_renovar_cada(self):
+        escrituras, cookie = self.pedir() # Primera petición tras el login
+        self.assertEqual(escrituras, 1)
+        self.assertEqual(cookie['max-age'], settings.SESSION_COOKIE_AGE)
+
+        for segundos in [1, 120, 299]:
+            with self.subTest(segundos=segundos):
+                self.assertEqual(self.pedir(segundos), (0, None))
+
+        escrituras, cookie = self.pedir(300)
+        self.assertEqual(escrituras, 1)
+        self.assertIsNotNone(cookie) # La expiración se recorre otra hora
+        self.assertEqual(self.pedir(301), (0, None))
+
+    def test_sesion_modificada_se_guarda_y_renueva(self):
+        sesion = SessionStore()
+        sesion.update({'filtro': 'ARBOL', middleware.CLAVE: int(self.ahora) - 10})
+        sesion.save()
+
+        # La vista cambia la sesión antes de que toque renovar
+        def vista(request):
+            request.session['filtro'] = 'PALMERA'
+            return HttpResponse()
+        request = RequestFactory().get(self.url)
+        request.session = SessionStore(sesion.session_key)
+        with mock.patch.object(middleware.time, 'time', return_value=self.ahora):
+            middleware.SesionDeslizanteMiddleware(vista)(request)
+        self.assertTrue(request.session.modified)
+        self.assertEqual(request.session[middleware.CLAVE], int(self.ahora))
+
+    def test_visitantes_sin_sesion(self):
+        self.client.logout()
+        respuesta = self.client.get(self.url)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, respuesta.cookies)
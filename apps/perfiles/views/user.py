@@ -6,6 +6,7 @@ from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, UpdateView
 from ..models import Usuario
+from apps.especies.paginacion import PaginacionCursorMixin
 from ..utils import ROL_CHOICES, ESTADO_CHOICES
 from ..forms import UsuarioAdminForm, UsuarioEditForm
 
@@ -14,7 +15,7 @@ class StaffRequireMixin(LoginRequiredMixin, UserPassesTestMixin):
         return self.request.user.rol == Usuario.Rol.STAFF or self.request.user.rol == Usuario.Rol.ADMIN
     
 # Listar Usuarios
-class UsuarioListView(StaffRequireMixin, ListView):
+class UsuarioListView(StaffRequireMixin, PaginacionCursorMixin, ListView): # Paginación por cursor con el orden de siempre (id)
     model = Usuario
     template_name = "panel_usuarios.html"
     context_object_name = "usuarios"
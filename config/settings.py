@@ -52,7 +52,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware', # Sirve los estáticos comprimidos y con caché larga
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.perfiles.middleware.SesionDeslizanteMiddleware', # Renueva la sesión solo cada SESSION_RENOVAR_CADA
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -138,6 +140,46 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / "static"    
 ]
+STATIC_ROOT = BASE_DIR / "staticfiles" # Destino de collectstatic
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    # collectstatic agrega el hash del contenido al nombre y genera copias .gz/.br
+    # -> Los archivos con hash se sirven con caché de un año (WhiteNoise)
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+# Caché (fichas de especies, índices en memoria, ...)
+# CACHE_BACKEND: 'archivo' (default, compartida entre los procesos del mismo servidor: gunicorn y los workers),
+# 'redis' (compartida entre servidores, requiere el paquete redis y REDIS_URL; sin REDIS_URL se usa 'archivo')
+# o 'memoria' (por proceso, solo para desarrollo con un solo proceso: los demás no se enteran de los cambios)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "archivo")
+REDIS_URL = os.getenv("REDIS_URL")
+
+if CACHE_BACKEND == 'redis' and REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif CACHE_BACKEND != 'memoria':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv("CACHE_DIR", BASE_DIR / '.cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 
 #LOGIN Y LOGOUT
 LOGIN_URL = "login"
@@ -147,7 +189,12 @@ LOGOUT_REDIRECT_URL = 'public:catalogo_especies'
 # Session
 SESSION_COOKIE_AGE = 3600 # La conseción durará 1 hora, el default es 2 semanas
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False # La sesión morirá al cerrar el navegador
-SESSION_SAVE_EVERY_REQUEST = True
+# La hora se cuenta desde la última actividad, pero la sesión no se escribe en cada petición:
+# SesionDeslizanteMiddleware la renueva como máximo cada SESSION_RENOVAR_CADA segundos (o si cambian sus datos)
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_RENOVAR_CADA = 300
+# Las lecturas salen de la caché (CACHES) y la base de datos queda como respaldo si la caché se pierde
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
 # Para el Usuario 
 AUTH_USER_MODEL = 'perfiles.Usuario'
@@ -0,0 +1,61 @@
+// Sugerencias del buscador del catálogo mientras se escribe
+document.addEventListener("DOMContentLoaded", function() {
+    const input = document.querySelector('[data-autocompletar]');
+    if (!input) return;
+
+    const lista = document.getElementById('sugerencias');
+    let temporizador = null;
+    let controlador = null;
+
+    function ocultar() {
+        lista.classList.remove('show');
+    }
+
+    function mostrar(resultados) {
+        lista.replaceChildren(...resultados.map(resultado => {
+            const item = document.createElement('li');
+            const enlace = document.createElement('a');
+            const cientifico = document.createElement('small');
+
+            enlace.className = 'dropdown-item';
+            enlace.href = resultado.url;
+            enlace.textContent = resultado.nombre_comun + ' ';
+            cientifico.className = 'fst-italic text-muted';
+            cientifico.textContent = resultado.nombre_cientifico;
+
+            enlace.appendChild(cientifico);
+            item.appendChild(enlace);
+            return item;
+        }));
+        lista.classList.toggle('show', resultados.length > 0);
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(temporizador);
+        const query = input.value.trim();
+
+        if (query.length < 2) {
+            ocultar();
+            return;
+        }
+
+        // Esperamos a que deje de escribir un momento para no pedir en cada tecla
+        temporizador = setTimeout(function() {
+            if (controlador) controlador.abort(); // Solo nos interesa la última respuesta
+            controlador = new AbortController();
+
+            fetch(`${input.dataset.autocompletar}?query=${encodeURIComponent(query)}`, { signal: controlador.signal })
+                .then(respuesta => respuesta.json())
+                .then(datos => mostrar(datos.resultados))
+                .catch(() => {});
+        }, 150);
+    });
+
+    input.addEventListener('keydown', function(evento) {
+        if (evento.key === 'Escape') ocultar();
+    });
+
+    document.addEventListener('click', function(evento) {
+        if (evento.target !== input && !lista.contains(evento.target)) ocultar();
+    });
+});
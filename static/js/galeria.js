@@ -0,0 +1,116 @@
+// Galería pública: opciones del filtro de especies y scroll infinito
+document.addEventListener("DOMContentLoaded", function() {
+    cargarOpciones();
+    scrollInfinito();
+});
+
+// Las especies del filtro vienen de un endpoint en caché -> La página no las consulta cada vez
+function cargarOpciones() {
+    const select = document.querySelector('select[data-opciones]');
+    if (!select) return;
+
+    fetch(select.dataset.opciones)
+        .then(respuesta => respuesta.json())
+        .then(datos => {
+            datos.resultados.forEach(especie => {
+                const opcion = new Option(especie.nombre, especie.id);
+                opcion.selected = String(especie.id) === select.dataset.seleccionada;
+                select.appendChild(opcion);
+            });
+        })
+        .catch(() => {});
+}
+
+// Al llegar al final de la galería se piden las siguientes imagenes con el cursor de la última
+function scrollInfinito() {
+    const grid = document.getElementById('galeria-grid');
+    if (!grid || !grid.dataset.feed || !('IntersectionObserver' in window)) return;
+
+    // Mismos filtros que la página, sin los parámetros de la paginación
+    const parametros = new URLSearchParams(window.location.search);
+    ['page', 'cursor', 'direccion'].forEach(parametro => parametros.delete(parametro));
+
+    let siguiente = grid.dataset.siguiente;
+    let cargando = false;
+
+    const paginador = document.getElementById('paginador-galeria');
+    if (paginador) paginador.classList.add('d-none');
+
+    const centinela = document.createElement('div');
+    centinela.className = 'text-center text-muted py-3';
+    centinela.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+    grid.after(centinela);
+
+    const observador = new IntersectionObserver(function(entradas) {
+        if (!entradas[0].isIntersecting || cargando || !siguiente) return;
+        cargando = true;
+
+        parametros.set('cursor', siguiente);
+        fetch(`${grid.dataset.feed}?${parametros}`)
+            .then(respuesta => respuesta.json())
+            .then(datos => {
+                datos.resultados.forEach(imagen => grid.appendChild(tarjeta(imagen)));
+                siguiente = datos.siguiente;
+                if (typeof lightbox !== 'undefined') lightbox.reload();
+                if (!siguiente) {
+                    observador.disconnect();
+                    centinela.remove();
+                }
+            })
+            .catch(() => {
+                // Sin scroll infinito -> Regresa la paginación normal
+                observador.disconnect();
+                centinela.remove();
+                if (paginador) paginador.classList.remove('d-none');
+            })
+            .finally(() => { cargando = false; });
+    }, { rootMargin: '600px' });
+
+    observador.observe(centinela);
+}
+
+// Misma tarjeta que galeria.html
+function tarjeta(imagen) {
+    const columna = document.createElement('div');
+    columna.className = 'col';
+    columna.innerHTML = `
+        <div class="card h-100 shadow border-0 hover-shadow transition-300">
+            <div class="position-relative">
+                <a class="glightbox" data-gallery="galeria-especie">
+                    <img sizes="(min-width: 1200px) 25vw, (min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw"
+                        loading="lazy" class="card-img-top img-fluid" style="height: 220px; object-fit: cover;">
+                </a>
+                <span class="badge bg-info position-absolute top-0 start-0 m-1 bg-dark bg-opacity-50">
+                    <i class="fas fa-globe-americas me-1"></i> <span data-campo="categoria"></span>
+                </span>
+                <span class="badge ${imagen.tipo === 'ARBOL' ? 'bg-success' : 'bg-danger'} position-absolute top-0 end-0 m-1 shadow-sm" data-campo="tipo_nombre"></span>
+            </div>
+            <div class="card-body d-flex flex-column position-relative p-2">
+                <a class="text-decoration-none">
+                    <h6 class="card-title fw-bold text-dark mb-1" data-campo="nombre_comun"></h6>
+                    <h6 class="card-subtitle fst-italic" data-campo="nombre_cientifico"></h6>
+                </a>
+                <span class="badge position-absolute top-0 end-0 m-2 shadow-sm">
+                    <i class="fas fa-globe-americas me-1"></i> <span data-campo="estado_conservacion"></span>
+                </span>
+            </div>
+        </div>`;
+
+    // Los textos van con textContent -> Nada del JSON se interpreta como HTML
+    columna.querySelectorAll('[data-campo]').forEach(elemento => {
+        elemento.textContent = imagen[elemento.dataset.campo];
+    });
+
+    const enlaceImagen = columna.querySelector('.glightbox');
+    enlaceImagen.href = imagen.full;
+
+    const img = columna.querySelector('img');
+    img.src = imagen.thumb;
+    img.srcset = imagen.srcset;
+    img.alt = imagen.nombre_comun;
+
+    if (imagen.url) columna.querySelector('.card-body a').href = imagen.url;
+    columna.querySelector('.card-body .badge').style.backgroundColor = imagen.color_uicn;
+
+    return columna;
+}